@@ -37,7 +37,12 @@ else:
 # Choose what to run based on the command
 if [ "$1" = "celery" ]; then
   echo "Starting Celery worker..."
-  celery -A scheduler_project worker -l INFO
+  celery -A scheduler_project worker -Q default -l INFO
+elif [ "$1" = "solver" ]; then
+  # One solve per worker process, taken from the queue only when a process is free
+  echo "Starting solver worker..."
+  celery -A scheduler_project worker -Q solver -n solver@%h -l INFO \
+    --concurrency=${SOLVER_MAX_CONCURRENT_SOLVES:-2} --prefetch-multiplier=1 -O fair
 elif [ "$1" = "beat" ]; then
   echo "Starting Celery beat..."
   celery -A scheduler_project beat -l INFO
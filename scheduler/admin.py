@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig
+from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig, SolveJob
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -68,3 +68,10 @@ class SchedulerConfigAdmin(admin.ModelAdmin):
     list_display = ('name', 'iterations', 'min_course_fill', 'early_stop_score', 'created_at')
     search_fields = ('name',)
     ordering = ('-created_at',)
+
+@admin.register(SolveJob)
+class SolveJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'score', 'schedule', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    ordering = ('-created_at',)
+    readonly_fields = ('task_id', 'schedule', 'score', 'error', 'created_at', 'started_at', 'finished_at', 'heartbeat_at')
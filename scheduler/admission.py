@@ -0,0 +1,117 @@
+"""
+Admission control for CPU-bound solves.
+A node runs at most settings.SOLVER_MAX_CONCURRENT_SOLVES solves at once.
+Each running solve holds one numbered slot, a lease in the Django cache,
+and is pinned to that slot's share of the node's CPUs, so concurrent
+solves do not compete for the same cores and the rest of the node stays
+responsive. Requests that find no free slot are rejected with a
+Retry-After (web requests) or retried later (Celery tasks).
+"""
+import logging
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def usable_cpus() -> List[int]:
+    """CPUs this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def threads_per_solve() -> int:
+    """Threads one solve may use: SOLVER_THREADS_PER_SOLVE, or an even share of the CPUs"""
+    configured = getattr(settings, 'SOLVER_THREADS_PER_SOLVE', 0)
+    if configured:
+        return configured
+    return max(1, len(usable_cpus()) // max(1, settings.SOLVER_MAX_CONCURRENT_SOLVES))
+
+
+class SolverSlot:
+    """
+    A claimed solve slot on this node.
+
+    Attributes:
+        index: Slot number, which also selects the CPUs the solve runs on
+        key: Cache key of the lease
+        token: Value identifying this holder of the lease
+        cpus: CPUs the solve is pinned to
+    """
+
+    def __init__(self, index, key, token, cpus):
+        self.index = index
+        self.key = key
+        self.token = token
+        self.cpus = cpus
+
+    def __repr__(self):
+        return f"SolverSlot({self.index}, cpus={self.cpus})"
+
+
+def acquire_solver_slot() -> Optional[SolverSlot]:
+    """
+    Claim a free solve slot on this node
+
+    Returns:
+        SolverSlot, or None if SOLVER_MAX_CONCURRENT_SOLVES solves are running
+    """
+    node = socket.gethostname()
+    cpus = usable_cpus()
+    threads = min(threads_per_solve(), len(cpus))
+    token = uuid.uuid4().hex
+    for index in range(settings.SOLVER_MAX_CONCURRENT_SOLVES):
+        key = f"solver_slot:{node}:{index}"
+        # The lease expires on its own if the holder dies without releasing it
+        if cache.add(key, token, settings.SOLVER_SLOT_LEASE_SECONDS):
+            start = (index * threads) % len(cpus)
+            slot_cpus = (cpus + cpus)[start:start + threads]
+            return SolverSlot(index, key, token, slot_cpus)
+    return None
+
+
+def release_solver_slot(slot: SolverSlot):
+    """Give a slot back unless its lease already expired and was claimed again"""
+    if cache.get(slot.key) == slot.token:
+        cache.delete(slot.key)
+
+
+@contextmanager
+def solver_slot():
+    """
+    Hold a solve slot for the duration of the block
+
+    The calling thread is pinned to the slot's CPUs, which the solver
+    threads it starts inherit, and unpinned afterwards.
+
+    Yields:
+        SolverSlot, or None if the node is at capacity (nothing is held then)
+    """
+    slot = acquire_solver_slot()
+    if slot is None:
+        logger.info(f"All {settings.SOLVER_MAX_CONCURRENT_SOLVES} solve slots on this node are busy")
+        yield None
+        return
+
+    previous = None
+    if hasattr(os, 'sched_setaffinity'):
+        previous = os.sched_getaffinity(0)
+        try:
+            os.sched_setaffinity(0, slot.cpus)
+        except OSError as e:
+            logger.warning(f"Cannot pin the solve to CPUs {slot.cpus}: {e}")
+            previous = None
+    logger.info(f"Solving in {slot}")
+    try:
+        yield slot
+    finally:
+        if previous is not None:
+            os.sched_setaffinity(0, previous)
+        release_solver_slot(slot)
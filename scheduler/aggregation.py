@@ -0,0 +1,96 @@
+"""
+Presolve that groups students with identical scheduling data.
+Students sharing priority, AM preferences and PM preferences are
+interchangeable to the solvers, so they can be scheduled as one class with a
+head count and handed concrete seats afterwards.
+"""
+import random
+from collections import OrderedDict
+from typing import Dict, List
+
+
+class StudentClass:
+    """
+    A group of students with the same priority and preference lists.
+
+    Exposes the same preference accessors as Student so the schedulers can
+    treat a class as a single unit of size len(members).
+    """
+
+    def __init__(self, priority, am_preferences, pm_preferences):
+        self.priority = priority
+        self.am_preferences = list(am_preferences)
+        self.pm_preferences = list(pm_preferences)
+        self.members = []
+
+    def __repr__(self):
+        return f"StudentClass(priority={self.priority}, size={self.size})"
+
+    @property
+    def size(self):
+        return len(self.members)
+
+    def get_am_preferences(self):
+        return self.am_preferences
+
+    def get_pm_preferences(self):
+        return self.pm_preferences
+
+
+def group_students(students) -> List[StudentClass]:
+    """
+    Group students into equivalence classes
+
+    Args:
+        students: Iterable of Student objects
+
+    Returns:
+        List of StudentClass in order of first appearance
+    """
+    classes = OrderedDict()
+    for student in students:
+        key = (student.priority, tuple(student.get_am_preferences()), tuple(student.get_pm_preferences()))
+        if key not in classes:
+            classes[key] = StudentClass(*key)
+        classes[key].members.append(student)
+    return list(classes.values())
+
+
+def disaggregate(student_class: StudentClass, seats: Dict[str, list], rng=None) -> List[tuple]:
+    """
+    Hand the seats won by a class back to its members
+
+    Members are drawn in random order so no student is systematically
+    favoured. AM seats are dealt best-first while PM seats are dealt
+    worst-first, so a member who draws a weak AM course gets a strong PM
+    course in return. FullDay seats go to the members left over.
+
+    Args:
+        student_class: The class the seats belong to
+        seats: Dict mapping time slot to the list of Course seats for the class
+        rng: Optional random.Random used for the draw
+
+    Returns:
+        List of (student, {time slot: Course}) tuples, one per member
+    """
+    rng = rng or random.Random()
+    members = list(student_class.members)
+    rng.shuffle(members)
+
+    def rank(preferences):
+        return lambda course: preferences.index(course.name) if course.name in preferences else len(preferences)
+
+    am_seats = sorted(seats.get('AM', []), key=rank(student_class.am_preferences))
+    pm_seats = sorted(seats.get('PM', []), key=rank(student_class.pm_preferences), reverse=True)
+    fd_seats = list(seats.get('FullDay', []))
+
+    assignments = []
+    for member in members:
+        courses = {}
+        if am_seats and pm_seats:
+            courses['AM'] = am_seats.pop(0)
+            courses['PM'] = pm_seats.pop(0)
+        elif fd_seats:
+            courses['FullDay'] = fd_seats.pop(0)
+        assignments.append((member, courses))
+    return assignments
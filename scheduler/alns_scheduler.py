@@ -0,0 +1,295 @@
+"""
+Adaptive large-neighbourhood search (ALNS) scheduler implementation.
+For cohorts too large for one MIP, a greedy schedule is improved by
+repeatedly freeing a small part of it and re-solving that part exactly
+against the seats everyone else keeps.
+"""
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Dict
+
+from .ortools_scheduler import ORToolsScheduler, SLOT_PENALTIES, TIME_SLOTS, weighted_terms
+from .progress import ProgressChannel
+from .scheduler_python import PythonScheduler
+
+logger = logging.getLogger(__name__)
+
+DESTROY_OPERATORS = ('course', 'priority', 'random', 'penalised')
+
+# Operator rewards for a new best solution, an accepted solution and a rejected one
+REWARDS = (5.0, 1.0, 0.0)
+
+# Weight given to the operator's previous score when updating it
+DECAY = 0.8
+
+# Penalty of a student left without courses; above any assignment so
+# repairs always seat them when capacity allows, and may leave them
+# unseated when it does not
+UNASSIGNED_PENALTY = 2.0
+
+# Seconds below which the remaining budget is too short for a repair
+MIN_REPAIR_TIME = 0.05
+
+
+class ALNSScheduler(ORToolsScheduler):
+    """
+    Google OR-Tools based large-neighbourhood search.
+
+    Starting from one greedy pass, every iteration picks a destroy operator
+    by roulette over adaptive weights, frees up to neighbourhood_size
+    students and repairs them with a sparse sub-MIP built by _build_model
+    with the capacities left by the fixed students. Non-worsening repairs are
+    accepted. Model size and repair time depend on the neighbourhood, not on
+    the cohort.
+
+    Destroy operators:
+    - course: the roster of one course a penalised student would rather take
+    - priority: a random sample of one priority tier
+    - random: a random sample of all students
+    - penalised: unassigned students and students holding unlisted
+      courses, plus holders of the courses they list
+    """
+
+    def run_with_config(self, config: Dict) -> Dict:
+        """
+        Run the search with the given configuration
+
+        Args:
+            config: Dict with configuration parameters. Reads
+                'time_limit_seconds' (overall budget), 'neighbourhood_size'
+                (default 200), 'repair_time_limit' (seconds per sub-MIP,
+                default 2), 'max_iterations', 'seed' and 'progress_id'
+                (channel improvements are published to; the search stops
+                when the user accepts the current one)
+
+        Returns:
+            Dict: Schedule results with search statistics under 'alns'
+        """
+        start_time = time.time()
+        time_limit_seconds = config.get('time_limit_seconds', 20)
+        neighbourhood_size = config.get('neighbourhood_size', 200)
+        max_iterations = config.get('max_iterations', None)
+        self.rng = random.Random(config.get('seed', None))
+        self.progress = ProgressChannel.from_config(config)
+        self.priority_weights = self._get_priority_weights(
+            config.get('priority_weight', 'standard'), config.get('custom_weights', None)
+        )
+        self.repair_config = {
+            'solver_backend': config.get('solver_backend', 'scip'),
+            'num_workers': config.get('num_workers', None),
+            'time_limit_seconds': config.get('repair_time_limit', 2),
+        }
+
+        self._initial_solution()
+        objective = self._objective()
+        self.incumbents = [{'iteration': 0, 'objective': objective, 'elapsed': time.time() - start_time}]
+        logger.info(f"ALNS initial greedy objective {objective:.4f} for {len(self.students)} students")
+
+        weights = {operator: 1.0 for operator in DESTROY_OPERATORS}
+        usage = defaultdict(int)
+        iteration = 0
+        while time.time() - start_time < time_limit_seconds:
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+            if objective <= 1e-9:
+                # Every student holds listed courses; nothing left to improve
+                break
+            if self.progress is not None and self.progress.stop_requested():
+                logger.info(f"ALNS stopped by the user at iteration {iteration}")
+                break
+            iteration += 1
+
+            operator = self.rng.choices(DESTROY_OPERATORS, [weights[o] for o in DESTROY_OPERATORS])[0]
+            usage[operator] += 1
+            neighbourhood = self._destroy(operator, neighbourhood_size)
+            if not neighbourhood:
+                reward = REWARDS[2]
+            else:
+                remaining = time_limit_seconds - (time.time() - start_time)
+                if remaining < MIN_REPAIR_TIME:
+                    break
+                delta = self._repair(neighbourhood, remaining)
+                if delta is not None and delta < -1e-9:
+                    objective += delta
+                    reward = REWARDS[0]
+                    self.incumbents.append({
+                        'iteration': iteration,
+                        'objective': objective,
+                        'elapsed': time.time() - start_time,
+                        'operator': operator
+                    })
+                    logger.info(f"ALNS iteration {iteration}: objective {objective:.4f} ({operator})")
+                    if self.progress is not None:
+                        self.progress.incumbent(objective, bound=0.0, elapsed=time.time() - start_time,
+                                                iteration=iteration, operator=operator)
+                else:
+                    reward = REWARDS[1] if delta is not None else REWARDS[2]
+            weights[operator] = DECAY * weights[operator] + (1 - DECAY) * reward + 1e-3
+
+        self.objective_value = objective
+        students_by_id = {student.id: student for student in self.students}
+        result = self._apply_assignments([
+            (students_by_id[student_id], courses) for student_id, courses in self.current.items()
+        ])
+        result['alns'] = {
+            'iterations': iteration,
+            'objective': objective,
+            'operator_weights': weights,
+            'operator_usage': dict(usage),
+            'elapsed': time.time() - start_time
+        }
+        return result
+
+    def _initial_solution(self):
+        """Fill self.current with one greedy pass in priority order"""
+        greedy = PythonScheduler(self.courses, self.students)
+        first, second = greedy.assign(greedy.shuffled_order())
+
+        self.current = {}
+        self.members = defaultdict(set)
+        for s, student in enumerate(greedy.students):
+            courses = {}
+            for c in (first[s], second[s]):
+                if c >= 0:
+                    course = greedy.courses[c]
+                    courses[course.time_slot] = course
+                    self.members[course.id].add(student.id)
+            self.current[student.id] = courses
+
+        # Sampling pools, built once so destroy steps do not scan the cohort
+        self.students_by_id = {student.id: student for student in greedy.students}
+        self.student_ids = list(self.current)
+        self.ids_by_priority = defaultdict(list)
+        for student in greedy.students:
+            self.ids_by_priority[student.priority].append(student.id)
+        self.course_ids_by_name = {course.name: course.id for course in self.courses}
+        self.courses_by_slot = {
+            slot: [c for c in self.courses if c.time_slot == slot]
+            for slot in TIME_SLOTS
+        }
+
+    def _penalty(self, student, courses) -> float:
+        """Weighted penalty of one student's courses, as in the MIP objective"""
+        if not courses:
+            return self.priority_weights.get(student.priority, 1.0) * UNASSIGNED_PENALTY
+        am_preferences = student.get_am_preferences()
+        pm_preferences = student.get_pm_preferences()
+        penalty = 0.0
+        for slot, course in courses.items():
+            listed = (slot == 'AM' and course.name in am_preferences) or \
+                (slot == 'PM' and course.name in pm_preferences)
+            if not listed:
+                penalty += SLOT_PENALTIES[slot]
+        return self.priority_weights.get(student.priority, 1.0) * penalty
+
+    def _objective(self) -> float:
+        return sum(
+            self._penalty(self.students_by_id[student_id], courses)
+            for student_id, courses in self.current.items()
+        )
+
+    def _is_penalised(self, student_id) -> bool:
+        return self._penalty(self.students_by_id[student_id], self.current[student_id]) > 0
+
+    def _destroy(self, operator, size):
+        """
+        Pick the students to free
+
+        Returns:
+            List of Student objects, at most size long
+        """
+        student_ids = self.student_ids
+        if operator == 'random':
+            chosen = self.rng.sample(student_ids, min(size, len(student_ids)))
+
+        elif operator == 'priority':
+            candidates = self.ids_by_priority[self.rng.choice(list(self.ids_by_priority))]
+            chosen = self.rng.sample(candidates, min(size, len(candidates)))
+
+        else:
+            penalised = [sid for sid in self.rng.sample(student_ids, min(len(student_ids), size * 5))
+                         if self._is_penalised(sid)]
+            if not penalised:
+                return []
+            if operator == 'course':
+                student = self.students_by_id[self.rng.choice(penalised)]
+                names = student.get_am_preferences() + student.get_pm_preferences()
+                wanted = [self.course_ids_by_name[n] for n in names if n in self.course_ids_by_name]
+                if not wanted:
+                    return []
+                roster = list(self.members[self.rng.choice(wanted)])
+                chosen = [student.id] + self.rng.sample(roster, min(size - 1, len(roster)))
+            else:
+                chosen = penalised[:size // 2]
+                for sid in list(chosen):
+                    student = self.students_by_id[sid]
+                    for name in student.get_am_preferences() + student.get_pm_preferences():
+                        roster = list(self.members.get(self.course_ids_by_name.get(name), ()))
+                        chosen.extend(self.rng.sample(roster, min(2, len(roster))))
+                chosen = list(dict.fromkeys(chosen))[:size]
+
+        neighbourhood = [self.students_by_id[sid] for sid in dict.fromkeys(chosen)]
+        neighbourhood.sort(key=lambda student: student.priority)
+        return neighbourhood
+
+    def _repair(self, neighbourhood, time_limit_seconds=None):
+        """
+        Re-solve the neighbourhood against the seats the other students keep
+
+        The current assignment is passed as a hint, so the sub-MIP starts
+        from a feasible solution of the same objective. Students may stay
+        unseated at UNASSIGNED_PENALTY, so neighbourhoods holding students
+        the greedy start could not seat remain feasible when seats are short.
+
+        Args:
+            neighbourhood: Students to re-solve
+            time_limit_seconds: Remaining search budget; the repair gets at
+                most this long, and at most repair_time_limit
+
+        Returns:
+            Objective change of the accepted repair, or None if it was rejected
+        """
+        capacities = {c.id: c.max_students - len(self.members[c.id]) for c in self.courses}
+        for student in neighbourhood:
+            for course in self.current[student.id].values():
+                capacities[course.id] += 1
+        before = sum(self._penalty(student, self.current[student.id]) for student in neighbourhood)
+
+        backend = self._create_backend(self.repair_config)
+        if time_limit_seconds is not None:
+            backend.set_time_limit(min(self.repair_config['time_limit_seconds'], time_limit_seconds))
+        unseated = []
+        assign, fallback = self._build_model(
+            backend, neighbourhood, self.courses_by_slot, None,
+            sparse=True, capacities=capacities, unseated=unseated
+        )
+        terms = self._penalty_terms(neighbourhood, assign, fallback)
+        terms += [(student.priority, UNASSIGNED_PENALTY, var) for student, var in zip(neighbourhood, unseated)]
+        backend.minimize(weighted_terms(terms, self.priority_weights))
+        hint = {
+            student.id: {course.id for course in self.current[student.id].values()}
+            for student in neighbourhood
+        }
+        self._apply_solution_hint(backend, neighbourhood, assign, fallback, hint)
+        for student, var in zip(neighbourhood, unseated):
+            backend.add_hint(var, 0 if hint[student.id] else 1)
+        status = backend.solve()
+        if status not in ('OPTIMAL', 'FEASIBLE'):
+            return None
+
+        assignments = self._extract_assignments(
+            backend, neighbourhood, self.courses_by_slot, assign, fallback, capacities
+        )
+        after = sum(self._penalty(student, courses) for student, courses in assignments)
+        if after > before + 1e-9:
+            return None
+
+        for student, courses in assignments:
+            for course in self.current[student.id].values():
+                self.members[course.id].discard(student.id)
+            self.current[student.id] = courses
+            for course in courses.values():
+                self.members[course.id].add(student.id)
+        return after - before
@@ -0,0 +1,259 @@
+"""
+NumPy batch Monte Carlo version of the greedy heuristic.
+Instead of shuffling, assigning and scoring one ordering per iteration, a
+batch of orderings is processed together: students are still served one
+position at a time, but every step handles all orderings of the batch with
+array operations.
+"""
+import logging
+import math
+from typing import Dict
+
+import numpy as np
+
+from .aggregation import group_students
+from .scheduler_python import PythonScheduler, AM, PM, FULL_DAY
+
+logger = logging.getLogger(__name__)
+
+# Orderings evaluated per NumPy pass
+BATCH_SIZE = 256
+
+
+class BatchGreedyScheduler(PythonScheduler):
+    """
+    Vectorized random-restart greedy scheduler.
+
+    Produces the same kind of schedules as PythonScheduler (first available
+    preference, then the first open course of the slot) for K
+    priority-stratified orderings at once, using a K x courses capacity
+    matrix, and scores all K results with a vectorized satisfaction score.
+    """
+
+    def __init__(self, courses, students, batch_size=BATCH_SIZE, seed=None):
+        """
+        Initialize the scheduler with courses and students
+
+        Args:
+            courses: List of Course objects
+            students: List of Student objects
+            batch_size: Number of orderings per batch
+            seed: Optional seed for the random orderings
+        """
+        super().__init__(courses, students)
+        self.batch_size = max(1, batch_size)
+        self.rng = np.random.default_rng(seed)
+        self._index_arrays()
+
+    def _index_arrays(self):
+        """Convert the indexed problem into NumPy arrays"""
+        n = len(self.students)
+
+        def padded(candidate_lists):
+            width = max([len(c) for c in candidate_lists] + [1])
+            matrix = np.full((n, width), -1, dtype=np.int32)
+            for s, candidates in enumerate(candidate_lists):
+                matrix[s, :len(candidates)] = candidates
+            return matrix
+
+        self.first_matrix = padded(self.first_candidates)
+        self.second_matrix = padded(self.second_candidates)
+        self.slot_array = np.array(self.course_slots, dtype=np.int8)
+        self.capacity_array = np.array(self.capacities, dtype=np.int32)
+        self.fallback_arrays = [np.array(courses, dtype=np.int32) for courses in self.slot_courses]
+        self.priority_array = np.array(self.priorities, dtype=np.float64)
+
+        # Preference rank of every course for every student; unlisted courses
+        # rank at the length of the list, as in calculate_satisfaction_score
+        course_index = {course.name: c for c, course in enumerate(self.courses)}
+        self.am_lengths = np.array([len(s.get_am_preferences()) for s in self.students], dtype=np.int32)
+        self.pm_lengths = np.array([len(s.get_pm_preferences()) for s in self.students], dtype=np.int32)
+        self.am_ranks = np.repeat(self.am_lengths[:, None], len(self.courses), axis=1).astype(np.int16)
+        self.pm_ranks = np.repeat(self.pm_lengths[:, None], len(self.courses), axis=1).astype(np.int16)
+        for s, student in enumerate(self.students):
+            for ranks, preferences in ((self.am_ranks, student.get_am_preferences()),
+                                       (self.pm_ranks, student.get_pm_preferences())):
+                for position, name in reversed(list(enumerate(preferences))):
+                    if name in course_index:
+                        ranks[s, course_index[name]] = position
+
+    def shuffled_orders(self, count, classes=None) -> np.ndarray:
+        """
+        Draw priority-stratified orderings
+
+        Sorting by priority plus a uniform random offset in [0, 1) shuffles
+        students within each priority level while keeping levels in order.
+
+        Args:
+            count: Number of orderings
+            classes: Optional list of StudentClass; members of a class then
+                stay together and classes are shuffled within a priority
+
+        Returns:
+            count x students array of student indices
+        """
+        n = len(self.students)
+        if classes is None:
+            keys = self.priority_array[None, :] + self.rng.random((count, n))
+        else:
+            class_of = np.empty(n, dtype=np.int64)
+            for k, student_class in enumerate(classes):
+                for member in student_class.members:
+                    class_of[self.student_index[member.id]] = k
+            class_ranks = self.rng.random((count, len(classes))).argsort(axis=1).argsort(axis=1)
+            offsets = (class_ranks[:, class_of] + self.rng.random((count, n))) / (len(classes) + 1)
+            keys = self.priority_array[None, :] + offsets
+        return keys.argsort(axis=1, kind='stable')
+
+    def _take_seats(self, candidates, fallback, remaining, rows):
+        """
+        Take one seat per ordering: first candidate with room, else first open fallback course
+
+        Args:
+            candidates: rows x width array of course indices, padded with -1
+            fallback: Course indices of the slot in listing order
+            remaining: Flattened K x courses capacity matrix, updated in place;
+                padding columns point at a sentinel entry that is always 0
+            rows: Orderings (rows of remaining) taking a seat
+
+        Returns:
+            Array with the course index taken per row, or -1
+        """
+        offsets = rows * self.row_width
+        free = remaining[offsets[:, None] + candidates] > 0
+        found = free.any(axis=1)
+        picks = candidates[np.arange(len(rows)), free.argmax(axis=1)]
+
+        missing = ~found
+        if missing.any():
+            picks[missing] = -1
+            if fallback.size:
+                open_seats = remaining[offsets[missing][:, None] + fallback[None, :]] > 0
+                picks[missing] = np.where(open_seats.any(axis=1), fallback[open_seats.argmax(axis=1)], -1)
+
+        taken = picks >= 0
+        remaining[offsets[taken] + picks[taken]] -= 1
+        return picks
+
+    def assign_batch(self, orders):
+        """
+        Run the greedy assignment for every ordering of the batch
+
+        Args:
+            orders: K x students array of student indices
+
+        Returns:
+            Tuple of (first, second) K x students assignment matrices holding
+            a course index or -1
+        """
+        count, n = orders.shape
+        # One extra always-full column per row absorbs the -1 padding of the candidates
+        self.row_width = len(self.courses) + 1
+        remaining = np.zeros((count, self.row_width), dtype=np.int32)
+        remaining[:, :-1] = self.capacity_array
+        remaining = remaining.ravel()
+        first = np.full((count, n), -1, dtype=np.int32)
+        second = np.full((count, n), -1, dtype=np.int32)
+        rows = np.arange(count)
+
+        for position in range(n):
+            students = orders[:, position]
+            picks = self._take_seats(self.first_matrix[students], self.fallback_arrays[AM], remaining, rows)
+            first[rows, students] = picks
+
+            # Students that got an AM course also need a PM course
+            half_day = (picks >= 0) & (self.slot_array[np.maximum(picks, 0)] == AM)
+            if half_day.any():
+                half_rows = rows[half_day]
+                half_students = students[half_day]
+                second[half_rows, half_students] = self._take_seats(
+                    self.second_matrix[half_students], self.fallback_arrays[PM], remaining, half_rows
+                )
+        return first, second
+
+    def score_batch(self, first, second) -> np.ndarray:
+        """
+        Vectorized Student.satisfaction_score for every student of every ordering
+
+        Args:
+            first: K x students matrix of AM or FullDay course indices
+            second: K x students matrix of PM course indices
+
+        Returns:
+            K x students array of satisfaction scores
+        """
+        students = np.arange(len(self.students))[None, :]
+        first_safe = np.maximum(first, 0)
+        second_safe = np.maximum(second, 0)
+        has_am_list = self.am_lengths > 0
+        has_pm_list = self.pm_lengths > 0
+
+        full_day = (first >= 0) & (self.slot_array[first_safe] == FULL_DAY)
+        with_am = (first >= 0) & ~full_day & has_am_list
+        with_pm = (second >= 0) & has_pm_list
+        am_ranks = self.am_ranks[students, first_safe]
+
+        positions = np.where(
+            full_day,
+            has_am_list * am_ranks + has_pm_list * self.pm_ranks[students, first_safe],
+            with_am * am_ranks + with_pm * self.pm_ranks[students, second_safe]
+        )
+        normaliser = np.where(
+            full_day,
+            has_am_list * (self.am_lengths - 1) + has_pm_list * (self.pm_lengths - 1),
+            with_am * (self.am_lengths - 1) + with_pm * (self.pm_lengths - 1)
+        )
+        return np.where(normaliser > 0, positions / np.maximum(normaliser, 1), 0.0)
+
+    def run_with_config(self, config) -> Dict:
+        """
+        Run the scheduler with the given configuration
+
+        'iterations' is the total number of orderings tried, evaluated in
+        batches of batch_size.
+
+        Args:
+            config: Dict with configuration parameters
+
+        Returns:
+            Dict: Schedule results
+        """
+        iterations = config.get('iterations', 1000)
+        early_stop_score = config.get('early_stop_score', 0.0)
+        save_only_best = config.get('save_only_best', False)
+
+        classes = None
+        if config.get('aggregate', False):
+            classes = group_students(self.students)
+            self.student_index = {student.id: s for s, student in enumerate(self.students)}
+
+        stop_after_no_improvement = 5000 if save_only_best else 2000
+        best_score_at = 0
+        tried = 0
+
+        for _ in range(math.ceil(iterations / self.batch_size)):
+            count = min(self.batch_size, iterations - tried)
+            orders = self.shuffled_orders(count, classes)
+            first, second = self.assign_batch(orders)
+            totals = self.score_batch(first, second).sum(axis=1)
+
+            k = int(totals.argmin())
+            cur_score = float(totals[k])
+            if self.best_schedule is None or cur_score < self.best_schedule['score']:
+                self.best_schedule = {'score': cur_score, 'first': first[k].tolist(), 'second': second[k].tolist()}
+                best_score_at = tried + k
+            tried += count
+
+            if early_stop_score > 0 and cur_score <= early_stop_score:
+                logger.info(f"Reached early stop threshold score of {early_stop_score}")
+                break
+
+            if tried - best_score_at > stop_after_no_improvement:
+                logger.info(f"Stopping after {stop_after_no_improvement} iterations without improvement")
+                break
+
+        if self.best_schedule:
+            logger.info(f"Best schedule score: {self.best_schedule['score']} after {tried} orderings")
+            return self._format_result()
+        logger.warning("No valid schedule found.")
+        return {}
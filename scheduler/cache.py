@@ -1,10 +1,15 @@
 """
 Custom caching functionality for the scheduler application.
+
+Keys from SchedulerCache.generate_key carry the dataset's generation, a
+counter bumped whenever courses or students change, so invalidating every
+cached entry of a dataset is one increment on any cache backend.
 """
 from django.core.cache import cache
 from django.conf import settings
 import hashlib
 import json
+import time
 
 class SchedulerCache:
     """
@@ -16,13 +21,29 @@ class SchedulerCache:
     # Cache time for student and course data (12 hours)
     DATA_CACHE_TIME = 60 * 60 * 12
     
+    # Cache time for recorded engine timings (30 days)
+    ENGINE_TIMING_CACHE_TIME = 60 * 60 * 24 * 30
+    
+    # Weight of the newest run in the recorded engine timings
+    ENGINE_TIMING_SMOOTHING = 0.3
+    
+    # Seconds a run waits to update an engine's timing before dropping its sample
+    ENGINE_TIMING_LOCK_WAIT = 0.5
+    
+    # Cache time for problem instances shared with fan-out tasks (1 hour)
+    PROBLEM_CACHE_TIME = 60 * 60
+    
+    # School id of the single dataset this deployment schedules
+    DEFAULT_SCHOOL_ID = 'default'
+    
     @staticmethod
-    def generate_key(prefix, **kwargs):
+    def generate_key(prefix, school_id=DEFAULT_SCHOOL_ID, **kwargs):
         """
         Generate a cache key based on the prefix and kwargs.
         
         Args:
             prefix (str): The prefix for the cache key
+            school_id: The school whose data generation is part of the key
             kwargs: Any parameters to include in the key generation
             
         Returns:
@@ -32,7 +53,28 @@ class SchedulerCache:
         sorted_items = sorted(kwargs.items())
         key_data = json.dumps(sorted_items)
         key_hash = hashlib.md5(key_data.encode()).hexdigest()
-        return f"{prefix}:{key_hash}"
+        generation = SchedulerCache.get_generation(school_id)
+        return f"{prefix}:g{generation}:{key_hash}"
+    
+    @staticmethod
+    def get_generation(school_id=DEFAULT_SCHOOL_ID):
+        """
+        Get the current generation of a school's data.
+        
+        Args:
+            school_id: The school ID
+            
+        Returns:
+            int: The generation counter
+        """
+        key = f"generation:{school_id}"
+        generation = cache.get(key)
+        if generation is None:
+            # Start from the clock rather than 0, so a counter lost to eviction
+            # does not come back at a generation that older keys still use
+            cache.add(key, int(time.time() * 1000), None)
+            generation = cache.get(key, 0)
+        return generation
     
     @staticmethod
     def get_schedule_cache(school_id, **params):
@@ -46,7 +88,7 @@ class SchedulerCache:
         Returns:
             dict: Cached schedule results or None if not found
         """
-        cache_key = SchedulerCache.generate_key(f"schedule:{school_id}", **params)
+        cache_key = SchedulerCache.generate_key(f"schedule:{school_id}", school_id, **params)
         return cache.get(cache_key)
     
     @staticmethod
@@ -59,21 +101,101 @@ class SchedulerCache:
             schedule_results (dict): The schedule results to cache
             params: Parameters used for scheduling
         """
-        cache_key = SchedulerCache.generate_key(f"schedule:{school_id}", **params)
+        cache_key = SchedulerCache.generate_key(f"schedule:{school_id}", school_id, **params)
         cache.set(cache_key, schedule_results, SchedulerCache.SCHEDULE_CACHE_TIME)
     
     @staticmethod
-    def invalidate_schedule_cache(school_id):
+    def invalidate_schedule_cache(school_id=DEFAULT_SCHOOL_ID):
         """
         Invalidate all schedule caches for a school when data changes.
         
+        Bumps the school's generation; keys of older generations are never
+        read again and expire on their own.
+        
         Args:
-            school_id (int): The school ID
+            school_id: The school ID
+            
+        Returns:
+            int: The new generation
+        """
+        key = f"generation:{school_id}"
+        SchedulerCache.get_generation(school_id)
+        try:
+            # incr is atomic on the shared backends
+            return cache.incr(key)
+        except ValueError:
+            # The counter was evicted in between; a fresh one is already newer
+            return SchedulerCache.get_generation(school_id)
+    
+    @staticmethod
+    def get_engine_timing(engine_name):
+        """
+        Get the recorded running time of an engine.
+        
+        Args:
+            engine_name (str): The engine name
+            
+        Returns:
+            float: Smoothed seconds per unit of problem size, or None if the
+                engine has not run yet
+        """
+        return cache.get(f"engine_timing:{engine_name}")
+    
+    @staticmethod
+    def record_engine_timing(engine_name, seconds_per_unit):
+        """
+        Fold the running time of one run into the engine's recorded timing.
+        
+        The read-modify-write runs under a short cache lock so concurrent
+        runs do not overwrite each other's samples. A run that cannot take
+        the lock in time drops its sample; the average barely moves anyway.
+        
+        Args:
+            engine_name (str): The engine name
+            seconds_per_unit (float): Measured seconds per unit of problem size
+            
+        Returns:
+            bool: Whether the sample was recorded
+        """
+        lock_key = f"engine_timing:{engine_name}:lock"
+        deadline = time.time() + SchedulerCache.ENGINE_TIMING_LOCK_WAIT
+        while not cache.add(lock_key, True, 10):
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        try:
+            previous = SchedulerCache.get_engine_timing(engine_name)
+            if previous is not None:
+                smoothing = SchedulerCache.ENGINE_TIMING_SMOOTHING
+                seconds_per_unit = smoothing * seconds_per_unit + (1 - smoothing) * previous
+            cache.set(f"engine_timing:{engine_name}", seconds_per_unit, SchedulerCache.ENGINE_TIMING_CACHE_TIME)
+        finally:
+            cache.delete(lock_key)
+        return True
+    
+    @staticmethod
+    def get_problem_instance(fingerprint):
+        """
+        Get a cached problem instance.
+        
+        Args:
+            fingerprint (str): ProblemInstance.fingerprint of the instance
+            
+        Returns:
+            bytes: The serialized ProblemInstance or None if not found
+        """
+        return cache.get(f"problem:{fingerprint}")
+    
+    @staticmethod
+    def set_problem_instance(fingerprint, data):
+        """
+        Cache a problem instance for tasks that solve it elsewhere.
+        
+        Args:
+            fingerprint (str): ProblemInstance.fingerprint of the instance
+            data (bytes): The serialized ProblemInstance
         """
-        # Since we can't easily list all keys with a prefix in some cache backends,
-        # we'll use a special marker key to track when data was last modified
-        cache_invalidation_key = f"schedule_invalidation:{school_id}"
-        cache.set(cache_invalidation_key, True)
+        cache.set(f"problem:{fingerprint}", data, SchedulerCache.PROBLEM_CACHE_TIME)
     
     @staticmethod
     def clear_all_caches():
@@ -0,0 +1,498 @@
+"""
+Registry of scheduling engines and the auto-selector that picks one.
+Each engine declares what it can do (exactness, whether it needs OR-Tools,
+whether it returns within any time budget) and a cost model. Selection
+uses the cost model's defaults until past runs have recorded real
+timings, which SchedulerCache keeps per engine.
+"""
+import logging
+import multiprocessing
+import queue
+import random
+import time
+from typing import Dict, List, Tuple
+
+from .cache import SchedulerCache
+from .feasibility import InfeasibleProblemError
+
+logger = logging.getLogger(__name__)
+
+# Result quality levels an engine can promise for a problem
+GREEDY, HEURISTIC, OPTIMAL = range(3)
+
+# A run that found no schedule needed more time than it had; it is recorded
+# as taking this many times as long
+UNSOLVED_FACTOR = 2.0
+
+# Engine used when config has no 'engine' key; 'auto' opts in to select_engine
+DEFAULT_ENGINE = 'ortools'
+
+# Engines raced by run_scheduler_parallel unless config['race'] names others
+RACE_ENGINES = ('ortools', 'flow', 'alns', 'python')
+
+# Seconds past the time budget a racer may take to hand back its result
+RACE_GRACE_SECONDS = 5.0
+
+# race_objective of a schedule giving every student a first choice; no racer can beat it
+PERFECT_OBJECTIVE = 0.0
+
+# Score a student left without a full set of courses counts as in a race:
+# the worst satisfaction score, where an empty slot would otherwise score 0
+UNSEATED_SCORE = 1.0
+
+
+class ProblemProfile:
+    """
+    Size of a scheduling problem, as read by the cost models.
+
+    Attributes:
+        num_students: Cohort size
+        num_courses: Number of courses
+        num_full_day: Number of FullDay courses
+        time_budget: Seconds the caller allows
+        iterations: Greedy orderings requested
+    """
+
+    def __init__(self, num_students, num_courses, num_full_day, time_budget, iterations=1000):
+        self.num_students = num_students
+        self.num_courses = num_courses
+        self.num_full_day = num_full_day
+        self.time_budget = time_budget
+        self.iterations = iterations
+
+    @classmethod
+    def from_problem(cls, courses, students, config) -> 'ProblemProfile':
+        return cls(
+            num_students=len(students),
+            num_courses=len(courses),
+            num_full_day=sum(1 for course in courses if course.time_slot == 'FullDay'),
+            time_budget=config.get('time_limit_seconds', 20),
+            iterations=config.get('iterations', 1000) * config.get('run_count', 1)
+        )
+
+
+class Engine:
+    """
+    Base class of a registered engine.
+
+    Subclasses set the capability attributes, define units() and run(),
+    and may override quality().
+
+    Attributes:
+        name: Value of config['engine'] selecting this engine
+        requires_ortools: Whether the engine needs OR-Tools installed
+        anytime: Whether the engine returns its best solution within any budget
+        strict: Whether the engine must seat every student, so an infeasible
+            problem is rejected before it runs instead of returning a
+            partial schedule
+        seconds_per_unit: Default running time per unit of problem size
+        overhead: Fixed running time in seconds
+    """
+
+    name = None
+    requires_ortools = True
+    anytime = False
+    strict = False
+    seconds_per_unit = 1e-6
+    overhead = 0.05
+
+    def quality(self, profile: ProblemProfile) -> int:
+        return OPTIMAL
+
+    def units(self, profile: ProblemProfile) -> float:
+        """Problem size the running time is proportional to"""
+        return profile.num_students * profile.num_courses
+
+    def estimate(self, profile: ProblemProfile) -> float:
+        """Expected running time in seconds, from recorded timings when available"""
+        rate = SchedulerCache.get_engine_timing(self.name)
+        if rate is None:
+            rate = self.seconds_per_unit
+        seconds = self.overhead + rate * self.units(profile)
+        if self.anytime:
+            seconds = min(seconds, profile.time_budget)
+        return seconds
+
+    def record(self, profile: ProblemProfile, elapsed: float):
+        """Fold the running time of a finished run into the recorded timing"""
+        units = self.units(profile)
+        if units > 0:
+            SchedulerCache.record_engine_timing(self.name, max(elapsed - self.overhead, 0.0) / units)
+
+    def proves_optimal(self, result: Dict, profile: ProblemProfile) -> bool:
+        """Whether the result is known to be optimal for the engine's objective"""
+        return False
+
+    def run(self, courses, students, config, load_sections=True) -> Dict:
+        """
+        Solve the problem
+
+        Args:
+            courses: List of Course objects
+            students: List of Student objects
+            config: Dict with configuration parameters
+            load_sections: Whether OR-Tools engines may create missing
+                Sections; disabled in worker processes
+
+        Returns:
+            Dict: Schedule results
+        """
+        raise NotImplementedError
+
+
+class ORToolsEngine(Engine):
+    """MIP over every student-course pair; optimal within the time limit"""
+
+    name = 'ortools'
+    strict = True
+    seconds_per_unit = 3.5e-5
+
+    def proves_optimal(self, result, profile):
+        return result.get('status') == 'OPTIMAL'
+
+    def run(self, courses, students, config, load_sections=True):
+        from .ortools_scheduler import ORToolsScheduler
+        return ORToolsScheduler(courses, students, load_sections).run_with_config(config)
+
+
+class FlowEngine(Engine):
+    """Two-stage min-cost flow; optimal only without FullDay courses"""
+
+    name = 'flow'
+    seconds_per_unit = 2e-6
+
+    def quality(self, profile):
+        return OPTIMAL if profile.num_full_day == 0 else HEURISTIC
+
+    def proves_optimal(self, result, profile):
+        return profile.num_full_day == 0
+
+    def run(self, courses, students, config, load_sections=True):
+        from .flow_scheduler import FlowScheduler
+        return FlowScheduler(courses, students, load_sections).run_with_config(config)
+
+
+class ALNSEngine(Engine):
+    """Large-neighbourhood search; improves a greedy start until the budget runs out"""
+
+    name = 'alns'
+    anytime = True
+    seconds_per_unit = 1.0
+
+    def quality(self, profile):
+        return HEURISTIC
+
+    def units(self, profile):
+        return profile.time_budget
+
+    def proves_optimal(self, result, profile):
+        # The search stops early only once no student holds an unlisted course
+        return result.get('alns', {}).get('objective', 1.0) <= 1e-9
+
+    def run(self, courses, students, config, load_sections=True):
+        from .alns_scheduler import ALNSScheduler
+        return ALNSScheduler(courses, students, load_sections).run_with_config(config)
+
+
+class PythonEngine(Engine):
+    """Random-restart greedy; needs no solver"""
+
+    name = 'python'
+    requires_ortools = False
+    seconds_per_unit = 1e-6
+
+    def quality(self, profile):
+        return GREEDY
+
+    def units(self, profile):
+        return profile.num_students * profile.iterations
+
+    def run(self, courses, students, config, load_sections=True):
+        if not config.get('multiple_runs', False):
+            return run_python_scheduler(courses, students, config)
+        # The Python implementation is randomised, so keep the best of several runs
+        result = None
+        for _ in range(config.get('run_count', 3)):
+            run_result = run_python_scheduler(courses, students, config)
+            if run_result and (result is None or run_result['score'] < result['score']):
+                result = run_result
+        return result
+
+
+ENGINES = {}
+
+
+def register_engine(engine: Engine):
+    """Make an engine selectable by name and by the auto-selector"""
+    ENGINES[engine.name] = engine
+
+
+for _engine in (ORToolsEngine(), FlowEngine(), ALNSEngine(), PythonEngine()):
+    register_engine(_engine)
+
+
+def select_engine(profile: ProblemProfile, ortools_available=True) -> Tuple[Engine, str]:
+    """
+    Pick the fastest engine of the best quality that fits the time budget
+
+    Args:
+        profile: Size of the problem
+        ortools_available: Whether OR-Tools engines can run
+
+    Returns:
+        Tuple of (engine, reason)
+    """
+    candidates = [
+        engine for engine in ENGINES.values()
+        if ortools_available or not engine.requires_ortools
+    ]
+    estimates = {engine.name: engine.estimate(profile) for engine in candidates}
+    fitting = [engine for engine in candidates if estimates[engine.name] <= profile.time_budget]
+    if fitting:
+        engine = max(fitting, key=lambda e: (e.quality(profile), -estimates[e.name]))
+        reason = (f"best quality ({engine.quality(profile)}) engine fitting the "
+                  f"{profile.time_budget}s budget, estimated {estimates[engine.name]:.2f}s")
+    else:
+        engine = min(candidates, key=lambda e: estimates[e.name])
+        reason = (f"no engine fits the {profile.time_budget}s budget, fastest estimated "
+                  f"{estimates[engine.name]:.2f}s")
+    reason += (f" for {profile.num_students} students, {profile.num_courses} courses "
+               f"({profile.num_full_day} FullDay)")
+    return engine, reason
+
+
+def run_engine(courses, students, config, ortools_available=True, load_sections=True,
+               feasibility=None) -> Tuple[Dict, Dict]:
+    """
+    Run the engine named by config['engine'], or the auto-selected one
+
+    Args:
+        courses: List of Course objects
+        students: List of Student objects
+        config: Dict with configuration parameters; 'engine' names the
+            engine, DEFAULT_ENGINE if missing, and 'auto' selects one
+        ortools_available: Whether OR-Tools engines can run
+        load_sections: Whether OR-Tools engines may create missing Sections
+        feasibility: FeasibilityReport of the problem, if already checked
+
+    Returns:
+        Tuple of (result, selection) where selection holds the engine
+        'name', the 'reason', the 'estimate' and the measured 'elapsed'
+
+    Raises:
+        InfeasibleProblemError: If the selected engine is strict and the
+            feasibility report found the problem infeasible
+    """
+    profile = ProblemProfile.from_problem(courses, students, config)
+    requested = config.get('engine', DEFAULT_ENGINE)
+    engine = ENGINES.get(requested)
+    if engine is not None and (ortools_available or not engine.requires_ortools):
+        reason = f"requested with engine={requested!r}" if 'engine' in config else "default engine"
+    else:
+        if requested not in (None, 'auto', DEFAULT_ENGINE):
+            logger.warning(f"Engine {requested!r} is unknown or unavailable, selecting automatically")
+        engine, reason = select_engine(profile, ortools_available)
+    if feasibility is not None and not feasibility.feasible and engine.strict:
+        # Fail fast instead of letting the solver run into its time limit
+        raise InfeasibleProblemError(feasibility)
+    estimate = engine.estimate(profile)
+    logger.info(f"Using the {engine.name} engine: {reason}")
+
+    start_time = time.time()
+    result = engine.run(courses, students, config, load_sections=load_sections)
+    elapsed = time.time() - start_time
+    engine.record(profile, elapsed if result else elapsed * UNSOLVED_FACTOR)
+
+    selection = {'name': engine.name, 'reason': reason, 'estimate': estimate, 'elapsed': elapsed}
+    return result, selection
+
+
+def race_objective(result: Dict) -> float:
+    """
+    Average satisfaction score of a result, comparable across engines
+
+    The Python engine reports a summed score and the others an average, so
+    the per-student scores are averaged here. Students without a FullDay
+    course or both an AM and a PM course count as UNSEATED_SCORE, so an
+    engine cannot win by leaving students out.
+    """
+    scores = [
+        entry['satisfaction_score']
+        if entry.get('full_day_course') or (entry.get('am_course') and entry.get('pm_course'))
+        else UNSEATED_SCORE
+        for entry in result.get('students', [])
+    ]
+    return sum(scores) / len(scores) if scores else float('inf')
+
+
+def _race_entries(config, ortools_available) -> List[Dict]:
+    """One {'engine': name, **overrides} dict per racer, unavailable engines dropped"""
+    entries = []
+    for entry in config.get('race') or RACE_ENGINES:
+        entry = {'engine': entry} if isinstance(entry, str) else dict(entry)
+        engine = ENGINES.get(entry['engine'])
+        if engine is not None and (ortools_available or not engine.requires_ortools):
+            entries.append(entry)
+    return entries
+
+
+def _race_worker(k, entry, courses, students, config, best, results):
+    """Run racer k in a worker process and report to the parent through results"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Processes started with spawn do not inherit the configured Django
+        django.setup()
+
+    # Forked racers inherit the parent's random state; give each its own
+    random.seed()
+    start_time = time.time()
+    message = {'racer': k, 'objective': None, 'optimal': False, 'result': None, 'error': None}
+    try:
+        engine = ENGINES[entry['engine']]
+        run_config = {**config, **entry}
+        result = engine.run(courses, students, run_config, load_sections=False)
+        if result:
+            objective = race_objective(result)
+            message['objective'] = objective
+            message['optimal'] = engine.proves_optimal(
+                result, ProblemProfile.from_problem(courses, students, run_config)
+            )
+            # Only a result that beats every earlier report is shipped back;
+            # the value is not a cutoff, the engines search without it
+            with best.get_lock():
+                if objective < best.value:
+                    best.value = objective
+                    message['result'] = result
+    except Exception as e:
+        message['error'] = str(e)
+    message['elapsed'] = time.time() - start_time
+    results.put(message)
+
+
+def race_engines(courses, students, config, num_racers=4, ortools_available=True) -> Dict:
+    """
+    Race several engine configurations in separate processes
+
+    Every racer runs with the same time budget, and the result with the
+    lowest race_objective wins. The best objective reported so far is kept
+    in shared memory only to avoid shipping back results that cannot win.
+    Engines prove optimality for their own objectives, which weigh
+    unseated students and priorities differently, so the race waits for
+    every racer within the budget; it ends early only when a racer seats
+    every student in a first choice (objective 0), which none can beat.
+
+    Args:
+        courses: List of Course objects
+        students: List of Student objects
+        config: Dict with configuration parameters; config['race'] lists
+            engine names or {'engine': name, **overrides} dicts to race
+            (default RACE_ENGINES)
+        num_racers: Most racers started
+        ortools_available: Whether OR-Tools engines can run
+
+    Returns:
+        Dict: Winning result with a 'race' entry holding the 'winner' and
+        per-racer 'runs' (engine, status, objective, optimal, elapsed)
+    """
+    start_time = time.time()
+    entries = _race_entries(config, ortools_available)[:max(1, num_racers)]
+    budget = config.get('time_limit_seconds', 20)
+    courses = list(courses)
+    students = list(students)
+
+    # fork hands the ORM objects to the racers without pickling them
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+    best = context.Value('d', float('inf'))
+    results = context.Queue()
+    runs = [
+        {'engine': entry['engine'], 'config': entry, 'status': 'cancelled',
+         'objective': None, 'optimal': False, 'elapsed': None}
+        for entry in entries
+    ]
+    winner = {'racer': None, 'objective': float('inf'), 'result': None}
+
+    def receive(message):
+        """Record a racer's report; True once the race is decided"""
+        run = runs[message['racer']]
+        if message['error']:
+            run['status'] = 'failed'
+            logger.error(f"Racer {run['config']} failed: {message['error']}")
+        else:
+            run['status'] = 'finished' if message['objective'] is not None else 'no_solution'
+        run.update({key: message[key] for key in ('objective', 'optimal', 'elapsed')})
+        logger.info(f"Racer {run['config']} finished in {message['elapsed']:.2f}s "
+                    f"with objective {message['objective']}")
+        # Reports may arrive out of order, so compare with the winner so far
+        if message['result'] is not None and message['objective'] < winner['objective']:
+            winner.update(message)
+        if message['objective'] is not None and message['objective'] <= PERFECT_OBJECTIVE:
+            logger.info(f"Racer {run['config']} seated every student in a first choice, cancelling the others")
+            return True
+        return False
+
+    processes = []
+    try:
+        for k, entry in enumerate(entries):
+            process = context.Process(
+                target=_race_worker, args=(k, entry, courses, students, config, best, results)
+            )
+            process.start()
+            processes.append(process)
+    except OSError as e:
+        logger.warning(f"Cannot start racer processes ({e}), running the engines in turn")
+        for process in processes:
+            process.terminate()
+            process.join()
+        processes = []
+        for k, entry in enumerate(entries):
+            _race_worker(k, entry, courses, students, config, best, results)
+            if receive(results.get()):
+                break
+
+    deadline = start_time + budget + RACE_GRACE_SECONDS
+    for _ in processes:
+        try:
+            message = results.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            logger.info(f"Race budget of {budget}s expired")
+            break
+        if receive(message):
+            break
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    if winner['result'] is None:
+        logger.error("No racer found a schedule")
+        return {}
+    result = winner['result']
+    result['race'] = {
+        'winner': entries[winner['racer']],
+        'elapsed': time.time() - start_time,
+        'runs': runs
+    }
+    return result
+
+
+def run_python_scheduler(courses, students, config) -> Dict:
+    """Run the Python implementation of the scheduler
+
+    Orderings are evaluated in NumPy batches of config['batch_size']
+    (default 256); a batch size of 1 runs the plain one-at-a-time loop.
+    """
+    from .scheduler_python import PythonScheduler
+    from .batch_greedy import BatchGreedyScheduler, BATCH_SIZE
+
+    # Make sure we only keep the best schedule, without changing the caller's config
+    config = {**config, 'save_only_best': True}
+
+    batch_size = config.get('batch_size', BATCH_SIZE)
+    if batch_size > 1:
+        scheduler = BatchGreedyScheduler(courses, students, batch_size=batch_size)
+    else:
+        scheduler = PythonScheduler(courses, students)
+    return scheduler.run_with_config(config)
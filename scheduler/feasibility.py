@@ -0,0 +1,235 @@
+"""
+Pre-solve feasibility and demand analysis.
+Runs in milliseconds before any solver is started: seat supply per time
+slot is compared with the cohort size, demand for each course is counted
+by preference rank, and a capacitated Hopcroft-Karp matching bounds how
+many students can get a course from their lists at all. A cohort the
+solvers cannot seat is rejected with the report instead of timing out.
+"""
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+TIME_SLOTS = ('AM', 'PM', 'FullDay')
+
+
+class InfeasibleProblemError(Exception):
+    """Raised when the courses cannot seat every student
+
+    Attributes:
+        report: The FeasibilityReport that found the problem
+    """
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__('; '.join(report.errors))
+
+
+class FeasibilityReport:
+    """
+    Result of the pre-solve analysis.
+
+    Attributes:
+        num_students: Cohort size
+        seats: Seat supply per time slot
+        capacity: Number of students the courses can seat, each student
+            needing either an AM and a PM seat or one FullDay seat
+        course_demand: Per course name, a dict with 'time_slot',
+            'max_students' and 'demand' (students listing it, per rank)
+        am_matching: Most students that can hold a course from their AM list
+        pm_matching: Most students that can hold a course from their PM list
+        errors: Reasons the problem cannot be solved; empty if it can
+        warnings: Oversubscribed courses and other soft findings
+        elapsed: Seconds the analysis took
+    """
+
+    def __init__(self):
+        self.num_students = 0
+        self.seats = {slot: 0 for slot in TIME_SLOTS}
+        self.capacity = 0
+        self.course_demand = {}
+        self.am_matching = 0
+        self.pm_matching = 0
+        self.errors = []
+        self.warnings = []
+        self.elapsed = 0.0
+
+    @property
+    def feasible(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> Dict:
+        return {
+            'feasible': self.feasible,
+            'num_students': self.num_students,
+            'seats': dict(self.seats),
+            'capacity': self.capacity,
+            'course_demand': self.course_demand,
+            'am_matching': self.am_matching,
+            'pm_matching': self.pm_matching,
+            'errors': list(self.errors),
+            'warnings': list(self.warnings),
+            'elapsed': self.elapsed
+        }
+
+
+def max_capacitated_matching(adjacency: List[List[int]], capacities: List[int]) -> int:
+    """
+    Hopcroft-Karp maximum matching where right vertex r takes up to capacities[r] partners
+
+    Args:
+        adjacency: Right vertices each left vertex may be matched to
+        capacities: Capacity of each right vertex
+
+    Returns:
+        int: Size of a maximum matching
+    """
+    unmatched = -1
+    match_left = [unmatched] * len(adjacency)
+    partners = [[] for _ in capacities]
+    infinity = float('inf')
+
+    def layer():
+        # BFS from every free left vertex; True if a right vertex with room is reachable
+        distance = [infinity] * len(adjacency)
+        queue = deque()
+        for u, matched in enumerate(match_left):
+            if matched == unmatched:
+                distance[u] = 0
+                queue.append(u)
+        found = False
+        while queue:
+            u = queue.popleft()
+            for r in adjacency[u]:
+                if len(partners[r]) < capacities[r]:
+                    found = True
+                    continue
+                for v in partners[r]:
+                    if distance[v] == infinity:
+                        distance[v] = distance[u] + 1
+                        queue.append(v)
+        return distance, found
+
+    def edges(u):
+        # (right, None) for a right vertex with room, else (right, partner) per current partner
+        for r in adjacency[u]:
+            if len(partners[r]) < capacities[r]:
+                yield r, None
+            else:
+                for v in list(partners[r]):
+                    yield r, v
+
+    def augment(root, distance):
+        # Iterative DFS along the BFS layers, so long paths do not hit the recursion limit
+        stack = [(root, edges(root))]
+        path = []
+        while stack:
+            u, pending = stack[-1]
+            for r, v in pending:
+                if v is None:
+                    path.append((u, r))
+                    for left, right in reversed(path):
+                        if match_left[left] != unmatched:
+                            partners[match_left[left]].remove(left)
+                        match_left[left] = right
+                        partners[right].append(left)
+                    return True
+                if distance[v] == distance[u] + 1:
+                    path.append((u, r))
+                    stack.append((v, edges(v)))
+                    break
+            else:
+                # Dead end: no augmenting path continues through u in this phase
+                distance[u] = infinity
+                stack.pop()
+                if path:
+                    path.pop()
+        return False
+
+    size = 0
+    while True:
+        distance, found = layer()
+        if not found:
+            break
+        for u, matched in enumerate(match_left):
+            if matched == unmatched and augment(u, distance):
+                size += 1
+    return size
+
+
+def check_feasibility(courses, students) -> FeasibilityReport:
+    """
+    Analyse seat supply and preference demand
+
+    Args:
+        courses: List of Course objects
+        students: List of Student objects
+
+    Returns:
+        FeasibilityReport
+    """
+    start_time = time.time()
+    report = FeasibilityReport()
+    courses = list(courses)
+    students = list(students)
+    report.num_students = len(students)
+
+    course_index = {course.name: c for c, course in enumerate(courses)}
+    for course in courses:
+        report.seats[course.time_slot] = report.seats.get(course.time_slot, 0) + course.max_students
+        report.course_demand[course.name] = {
+            'time_slot': course.time_slot,
+            'max_students': course.max_students,
+            'demand': []
+        }
+    report.capacity = report.seats['FullDay'] + min(report.seats['AM'], report.seats['PM'])
+
+    # Demand by rank, and the listed courses each student could take per role
+    am_lists = []
+    pm_lists = []
+    unknown = defaultdict(int)
+    for student in students:
+        for lists, preferences, slots in ((am_lists, student.get_am_preferences(), ('AM', 'FullDay')),
+                                          (pm_lists, student.get_pm_preferences(), ('PM',))):
+            listed = []
+            for rank, name in enumerate(preferences):
+                if name not in course_index:
+                    unknown[name] += 1
+                    continue
+                demand = report.course_demand[name]['demand']
+                demand.extend([0] * (rank + 1 - len(demand)))
+                demand[rank] += 1
+                c = course_index[name]
+                if courses[c].time_slot in slots:
+                    listed.append(c)
+            lists.append(list(dict.fromkeys(listed)))
+
+    capacities = [course.max_students for course in courses]
+    report.am_matching = max_capacitated_matching(am_lists, capacities)
+    report.pm_matching = max_capacitated_matching(pm_lists, capacities)
+
+    if report.capacity < report.num_students:
+        report.errors.append(
+            f"{report.num_students} students but only {report.capacity} can be seated "
+            f"(AM {report.seats['AM']}, PM {report.seats['PM']}, FullDay {report.seats['FullDay']} seats)"
+        )
+    for name, stats in report.course_demand.items():
+        if stats['demand'] and stats['demand'][0] > stats['max_students']:
+            report.warnings.append(
+                f"{name}: {stats['demand'][0]} first choices for {stats['max_students']} seats"
+            )
+    for name, count in sorted(unknown.items()):
+        report.warnings.append(f"{count} preferences name unknown course {name!r}")
+    if report.am_matching < report.num_students:
+        report.warnings.append(
+            f"At most {report.am_matching} of {report.num_students} students can get a course from their AM list"
+        )
+
+    report.elapsed = time.time() - start_time
+    logger.info(f"Feasibility check in {report.elapsed * 1000:.1f} ms: capacity {report.capacity} "
+                f"for {report.num_students} students, AM matching {report.am_matching}, "
+                f"PM matching {report.pm_matching}")
+    return report
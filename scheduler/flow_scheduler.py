@@ -0,0 +1,263 @@
+"""
+Min-cost-flow based scheduler implementation.
+Assigning students to AM and PM courses is a transportation problem, so a
+network-flow solver finds the optimum in polynomial time instead of running a MIP.
+"""
+import logging
+import time
+from collections import defaultdict
+from typing import Dict
+
+import numpy as np
+from ortools.graph.python import min_cost_flow
+
+from .models import calculate_satisfaction_score
+from .ortools_scheduler import ORToolsScheduler, TIME_SLOTS
+
+logger = logging.getLogger(__name__)
+
+
+class FlowScheduler(ORToolsScheduler):
+    """
+    Google OR-Tools SimpleMinCostFlow implementation of the scheduler algorithm.
+
+    Students send one unit of flow each to a course, courses pass at most
+    max_students units on to the sink, and every student -> course arc costs
+    the priority-weighted satisfaction penalty of that assignment.
+
+    The day is solved in two stages:
+    1. Every student is routed to an AM course or a FullDay course. The AM
+       courses together may only take as many students as there are PM seats.
+    2. Students that got an AM course are routed to a PM course.
+
+    Without FullDay courses the two stages are independent and the result is
+    optimal for the rank-based objective.
+    """
+
+    # Arc costs must be integers, so weighted penalties are scaled by this factor
+    COST_SCALE = 1000
+
+    def run_with_config(self, config: Dict) -> Dict:
+        """
+        Run the scheduler with the given configuration using min-cost flow
+
+        Args:
+            config: Dict with configuration parameters
+
+        Returns:
+            Dict: Schedule results in the same format as ORToolsScheduler
+        """
+        start_time = time.time()
+        priority_weights = self._get_priority_weights(
+            config.get('priority_weight', 'standard'),
+            config.get('custom_weights', None)
+        )
+
+        courses_by_slot = {
+            slot: [c for c in self.courses if c.time_slot == slot]
+            for slot in TIME_SLOTS
+        }
+        ordered_students = sorted(self.students, key=lambda student: student.priority)
+        weights = [priority_weights.get(student.priority, 1.0) for student in ordered_students]
+
+        # Stage 1: AM or FullDay, keeping AM enrolment within the PM supply
+        pm_capacity = sum(c.max_students for c in courses_by_slot['PM'])
+        first_stage, first_cost = self._solve_flow(
+            ordered_students, weights,
+            {'AM': courses_by_slot['AM'], 'FullDay': courses_by_slot['FullDay']},
+            slot_limits={'AM': pm_capacity}
+        )
+
+        # Stage 2: PM course for everyone who got an AM course
+        am_indices = [s for s, course in enumerate(first_stage) if course and course.time_slot == 'AM']
+        second_stage, second_cost = self._solve_flow(
+            [ordered_students[s] for s in am_indices],
+            [weights[s] for s in am_indices],
+            {'PM': courses_by_slot['PM']}
+        )
+
+        assignments = [{} for _ in ordered_students]
+        for s, course in enumerate(first_stage):
+            if course:
+                assignments[s][course.time_slot] = course
+        for s, course in zip(am_indices, second_stage):
+            if course:
+                assignments[s]['PM'] = course
+
+        self.objective_value = (first_cost + second_cost) / self.COST_SCALE
+        logger.info(f"Min-cost flow solved in {time.time() - start_time:.3f} seconds "
+                    f"with objective {self.objective_value:.4f}")
+
+        self._store_assignments(ordered_students, assignments)
+        return self._format_result()
+
+    def _penalty(self, student, slot, course_name=None):
+        """
+        Satisfaction penalty of giving a student a course in the given slot
+
+        The penalty uses the same ranks and normaliser as
+        Student.satisfaction_score, so the AM and PM penalties of a student add
+        up to their satisfaction score.
+
+        Args:
+            student: Student object
+            slot: Time slot of the course
+            course_name: Course name, or None for a course outside the preferences
+
+        Returns:
+            float: Penalty between 0 and 1
+        """
+        am_prefs = student.get_am_preferences()
+        pm_prefs = student.get_pm_preferences()
+
+        def rank(prefs):
+            return prefs.index(course_name) if course_name in prefs else len(prefs)
+
+        normaliser = max(len(am_prefs) - 1, 0) + max(len(pm_prefs) - 1, 0)
+        if slot == 'AM':
+            positions = rank(am_prefs) if am_prefs else 0
+        elif slot == 'PM':
+            positions = rank(pm_prefs) if pm_prefs else 0
+        else:
+            positions = (rank(am_prefs) if am_prefs else 0) + (rank(pm_prefs) if pm_prefs else 0)
+        return positions / max(normaliser, 1)
+
+    def _solve_flow(self, students, weights, slot_courses, slot_limits=None):
+        """
+        Assign each student at most one course from the given slots
+
+        Courses a student did not list are reached through one shared
+        "unlisted" node per slot, keeping the network at O(listed preferences)
+        arcs instead of O(students x courses).
+
+        Args:
+            students: Students to route
+            weights: Priority weight for each student
+            slot_courses: Dict mapping time slot to the courses available in it
+            slot_limits: Optional dict capping the total flow into a slot
+
+        Returns:
+            Tuple of (list with the Course or None per student, total cost)
+        """
+        slot_limits = slot_limits or {}
+        if not students:
+            return [], 0
+
+        smcf = min_cost_flow.SimpleMinCostFlow()
+        source, sink = 0, 1
+        next_node = 2 + len(students)
+        tails, heads, capacities, costs = [], [], [], []
+
+        def add_arc(tail, head, capacity, cost=0):
+            tails.append(tail)
+            heads.append(head)
+            capacities.append(capacity)
+            costs.append(cost)
+            return len(tails) - 1
+
+        courses_by_name = {c.name: c for courses in slot_courses.values() for c in courses}
+        course_nodes = {}
+        unlisted_nodes = {}
+        fanout_arcs = []
+        for slot, courses in slot_courses.items():
+            if not courses:
+                continue
+            exit_node = sink
+            if slot in slot_limits:
+                exit_node = next_node
+                next_node += 1
+                add_arc(exit_node, sink, int(slot_limits[slot]))
+
+            unlisted_nodes[slot] = next_node
+            next_node += 1
+            for course in courses:
+                course_nodes[course.name] = next_node
+                fanout_arcs.append((slot, course, add_arc(unlisted_nodes[slot], next_node, len(students))))
+                add_arc(next_node, exit_node, course.max_students)
+                next_node += 1
+
+        listed_arcs = []
+        unlisted_arcs = []
+        for s, student in enumerate(students):
+            student_node = 2 + s
+            add_arc(source, student_node, 1)
+
+            slot_preferences = {
+                'AM': student.get_am_preferences(),
+                'PM': student.get_pm_preferences(),
+                'FullDay': student.get_am_preferences() + student.get_pm_preferences()
+            }
+            for slot, courses in slot_courses.items():
+                for name in dict.fromkeys(slot_preferences[slot]):
+                    course = courses_by_name.get(name)
+                    if course and course.time_slot == slot:
+                        cost = self._scaled_cost(weights[s], self._penalty(student, slot, name))
+                        listed_arcs.append((s, course, add_arc(student_node, course_nodes[name], 1, cost)))
+
+            for slot, node in unlisted_nodes.items():
+                cost = self._scaled_cost(weights[s], self._penalty(student, slot))
+                unlisted_arcs.append((s, slot, add_arc(student_node, node, 1, cost)))
+
+        smcf.add_arcs_with_capacity_and_unit_cost(
+            np.array(tails), np.array(heads), np.array(capacities), np.array(costs)
+        )
+        supplies = np.zeros(next_node, dtype=np.int64)
+        supplies[source] = len(students)
+        supplies[sink] = -len(students)
+        smcf.set_nodes_supplies(np.arange(next_node), supplies)
+
+        status = smcf.solve_max_flow_with_min_cost()
+        if status != smcf.OPTIMAL:
+            logger.error(f"Min-cost flow solver failed with status {status}")
+            return [None] * len(students), 0
+
+        flows = smcf.flows(np.arange(len(tails)))
+        result = [None] * len(students)
+        for s, course, arc in listed_arcs:
+            if flows[arc] > 0:
+                result[s] = course
+
+        # Hand out the seats routed through the unlisted nodes; they all cost the same
+        unlisted_seats = defaultdict(list)
+        for slot, course, arc in fanout_arcs:
+            unlisted_seats[slot].extend([course] * int(flows[arc]))
+        for s, slot, arc in unlisted_arcs:
+            if flows[arc] > 0:
+                result[s] = unlisted_seats[slot].pop()
+
+        return result, smcf.optimal_cost()
+
+    def _scaled_cost(self, weight, penalty):
+        """Convert a weighted penalty to an integer arc cost"""
+        return int(round(weight * penalty * self.COST_SCALE))
+
+    def _store_assignments(self, students, assignments):
+        """
+        Record the solved assignments as the scheduler result
+
+        Args:
+            students: Students in solver order
+            assignments: One dict per student mapping time slot to Course
+        """
+        self.enrolled_counts = defaultdict(int)
+        self.student_assignments = []
+        for student, courses in zip(students, assignments):
+            names = {slot: course.name for slot, course in courses.items()}
+            for course in courses.values():
+                self.enrolled_counts[course.name] += 1
+            self.student_assignments.append({
+                'student_id': student.id,
+                'student_name': f"{student.first_name} {student.last_name}",
+                'am_course': names.get('AM'),
+                'pm_course': names.get('PM'),
+                'full_day_course': names.get('FullDay'),
+                'satisfaction_score': calculate_satisfaction_score(
+                    student.get_am_preferences(),
+                    student.get_pm_preferences(),
+                    names.get('AM'), names.get('PM'), names.get('FullDay')
+                )
+            })
+
+        total_score = sum(a['satisfaction_score'] for a in self.student_assignments)
+        self.schedule_score = total_score / len(students) if students else 0.0
+        self.schedule_name = f"Flow_Schedule_{self.schedule_score:.2f}"
@@ -0,0 +1,577 @@
+"""
+Background solve jobs.
+The web request only records a SolveJob and hands its id to a Celery
+worker; the worker runs the same engine path as the synchronous API,
+publishes incumbents to the job's progress channel and persists the result
+through the normal Schedule path. Cancelling a queued job makes the worker
+skip it; cancelling a running one stops the solver at its next incumbent
+and discards the result.
+
+With 'distributed' and 'multiple_runs' set, the runs of a job are fanned
+out over the Celery workers instead: each run is its own task solving the
+ProblemInstance cached under its fingerprint, and a chord callback keeps
+the best run and persists only that one.
+
+Results are cached under the content hash of the dataset and config, so
+an identical re-run materializes the cached assignment without solving.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from celery import chord
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import SchedulerCache
+from .engines import DEFAULT_ENGINE, ENGINES, race_objective, run_engine
+from .feasibility import InfeasibleProblemError, check_feasibility
+from .models import Course, Student, SolveJob
+from .persistence import ASSIGNMENT_FIELDS, persist_schedule_result
+from .problem import ProblemInstance
+from .progress import ProgressChannel
+from .rust_interface import RustSchedulerInterface
+from .singleflight import SolveFlight, solve_request_hash
+
+logger = logging.getLogger(__name__)
+
+# Config keys passed through to the engines unchanged
+PASSTHROUGH_KEYS = (
+    'time_limit_seconds', 'custom_weights', 'engine', 'formulation',
+    'solver_backend', 'num_workers', 'warm_start', 'batch_size',
+    'local_search', 'local_search_time_limit', 'local_search_iterations',
+    'neighbourhood_size', 'repair_time_limit', 'max_iterations', 'objective_mode',
+    'progress_id', 'distributed', 'portfolio'
+)
+
+
+def build_scheduler_config(config_data: Dict) -> Dict:
+    """
+    Translate an API scheduler config into the engine config
+
+    Args:
+        config_data: Config as posted to the run endpoints
+
+    Returns:
+        dict: Config for RustSchedulerInterface, with 'race' and
+        'race_size' set when several engines should be raced
+    """
+    multiple_runs = config_data.get('multiple_runs', False)
+    scheduler_config = {
+        'iterations': config_data.get('iterations', 1000),
+        'min_course_fill': config_data.get('min_course_fill', 0.75),
+        'early_stop_score': config_data.get('early_stop_score', 0.0),
+        'priority_weight': config_data.get('priority_weight', 'standard')
+    }
+
+    for key in PASSTHROUGH_KEYS:
+        if key in config_data:
+            scheduler_config[key] = config_data[key]
+
+    # Multiple runs are handled by the engine, which solves them in parallel
+    if multiple_runs:
+        scheduler_config['multiple_runs'] = True
+        scheduler_config['run_count'] = config_data.get('run_count', 3)
+
+    # Racing runs several engines in parallel and keeps the first proven optimum
+    race = config_data.get('race', False)
+    if race:
+        scheduler_config['race'] = race if isinstance(race, list) else None
+        scheduler_config['race_size'] = config_data.get('race_size', 4)
+    return scheduler_config
+
+
+def result_cache_key(scheduler_config: Dict, courses=None, students=None) -> str:
+    """
+    Content hash a solve's result is cached under
+
+    The ProblemInstance fingerprint covers every course (name, slot,
+    capacity) and student (priority, preferences) the engines read, and
+    solve_request_hash adds the normalized config.
+    """
+    fingerprint = ProblemInstance.from_database(courses, students).fingerprint()
+    return solve_request_hash(scheduler_config, fingerprint)
+
+
+def compact_result(result: Dict) -> Dict:
+    """
+    Reduce a scheduler result to what persisting it needs
+
+    Course names are stored once and assignments as rows of
+    [student_id, am, pm, full_day, satisfaction] with course indexes.
+    """
+    names = []
+    indexes = {None: -1}
+    rows = []
+    for entry in result.get('students', []):
+        row = [entry['student_id'] if 'student_id' in entry else entry['id']]
+        for field in ASSIGNMENT_FIELDS:
+            name = entry.get(field)
+            if name not in indexes:
+                indexes[name] = len(names)
+                names.append(name)
+            row.append(indexes[name])
+        row.append(entry.get('satisfaction_score', entry.get('score', 0.0)))
+        rows.append(row)
+    return {
+        'score': result['score'],
+        'name': result.get('name'),
+        'engine': result.get('engine'),
+        'portfolio': result.get('portfolio'),
+        'race': result.get('race'),
+        'warnings': result.get('warnings', []),
+        'courses': names,
+        'students': rows
+    }
+
+
+def expand_result(compact: Dict) -> Dict:
+    """Rebuild a scheduler result from compact_result for persist_schedule_result"""
+    names = compact['courses']
+    students = []
+    for row in compact['students']:
+        entry = {'student_id': row[0], 'satisfaction_score': row[-1]}
+        for field, index in zip(ASSIGNMENT_FIELDS, row[1:-1]):
+            entry[field] = names[index] if index >= 0 else None
+        students.append(entry)
+    result = {key: value for key, value in compact.items() if key not in ('courses', 'students')}
+    if not result['name']:
+        del result['name']
+    result['students'] = students
+    result['cached'] = True
+    return result
+
+
+def cached_scheduler_result(key: str) -> Optional[Dict]:
+    """
+    Look up the result of an identical earlier solve
+
+    Args:
+        key: The solve's result_cache_key
+
+    Returns:
+        dict: The cached scheduler result, marked 'cached', or None on a miss
+    """
+    compact = SchedulerCache.get_schedule_cache(SchedulerCache.DEFAULT_SCHOOL_ID, request=key)
+    if compact is None:
+        return None
+    logger.info(f"Serving solve {key[:12]} from the result cache")
+    return expand_result(compact)
+
+
+def run_configured_scheduler(scheduler_config: Dict, courses=None, students=None,
+                             key: Optional[str] = None) -> Optional[Dict]:
+    """
+    Run the engine (or engine race) a built config asks for
+
+    The result is stored in the result cache for cached_scheduler_result;
+    callers check the cache first.
+
+    Args:
+        scheduler_config: Config from build_scheduler_config
+        courses: Courses to schedule, all courses by default
+        students: Students to schedule, all students by default
+        key: The solve's result_cache_key if the caller already computed it
+
+    Returns:
+        dict: The scheduler result, or None if no engine produced one
+    """
+    courses = Course.objects.all() if courses is None else courses
+    students = Student.objects.all() if students is None else students
+    # Hash the dataset before solving, so edits made during the solve miss the cache
+    if key is None:
+        key = result_cache_key(scheduler_config, courses, students)
+    scheduler_interface = RustSchedulerInterface()
+    if 'race' in scheduler_config:
+        result = scheduler_interface.run_scheduler_parallel(
+            courses=courses,
+            students=students,
+            config=scheduler_config,
+            num_threads=scheduler_config.get('race_size', 4)
+        )
+    else:
+        result = scheduler_interface.run_scheduler(courses=courses, students=students, config=scheduler_config)
+    if result:
+        SchedulerCache.set_schedule_cache(SchedulerCache.DEFAULT_SCHOOL_ID, compact_result(result), request=key)
+    return result
+
+
+def enqueue_solve_job(config_data: Dict, user=None) -> SolveJob:
+    """
+    Record a solve job and dispatch it to a worker once the record is committed
+
+    A request identical to a job still queued or running (same dataset and
+    normalized config) joins that job's waiter list and gets the job back,
+    with its 'coalesced' attribute set, instead of a new one.
+
+    Args:
+        config_data: Scheduler config as posted to the API
+        user: User who requested the solve, if authenticated
+
+    Returns:
+        SolveJob: The queued job, or the in-flight job the request joined
+    """
+    from .tasks import run_solve_job_task
+
+    request_hash = solve_request_hash(build_scheduler_config(config_data))
+    flight = SolveFlight(request_hash)
+    leader = live_flight_leader(flight)
+    if leader is not None and leader['job_id'] is not None:
+        job = SolveJob.objects.filter(pk=leader['job_id']).first()
+        if job is not None and not job.is_finished:
+            waiters = flight.join(leader, user=user.username if user else None)
+            logger.info(f"Coalesced request with solve job {job.id} ({waiters} waiting)")
+            job.coalesced = True
+            return job
+
+    job = SolveJob.objects.create(
+        config=config_data, task_id=str(uuid.uuid4()), request_hash=request_hash, created_by=user
+    )
+    if flight.lead(job.id) is None:
+        # A synchronous solve or a job that just took over holds the flight; solve independently
+        logger.info(f"Solve flight {request_hash[:12]} is held elsewhere, job {job.id} runs on its own")
+    # Streams of a job still waiting for a worker see a started channel
+    ProgressChannel(job.progress_id).status('queued')
+    transaction.on_commit(lambda: run_solve_job_task.apply_async(args=[job.id], task_id=job.task_id))
+    logger.info(f"Queued solve job {job.id}")
+    job.coalesced = False
+    return job
+
+
+def live_flight_leader(flight: SolveFlight) -> Optional[Dict]:
+    """
+    The leader of a flight worth joining
+
+    A flight led by a job that finished without landing it, or whose worker
+    stopped sending heartbeats, is abandoned so the caller can take it over.
+
+    Args:
+        flight: SolveFlight of the request
+
+    Returns:
+        dict: The lock value of the live flight, or None if nothing is in the air
+    """
+    leader = flight.leader()
+    if leader is None or leader['job_id'] is None:
+        return leader
+    job = SolveJob.objects.filter(pk=leader['job_id']).first()
+    if job is not None and not job.is_finished and not job.is_stale:
+        return leader
+    logger.warning(f"Taking over solve flight {flight.request_hash[:12]} from {job or 'a deleted solve job'}")
+    flight.abandon(leader)
+    return None
+
+
+@contextmanager
+def job_heartbeat(job_id: int):
+    """
+    Refresh the job's heartbeat_at from a background thread for the duration of the block
+
+    Args:
+        job_id: Id of the SolveJob the block works on
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(SolveJob.HEARTBEAT_INTERVAL):
+                SolveJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Heartbeat of solve job {job_id} stopped: {e}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"solve-job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_solve_job(job_id: int) -> SolveJob:
+    """
+    Execute a queued solve job; called by the worker
+
+    Args:
+        job_id: Id of the SolveJob
+
+    Returns:
+        SolveJob: The job in its final state
+    """
+    # Claiming the job atomically keeps a job cancelled while queued from starting
+    now = timezone.now()
+    claimed = SolveJob.objects.filter(pk=job_id, status=SolveJob.QUEUED).update(
+        status=SolveJob.RUNNING, started_at=now, heartbeat_at=now
+    )
+    job = SolveJob.objects.get(pk=job_id)
+    if not claimed:
+        logger.info(f"Solve job {job_id} is {job.status}, not running it")
+        return job
+
+    scheduler_config = build_scheduler_config(job.config)
+    scheduler_config['progress_id'] = job.progress_id
+    try:
+        if scheduler_config.get('distributed') and scheduler_config.get('multiple_runs'):
+            # The chord callback finishes the job once every run has reported
+            dispatch_distributed_runs(job, scheduler_config)
+            job.refresh_from_db()
+            return job
+        # Hash the data as it is now; it may have changed since the job was queued
+        key = result_cache_key(scheduler_config)
+        result = cached_scheduler_result(key) or run_configured_scheduler(scheduler_config, key=key)
+    except Exception as e:
+        logger.error(f"Solve job {job_id} failed: {e}")
+        return finish_solve_job(job, None, error=str(e))
+    return finish_solve_job(job, result)
+
+
+def finish_solve_job(job: SolveJob, result: Optional[Dict], error: Optional[str] = None) -> SolveJob:
+    """
+    Record the outcome of a running job, persisting its result unless it was cancelled
+
+    Args:
+        job: The running SolveJob
+        result: Scheduler result, or None if no engine produced one
+        error: Error message if the solve failed
+
+    Returns:
+        SolveJob: The job in its final state
+    """
+    job.refresh_from_db(fields=['cancel_requested'])
+    if job.cancel_requested:
+        job.status = SolveJob.CANCELLED
+    elif error:
+        job.status = SolveJob.FAILED
+        job.error = error
+    elif not result:
+        job.status = SolveJob.FAILED
+        job.error = 'Scheduler did not return a valid result'
+    else:
+        schedule = persist_schedule_result(result)
+        job.status = SolveJob.SUCCEEDED
+        job.schedule = schedule
+        job.score = schedule.score
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'schedule', 'score', 'error', 'finished_at'])
+    ProgressChannel(job.progress_id).finish(
+        status=job.status, schedule_id=job.schedule_id, score=job.score, error=job.error or None
+    )
+    release_solve_flight(job)
+    logger.info(f"Solve job {job.id} {job.status} in {(job.finished_at - job.started_at).total_seconds():.2f}s")
+    return job
+
+
+def release_solve_flight(job: SolveJob):
+    """
+    Land the job's solve flight, if the job leads it, so identical requests start a new solve
+
+    Waiters get the outcome in the shape a synchronous leader publishes:
+    the status code and body of the run_scheduler response. A cancelled
+    job releases the flight without an outcome, so synchronous waiters
+    solve for themselves.
+    """
+    if not job.request_hash:
+        return
+    flight = SolveFlight(job.request_hash)
+    leader = flight.leader()
+    if leader is None or leader['job_id'] != job.id:
+        return
+    if job.status == SolveJob.CANCELLED:
+        flight.abandon(leader)
+    elif job.status == SolveJob.SUCCEEDED:
+        flight.finish(leader, status_code=200, data={
+            'message': 'Scheduler completed successfully',
+            'schedule_id': job.schedule_id,
+            'score': job.score,
+            'job_id': job.id
+        })
+    else:
+        flight.finish(leader, status_code=500, data={'error': job.error, 'job_id': job.id})
+
+
+def fan_out_run_configs(scheduler_config: Dict) -> List[Dict]:
+    """
+    Derive one single-run config per distributed run
+
+    Runs cycle through scheduler_config['portfolio'], a list of overrides
+    such as {'engine': 'alns'}, {'priority_weight': 'strong'} or
+    {'solver_backend': 'cp_sat'}, each with its own seed. Without a
+    portfolio the runs differ by seed only.
+
+    Args:
+        scheduler_config: Config from build_scheduler_config
+
+    Returns:
+        List of engine configs, one per run
+    """
+    variants = scheduler_config.get('portfolio') or [{}]
+    base = {
+        key: value for key, value in scheduler_config.items()
+        if key not in ('multiple_runs', 'run_count', 'distributed', 'portfolio', 'race', 'race_size')
+    }
+    return [
+        {**base, **variants[run % len(variants)], 'seed': run}
+        for run in range(scheduler_config.get('run_count', 3))
+    ]
+
+
+def dispatch_distributed_runs(job: SolveJob, scheduler_config: Dict):
+    """
+    Fan the runs of a job out as a Celery chord
+
+    The problem is read with two queries, checked for feasibility and
+    cached once under its fingerprint; every run task receives only the
+    fingerprint. Runs of strict engines are dropped if the problem is
+    infeasible, the others still produce partial schedules. A chord needs
+    a Celery result backend.
+
+    Args:
+        job: The running SolveJob
+        scheduler_config: Config from build_scheduler_config
+
+    Raises:
+        InfeasibleProblemError: If every run uses a strict engine and the
+            courses cannot seat every student
+    """
+    from .tasks import reduce_runs_task, solve_run_task
+
+    problem = ProblemInstance.from_database()
+    report = check_feasibility(problem.course_records(), problem.student_records())
+    run_configs = fan_out_run_configs(scheduler_config)
+    if not report.feasible:
+        run_configs = [
+            run_config for run_config in run_configs
+            if not getattr(ENGINES.get(run_config.get('engine', DEFAULT_ENGINE)), 'strict', False)
+        ]
+        if not run_configs:
+            raise InfeasibleProblemError(report)
+        logger.warning(f"Solve job {job.id}: scheduling an infeasible problem with "
+                       f"{len(run_configs)} non-strict runs: {'; '.join(report.errors)}")
+
+    fingerprint = problem.fingerprint()
+    SchedulerCache.set_problem_instance(fingerprint, problem.to_bytes())
+    logger.info(f"Solve job {job.id}: dispatching {len(run_configs)} runs of problem {fingerprint[:12]}")
+    chord(
+        solve_run_task.s(fingerprint, run_config, job_id=job.id) for run_config in run_configs
+    )(reduce_runs_task.s(job.id))
+
+
+def solve_problem_run(fingerprint: str, run_config: Dict) -> Dict:
+    """
+    Solve one distributed run of a cached problem
+
+    Failures are reported in the returned dict rather than raised, so one
+    failing run does not stop the chord from reducing the others.
+
+    Args:
+        fingerprint: Cache key of the ProblemInstance
+        run_config: Engine config for this run
+
+    Returns:
+        Dict with the run's 'config', 'engine', 'objective' (average
+        satisfaction score), 'elapsed', 'error' and the 'students'
+        assignments of its schedule
+    """
+    start_time = time.time()
+    run = {'config': run_config, 'engine': None, 'objective': None, 'students': None, 'error': None}
+    progress = ProgressChannel.from_config(run_config)
+    try:
+        if progress is not None and progress.stop_requested():
+            run['error'] = 'cancelled'
+            return run
+        data = SchedulerCache.get_problem_instance(fingerprint)
+        if data is None:
+            raise LookupError(f"Problem {fingerprint} is no longer cached")
+        problem = ProblemInstance.from_buffer(data)
+        ortools_available = not RustSchedulerInterface().using_python_impl
+        result, selection = run_engine(
+            problem.course_records(), problem.student_records(), dict(run_config),
+            ortools_available=ortools_available, load_sections=False
+        )
+        run['engine'] = selection['name']
+        if result:
+            run['objective'] = race_objective(result)
+            run['students'] = [
+                {
+                    'student_id': entry['student_id'] if 'student_id' in entry else entry['id'],
+                    'am_course': entry.get('am_course'),
+                    'pm_course': entry.get('pm_course'),
+                    'full_day_course': entry.get('full_day_course'),
+                    'satisfaction_score': entry['satisfaction_score']
+                }
+                for entry in result['students']
+            ]
+    except Exception as e:
+        logger.error(f"Run {run_config} of problem {fingerprint[:12]} failed: {e}")
+        run['error'] = str(e)
+    finally:
+        run['elapsed'] = time.time() - start_time
+    if progress is not None:
+        # Solvers publish their own incumbents; 'run' events report each finished run
+        progress.publish('run', objective=run['objective'], solver_elapsed=run['elapsed'],
+                         engine=run['engine'], seed=run_config['seed'], error=run['error'])
+    return run
+
+
+def reduce_problem_runs(job_id: int, runs: List[Dict]) -> SolveJob:
+    """
+    Keep the best distributed run and persist only its schedule
+
+    Args:
+        job_id: Id of the SolveJob the runs belong to
+        runs: Dicts returned by solve_problem_run
+
+    Returns:
+        SolveJob: The job in its final state
+    """
+    job = SolveJob.objects.get(pk=job_id)
+    solved = [run for run in runs if run['students'] is not None]
+    summary = [
+        {key: run[key] for key in ('config', 'engine', 'objective', 'elapsed', 'error')}
+        for run in runs
+    ]
+    if not solved:
+        errors = sorted({run['error'] for run in runs if run['error']})
+        return finish_solve_job(job, None, error='; '.join(errors) or None)
+
+    best = min(solved, key=lambda run: run['objective'])
+    logger.info(f"Solve job {job_id}: best of {len(runs)} runs is {best['config']} "
+                f"with score {best['objective']:.4f}")
+    result = {
+        'name': f"Distributed_Schedule_{best['objective']:.2f}",
+        'score': best['objective'],
+        'students': best['students'],
+        'portfolio': {'winner': best['config'], 'runs': summary}
+    }
+    return finish_solve_job(job, result)
+
+
+def cancel_solve_job(job: SolveJob) -> SolveJob:
+    """
+    Cancel a queued or running job
+
+    A queued job is marked cancelled and skipped by the worker that picks
+    it up. A running job has its solver stopped through the progress
+    channel; the worker then records it as cancelled without persisting.
+
+    Args:
+        job: The SolveJob to cancel
+
+    Returns:
+        SolveJob: The refreshed job
+    """
+    if SolveJob.objects.filter(pk=job.pk, status=SolveJob.QUEUED).update(
+        status=SolveJob.CANCELLED, finished_at=timezone.now()
+    ):
+        ProgressChannel(job.progress_id).finish(status=SolveJob.CANCELLED)
+        release_solve_flight(job)
+    elif SolveJob.objects.filter(pk=job.pk, status=SolveJob.RUNNING).update(cancel_requested=True):
+        ProgressChannel(job.progress_id).request_stop()
+    job.refresh_from_db()
+    return job
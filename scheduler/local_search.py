@@ -0,0 +1,372 @@
+"""
+Local-search improvement phase for scheduler results.
+Runs after any engine: greedy results, and MIP results cut short by a time
+limit, are polished by moving students into free seats of courses they rank
+higher and by swapping seats between pairs of students. Every move is scored
+with an O(1) delta from precomputed preference-rank tables instead of
+rescoring the whole schedule.
+"""
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+from .problem import get_priority_weights
+
+logger = logging.getLogger(__name__)
+
+SLOT_FIELDS = {'AM': 'am_course', 'PM': 'pm_course', 'FullDay': 'full_day_course'}
+
+# Smallest weighted improvement accepted, guards against float noise
+EPSILON = 1e-9
+
+
+class LocalSearch:
+    """
+    First-improvement local search over an assignment.
+
+    Each student holds a first course (AM or FullDay) and, with an AM
+    course, a second (PM) course, stored as course indices (-1 for none).
+    The objective is the priority-weighted sum of satisfaction scores, which
+    is lower for better schedules; a missing seat ranks below every course
+    of its slot, so any seat beats none.
+    """
+
+    def __init__(self, courses, students, priority_weights=None):
+        """
+        Build the rank tables for a dataset
+
+        Args:
+            courses: List of Course objects
+            students: List of Student objects
+            priority_weights: Dictionary mapping priority levels to weights
+        """
+        priority_weights = priority_weights or {}
+        self.courses = list(courses)
+        self.students = list(students)
+        self.course_index = {course.name: c for c, course in enumerate(self.courses)}
+        self.student_index = {student.id: s for s, student in enumerate(self.students)}
+        self.slots = [course.time_slot for course in self.courses]
+        self.weights = [priority_weights.get(student.priority, 1.0) for student in self.students]
+
+        # Rank of each listed course per student (first occurrence wins, as list.index does)
+        self.am_ranks = []
+        self.pm_ranks = []
+        self.am_lengths = []
+        self.pm_lengths = []
+        for student in self.students:
+            for ranks, lengths, preferences in ((self.am_ranks, self.am_lengths, student.get_am_preferences()),
+                                                (self.pm_ranks, self.pm_lengths, student.get_pm_preferences())):
+                table = {}
+                for position, name in enumerate(preferences):
+                    if name in self.course_index:
+                        table.setdefault(self.course_index[name], position)
+                ranks.append(table)
+                lengths.append(len(preferences))
+
+        # Listed courses per student by role, best first
+        self.listed_am = [[c for c in ranks if self.slots[c] == 'AM'] for ranks in self.am_ranks]
+        self.listed_pm = [[c for c in ranks if self.slots[c] == 'PM'] for ranks in self.pm_ranks]
+        self.listed_full_day = [
+            list(dict.fromkeys(c for c in list(am) + list(pm) if self.slots[c] == 'FullDay'))
+            for am, pm in zip(self.am_ranks, self.pm_ranks)
+        ]
+        self.am_courses = [c for c, slot in enumerate(self.slots) if slot == 'AM']
+        self.pm_courses = [c for c, slot in enumerate(self.slots) if slot == 'PM']
+
+    def satisfaction(self, s, first, second) -> float:
+        """
+        Satisfaction score of student s holding the given courses
+
+        Same value as calculate_satisfaction_score, computed in O(1) from the
+        rank tables. A missing seat is not counted.
+        """
+        am_length = self.am_lengths[s]
+        pm_length = self.pm_lengths[s]
+        positions = 0
+        normaliser = 0
+        if first >= 0 and self.slots[first] == 'FullDay':
+            if am_length:
+                positions += self.am_ranks[s].get(first, am_length)
+                normaliser += am_length - 1
+            if pm_length:
+                positions += self.pm_ranks[s].get(first, pm_length)
+                normaliser += pm_length - 1
+        else:
+            if first >= 0 and am_length:
+                positions += self.am_ranks[s].get(first, am_length)
+                normaliser += am_length - 1
+            if second >= 0 and pm_length:
+                positions += self.pm_ranks[s].get(second, pm_length)
+                normaliser += pm_length - 1
+        return positions / normaliser if normaliser > 0 else 0.0
+
+    def score(self, s, first, second) -> float:
+        """
+        Score of student s holding the given courses, as the search minimises it
+
+        Equal to satisfaction() for a full set of courses. A missing AM or
+        PM seat counts one position below an unlisted course of its slot,
+        so filling it with any course is an improvement.
+        """
+        if first >= 0 and (second >= 0 or self.slots[first] == 'FullDay'):
+            return self.satisfaction(s, first, second)
+        positions = 0
+        normaliser = 0
+        for course, ranks, length in ((first, self.am_ranks[s], self.am_lengths[s]),
+                                      (second, self.pm_ranks[s], self.pm_lengths[s])):
+            positions += ranks.get(course, length) if course >= 0 else length + 1
+            normaliser += max(length - 1, 0)
+        return positions / normaliser if normaliser > 0 else float(positions)
+
+    def load(self, result: Dict):
+        """
+        Read the assignment out of a scheduler result
+
+        Args:
+            result: Scheduler result whose 'students' entries carry
+                'student_id' (or 'id') and course names
+        """
+        self.first = [-1] * len(self.students)
+        self.second = [-1] * len(self.students)
+        for entry in result.get('students', []):
+            s = self.student_index.get(entry['student_id'] if 'student_id' in entry else entry['id'])
+            if s is None:
+                continue
+            if entry.get('full_day_course') in self.course_index:
+                self.first[s] = self.course_index[entry['full_day_course']]
+            else:
+                self.first[s] = self.course_index.get(entry.get('am_course'), -1)
+                self.second[s] = self.course_index.get(entry.get('pm_course'), -1)
+
+        self.members = [set() for _ in self.courses]
+        for s in range(len(self.students)):
+            for c in (self.first[s], self.second[s]):
+                if c >= 0:
+                    self.members[c].add(s)
+        self.free = [course.max_students - len(self.members[c]) for c, course in enumerate(self.courses)]
+
+    def objective(self) -> float:
+        """Priority-weighted sum of satisfaction scores of the loaded assignment"""
+        return sum(
+            self.weights[s] * self.score(s, self.first[s], self.second[s])
+            for s in range(len(self.students))
+        )
+
+    def _open(self, listed, courses):
+        """Listed courses with a free seat, else the first course of the slot with one"""
+        found = [c for c in listed if self.free[c] > 0]
+        return found or [c for c in courses if self.free[c] > 0][:1]
+
+    def _candidates(self, s, first, second):
+        """Assignments worth trying for student s, as (first, second) pairs"""
+        if first < 0:
+            # Without any seat: a listed FullDay course or a free pair of half days
+            for c in self.listed_full_day[s]:
+                yield c, -1
+            for am in self._open(self.listed_am[s], self.am_courses):
+                for pm in self._open(self.listed_pm[s], self.pm_courses):
+                    yield am, pm
+        elif self.slots[first] == 'AM':
+            rank_am = self.am_ranks[s].get(first, self.am_lengths[s])
+            rank_pm = self.pm_ranks[s].get(second, self.pm_lengths[s])
+            for c in self.listed_am[s]:
+                if self.am_ranks[s][c] < rank_am:
+                    yield c, second
+            for c in self.listed_pm[s]:
+                if self.pm_ranks[s][c] < rank_pm:
+                    yield first, c
+            if second < 0:
+                # A missing PM seat is filled from free capacity, listed or not
+                for c in self._open(self.listed_pm[s], self.pm_courses):
+                    yield first, c
+            for c in self.listed_full_day[s]:
+                yield c, -1
+        else:
+            for c in self.listed_full_day[s]:
+                if c != first:
+                    yield c, -1
+            # Trading a FullDay seat for half days needs a free PM seat too
+            open_pm = self._open(self.listed_pm[s], self.pm_courses)
+            for c in self.listed_am[s]:
+                for pm in open_pm:
+                    yield c, pm
+
+    def _improve_student(self, s) -> Optional[str]:
+        """
+        Apply the best improving move or swap for student s
+
+        Returns:
+            'move', 'swap' or None if nothing improved
+        """
+        first, second = self.first[s], self.second[s]
+        current = self.score(s, first, second)
+        best = None
+
+        for new_first, new_second in self._candidates(s, first, second):
+            delta = self.weights[s] * (self.score(s, new_first, new_second) - current)
+            if delta >= -EPSILON:
+                continue
+            needed = [c for c in (new_first, new_second) if c >= 0 and c not in (first, second)]
+            if all(self.free[c] > 0 for c in needed):
+                best = (delta, 'move', None, new_first, new_second)
+                continue
+            if (len(needed) != 1 or first < 0
+                    or (self.slots[first] == 'FullDay') != (self.slots[new_first] == 'FullDay')):
+                continue
+
+            # The course is full: swap seats with one of its students in the same slot
+            wanted = needed[0]
+            given = second if self.slots[wanted] == 'PM' else first
+            if given < 0:
+                # Nothing to give back: the seat would only move from the partner to s
+                continue
+            for t in self.members[wanted]:
+                t_first, t_second = self.first[t], self.second[t]
+                if self.slots[wanted] == 'PM':
+                    t_new = (t_first, given)
+                elif self.slots[wanted] == 'AM':
+                    t_new = (given, t_second)
+                else:
+                    t_new = (given, -1)
+                t_delta = self.weights[t] * (self.score(t, *t_new) - self.score(t, t_first, t_second))
+                total = delta + t_delta
+                if total < -EPSILON and (best is None or total < best[0]):
+                    best = (total, 'swap', (t, t_new), new_first, new_second)
+
+        if best is None:
+            return None
+        _, kind, partner, new_first, new_second = best
+        if partner is not None:
+            t, t_new = partner
+            self._reassign(t, (-1, -1))
+            self._reassign(s, (new_first, new_second))
+            self._reassign(t, t_new)
+        else:
+            self._reassign(s, (new_first, new_second))
+        return kind
+
+    def _reassign(self, s, courses):
+        """Give student s the (first, second) courses, updating seat counts"""
+        for c in (self.first[s], self.second[s]):
+            if c >= 0:
+                self.members[c].discard(s)
+                self.free[c] += 1
+        self.first[s], self.second[s] = courses
+        for c in courses:
+            if c >= 0:
+                self.members[c].add(s)
+                self.free[c] -= 1
+
+    def improve(self, time_limit_seconds=2.0, max_iterations=None, seed=None) -> Dict:
+        """
+        Sweep over the students until no move improves or the budget runs out
+
+        Students missing a seat are moved into free capacity, since a missing
+        seat scores worse than any course.
+
+        Args:
+            time_limit_seconds: Wall-clock budget
+            max_iterations: Optional cap on the number of students examined
+            seed: Optional seed for the sweep order
+
+        Returns:
+            Dict with the number of iterations, moves and swaps and the
+            objective before and after
+        """
+        start_time = time.time()
+        rng = random.Random(seed)
+        stats = {'iterations': 0, 'moves': 0, 'swaps': 0, 'objective_before': self.objective()}
+        order = list(range(len(self.students)))
+
+        def out_of_budget():
+            if max_iterations is not None and stats['iterations'] >= max_iterations:
+                return True
+            return time.time() - start_time > time_limit_seconds
+
+        improved = True
+        while improved and not out_of_budget():
+            improved = False
+            rng.shuffle(order)
+            for s in order:
+                if out_of_budget():
+                    break
+                stats['iterations'] += 1
+                kind = self._improve_student(s)
+                if kind:
+                    stats[f'{kind}s'] += 1
+                    improved = True
+
+        stats['objective_after'] = self.objective()
+        stats['elapsed'] = time.time() - start_time
+        return stats
+
+    def apply(self, result: Dict) -> Dict:
+        """
+        Write the improved assignment back into the scheduler result
+
+        Student entries, course enrolment counts and the score are updated.
+        The Python engine reports a summed score, the OR-Tools engines an
+        average one; the convention of the result is kept.
+        """
+        scores = []
+        for entry in result.get('students', []):
+            s = self.student_index.get(entry['student_id'] if 'student_id' in entry else entry['id'])
+            if s is None:
+                continue
+            names = {'AM': None, 'PM': None, 'FullDay': None}
+            for c in (self.first[s], self.second[s]):
+                if c >= 0:
+                    names[self.slots[c]] = self.courses[c].name
+            for slot, field in SLOT_FIELDS.items():
+                entry[field] = names[slot]
+            entry['satisfaction_score'] = self.satisfaction(s, self.first[s], self.second[s])
+            scores.append(entry['satisfaction_score'])
+
+        total = sum(scores)
+        if 'sections' in result:
+            result['score'] = total
+            for section in result['sections']:
+                c = self.course_index[section['course_name']]
+                section['enrolled_students'] = len(self.members[c])
+                section['student_ids'] = [self.students[s].id for s in self.members[c]]
+        else:
+            result['score'] = total / len(scores) if scores else 0.0
+            for course in result.get('courses', []):
+                course['enrolled'] = len(self.members[self.course_index[course['name']]])
+        return result
+
+
+def improve_result(courses, students, result: Dict, config: Dict) -> Dict:
+    """
+    Run the local-search phase on a scheduler result
+
+    Args:
+        courses: List of Course objects
+        students: List of Student objects
+        result: Result returned by any engine
+        config: Dict with configuration parameters; reads 'priority_weight',
+            'custom_weights', 'local_search_time_limit' (seconds, default 2)
+            and 'local_search_iterations'
+
+    Returns:
+        Dict: The improved result, with the search statistics under 'local_search'
+    """
+    if not result:
+        return result
+    priority_weights = get_priority_weights(
+        config.get('priority_weight', 'standard'), config.get('custom_weights', None)
+    )
+    search = LocalSearch(courses, students, priority_weights)
+    search.load(result)
+    stats = search.improve(
+        time_limit_seconds=config.get('local_search_time_limit', 2.0),
+        max_iterations=config.get('local_search_iterations', None),
+        seed=config.get('seed', None)
+    )
+    logger.info(f"Local search made {stats['moves']} moves and {stats['swaps']} swaps in "
+                f"{stats['elapsed']:.2f}s, objective {stats['objective_before']:.4f} -> "
+                f"{stats['objective_after']:.4f}")
+    result = search.apply(result)
+    result['local_search'] = stats
+    return result
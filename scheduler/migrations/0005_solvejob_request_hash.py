@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("scheduler", "0004_solvejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="solvejob",
+            name="request_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Content hash of the dataset and config, shared by coalesced requests",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("scheduler", "0005_solvejob_request_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="solvejob",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Last sign of life from the worker running the job",
+                null=True,
+            ),
+        ),
+    ]
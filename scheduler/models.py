@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
 from django.conf import settings
+from django.utils import timezone
 
 
 class UserPreference(models.Model):
@@ -147,61 +148,87 @@ class Student(models.Model):
     
     def satisfaction_score(self):
         """Calculate student satisfaction based on course assignments"""
-        score = 0.0
-        max_score = 0
+        return calculate_satisfaction_score(
+            self.am_preferences,
+            self.pm_preferences,
+            self.am_course.name if self.am_course else None,
+            self.pm_course.name if self.pm_course else None,
+            self.full_day_course.name if self.full_day_course else None
+        )
+
+
+def calculate_satisfaction_score(am_preferences, pm_preferences, am_course=None, pm_course=None, full_day_course=None):
+    """
+    Calculate student satisfaction from preference lists and assigned course names.
+    
+    This is the computation behind Student.satisfaction_score, usable by the
+    schedulers without loading course objects.
+    
+    Args:
+        am_preferences: Ordered list of AM course names
+        pm_preferences: Ordered list of PM course names
+        am_course: Name of the assigned AM course, if any
+        pm_course: Name of the assigned PM course, if any
+        full_day_course: Name of the assigned full-day course, if any
         
-        # Calculate AM satisfaction
-        if self.am_course and self.am_preferences:
-            if self.am_course.name in self.am_preferences:
-                position = self.am_preferences.index(self.am_course.name)
-                score += position  # Lower index = higher preference = lower score
-            else:
-                score += len(self.am_preferences)  # Worst possible score is length of preference list
-            max_score += len(self.am_preferences) - 1
+    Returns:
+        float: Score between 0 (best) and 1 (worst)
+    """
+    score = 0.0
+    max_score = 0
+    
+    # Calculate AM satisfaction
+    if am_course and am_preferences:
+        if am_course in am_preferences:
+            position = am_preferences.index(am_course)
+            score += position  # Lower index = higher preference = lower score
+        else:
+            score += len(am_preferences)  # Worst possible score is length of preference list
+        max_score += len(am_preferences) - 1
+    
+    # Calculate PM satisfaction
+    if pm_course and pm_preferences:
+        if pm_course in pm_preferences:
+            position = pm_preferences.index(pm_course)
+            score += position  # Lower index = higher preference = lower score
+        else:
+            score += len(pm_preferences)  # Worst possible score is length of preference list
+        max_score += len(pm_preferences) - 1
+    
+    # Calculate full-day course satisfaction
+    if full_day_course:
+        total_positions = 0
+        total_max = 0
         
-        # Calculate PM satisfaction
-        if self.pm_course and self.pm_preferences:
-            if self.pm_course.name in self.pm_preferences:
-                position = self.pm_preferences.index(self.pm_course.name)
-                score += position  # Lower index = higher preference = lower score
-            else:
-                score += len(self.pm_preferences)  # Worst possible score is length of preference list
-            max_score += len(self.pm_preferences) - 1
+        # Check if full-day course is in AM preferences
+        if am_preferences and full_day_course in am_preferences:
+            position = am_preferences.index(full_day_course)
+            total_positions += position
+            total_max += len(am_preferences) - 1
+        else:
+            if am_preferences:
+                total_positions += len(am_preferences)
+                total_max += len(am_preferences) - 1
         
-        # Calculate full-day course satisfaction
-        if self.full_day_course:
-            total_positions = 0
-            total_max = 0
-            
-            # Check if full-day course is in AM preferences
-            if self.am_preferences and self.full_day_course.name in self.am_preferences:
-                position = self.am_preferences.index(self.full_day_course.name)
-                total_positions += position
-                total_max += len(self.am_preferences) - 1
-            else:
-                if self.am_preferences:
-                    total_positions += len(self.am_preferences)
-                    total_max += len(self.am_preferences) - 1
-            
-            # Check if full-day course is in PM preferences
-            if self.pm_preferences and self.full_day_course.name in self.pm_preferences:
-                position = self.pm_preferences.index(self.full_day_course.name)
-                total_positions += position
-                total_max += len(self.pm_preferences) - 1
-            else:
-                if self.pm_preferences:
-                    total_positions += len(self.pm_preferences)
-                    total_max += len(self.pm_preferences) - 1
-            
-            # Average the positions if we have any
-            if total_max > 0:
-                score = total_positions
-                max_score = total_max
+        # Check if full-day course is in PM preferences
+        if pm_preferences and full_day_course in pm_preferences:
+            position = pm_preferences.index(full_day_course)
+            total_positions += position
+            total_max += len(pm_preferences) - 1
+        else:
+            if pm_preferences:
+                total_positions += len(pm_preferences)
+                total_max += len(pm_preferences) - 1
         
-        # Normalize score to be between 0 and 1
-        if max_score > 0:
-            return score / max_score
-        return 0.0  # No preferences or no courses assigned
+        # Average the positions if we have any
+        if total_max > 0:
+            score = total_positions
+            max_score = total_max
+    
+    # Normalize score to be between 0 and 1
+    if max_score > 0:
+        return score / max_score
+    return 0.0  # No preferences or no courses assigned
 
 class Section(models.Model):
     """
@@ -237,11 +264,13 @@ class Section(models.Model):
         if self.enrolled_students_count < self.max_students:
             if self.course.time_slot == 'AM':
                 student.am_course = self.course
+                student.save(update_fields=['am_course'])
             elif self.course.time_slot == 'PM':
                 student.pm_course = self.course
+                student.save(update_fields=['pm_course'])
             else:  # FullDay
                 student.full_day_course = self.course
-            student.save()
+                student.save(update_fields=['full_day_course'])
             return True
         return False
     
@@ -249,15 +278,15 @@ class Section(models.Model):
         """Remove a student from this section"""
         if self.course.time_slot == 'AM' and student.am_course == self.course:
             student.am_course = None
-            student.save()
+            student.save(update_fields=['am_course'])
             return True
         elif self.course.time_slot == 'PM' and student.pm_course == self.course:
             student.pm_course = None
-            student.save()
+            student.save(update_fields=['pm_course'])
             return True
         elif student.full_day_course == self.course:
             student.full_day_course = None
-            student.save()
+            student.save(update_fields=['full_day_course'])
             return True
         return False
     
@@ -284,11 +313,11 @@ class Schedule(models.Model):
     
     def save_snapshot(self):
         """Save the current state of all student enrollments"""
-        students = Student.objects.all()
+        students = Student.objects.select_related('am_course', 'pm_course', 'full_day_course')
         
-        for student in students:
-            # Save student's current course assignments
-            snapshot = ScheduleSnapshot(
+        # Save each student's current course assignments in bulk
+        ScheduleSnapshot.objects.bulk_create([
+            ScheduleSnapshot(
                 schedule=self,
                 student=student,
                 am_course=student.am_course,
@@ -296,7 +325,8 @@ class Schedule(models.Model):
                 full_day_course=student.full_day_course,
                 satisfaction_score=student.satisfaction_score()
             )
-            snapshot.save()
+            for student in students
+        ], batch_size=500)
     
     def calculate_metrics(self):
         """Calculate performance metrics for this schedule"""
@@ -358,3 +388,62 @@ class SchedulerConfig(models.Model):
     
     def __str__(self):
         return f"Config: {self.name}"
+
+
+class SolveJob(models.Model):
+    """
+    A scheduler run executed in the background by a Celery worker
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+    # A running job's worker refreshes heartbeat_at this often, in seconds
+    HEARTBEAT_INTERVAL = 30
+    # A running job without a heartbeat for this long is presumed dead
+    HEARTBEAT_TIMEOUT = HEARTBEAT_INTERVAL * 3
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    config = models.JSONField(default=dict, help_text="Scheduler configuration as posted to the API")
+    task_id = models.CharField(max_length=255, blank=True)
+    schedule = models.ForeignKey(Schedule, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    score = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    request_hash = models.CharField(max_length=64, blank=True, db_index=True,
+                                    help_text="Content hash of the dataset and config, shared by coalesced requests")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True,
+                                        help_text="Last sign of life from the worker running the job")
+    
+    def __str__(self):
+        return f"Solve job {self.pk} ({self.status})"
+    
+    @property
+    def progress_id(self):
+        """Progress channel the job's solver publishes its incumbents to"""
+        return f"job-{self.pk}"
+    
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+    
+    @property
+    def is_stale(self):
+        """Whether the job is running but its worker stopped sending heartbeats"""
+        if self.status != self.RUNNING:
+            return False
+        last_beat = self.heartbeat_at or self.started_at
+        return last_beat is None or (timezone.now() - last_beat).total_seconds() > self.HEARTBEAT_TIMEOUT
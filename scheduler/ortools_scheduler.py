@@ -3,16 +3,306 @@ OR-Tools based scheduler implementation.
 This should be significantly faster than the pure Python implementation.
 """
 import logging
+import os
 from typing import List, Dict, Optional, Tuple, Union
 import time
+import threading
 import numpy as np
 import random
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from ortools.linear_solver import pywraplp
-from .models import Course, Student, Section, Schedule, UserPreference
+from ortools.sat.python import cp_model
+from .models import Course, Student, Section, Schedule, UserPreference, calculate_satisfaction_score
+from .aggregation import StudentClass, group_students, disaggregate
+from .problem import ProblemInstance, get_priority_weights
+from .admission import usable_cpus
+from .progress import ProgressChannel
 
 logger = logging.getLogger(__name__)
 
+TIME_SLOTS = ('AM', 'PM', 'FullDay')
+
+# Penalty for a course outside the student's preferences (FullDay always counts
+# as non-preferred because it replaces both the AM and the PM choice)
+SLOT_PENALTIES = {'AM': 0.5, 'PM': 0.5, 'FullDay': 1.0}
+
+# Student field holding the course for each time slot
+SLOT_FIELDS = {'AM': 'am_course', 'PM': 'pm_course', 'FullDay': 'full_day_course'}
+
+# Length of one SCIP solve when progress is streamed, in seconds
+PROGRESS_SLICE_SECONDS = 2.0
+
+
+class MIPBackend:
+    """Thin wrapper around a pywraplp SCIP solver used by the model builder"""
+    
+    name = 'scip'
+    # SCIP's own default of randomization/randomseedshift
+    DEFAULT_SEED = 0
+    
+    def __init__(self, time_limit_seconds, num_workers=None, seed=None):
+        self.solver = pywraplp.Solver.CreateSolver('SCIP')
+        self.hint_vars = []
+        self.hint_values = []
+        self.time_limit_seconds = time_limit_seconds
+        # pywraplp has no solution callback; incumbents are only observed
+        # between the time slices used when a progress channel is attached
+        self.incumbents = []
+        self.progress = None
+        self.solution = None
+        if self.solver:
+            self.solver.SetTimeLimit(int(time_limit_seconds * 1000))  # milliseconds
+            if num_workers:
+                self.solver.SetNumThreads(num_workers)
+            if seed is not None:
+                self.set_seed(seed)
+    
+    @property
+    def available(self):
+        return self.solver is not None
+    
+    def bool_var(self, name):
+        return self.solver.BoolVar(name)
+    
+    def int_var(self, upper_bound, name):
+        return self.solver.IntVar(0, upper_bound, name)
+    
+    def sum(self, terms):
+        return self.solver.Sum(terms)
+    
+    def add(self, constraint):
+        self.solver.Add(constraint)
+    
+    def minimize(self, terms):
+        """Minimize the sum of (coefficient, variable) terms, replacing any previous objective"""
+        objective = self.solver.Objective()
+        objective.Clear()
+        for coef, var in terms:
+            objective.SetCoefficient(var, objective.GetCoefficient(var) + coef)
+        objective.SetMinimization()
+    
+    def add_objective_bound(self, terms, bound):
+        """Constrain the sum of (coefficient, variable) terms to at most bound"""
+        self.solver.Add(self.solver.Sum([coef * var for coef, var in terms]) <= bound + 1e-6)
+    
+    def set_time_limit(self, time_limit_seconds):
+        self.time_limit_seconds = time_limit_seconds
+        self.solver.SetTimeLimit(int(time_limit_seconds * 1000))
+    
+    def set_seed(self, seed):
+        self.solver.SetSolverSpecificParametersAsString(f"randomization/randomseedshift = {seed}\n")
+    
+    def add_hint(self, var, value):
+        self.hint_vars.append(var)
+        self.hint_values.append(float(value))
+    
+    def clear_hints(self):
+        self.hint_vars = []
+        self.hint_values = []
+    
+    def solve(self):
+        """Solve the model and return the status name ('OPTIMAL', 'FEASIBLE' or a failure)"""
+        self.solver.SetHint(self.hint_vars, self.hint_values)
+        self.incumbents = []
+        self.solution = None
+        if self.progress is not None:
+            return self._solve_in_slices()
+        return self._status_name(self.solver.Solve())
+    
+    def _status_name(self, status):
+        if status == pywraplp.Solver.OPTIMAL:
+            return 'OPTIMAL'
+        if status == pywraplp.Solver.FEASIBLE:
+            return 'FEASIBLE'
+        return 'NO_SOLUTION'
+    
+    def _solve_in_slices(self):
+        """Solve in PROGRESS_SLICE_SECONDS slices, publishing every improvement
+        
+        Each slice restarts SCIP hinted with the best solution so far, whose
+        values are kept in self.solution in case a later slice finds nothing.
+        Stops at optimality, at the time limit or when the user accepts the
+        current incumbent.
+        """
+        start_time = time.time()
+        status = 'NO_SOLUTION'
+        best = None
+        while True:
+            remaining = self.time_limit_seconds - (time.time() - start_time)
+            self.solver.SetTimeLimit(int(max(min(PROGRESS_SLICE_SECONDS, remaining), 0.01) * 1000))
+            slice_status = self._status_name(self.solver.Solve())
+            if slice_status != 'NO_SOLUTION':
+                objective = self.solver.Objective().Value()
+                if best is None or objective < best - 1e-9:
+                    best = objective
+                    variables = self.solver.variables()
+                    values = [var.solution_value() for var in variables]
+                    self.solution = {'values': dict(zip((var.index() for var in variables), values)),
+                                     'objective': objective}
+                    bound = self.solver.Objective().BestBound()
+                    incumbent = {
+                        'objective': objective,
+                        'bound': bound,
+                        'gap': (objective - bound) / max(abs(objective), 1e-9),
+                        'elapsed': time.time() - start_time
+                    }
+                    self.incumbents.append(incumbent)
+                    self.progress.incumbent(**incumbent, backend=self.name)
+                    self.solver.SetHint(variables, values)
+                status = 'OPTIMAL' if slice_status == 'OPTIMAL' else 'FEASIBLE'
+            if status == 'OPTIMAL' or remaining <= PROGRESS_SLICE_SECONDS or self.progress.stop_requested():
+                break
+        self.solver.SetTimeLimit(int(self.time_limit_seconds * 1000))
+        return status
+    
+    def value(self, var):
+        if self.solution is not None:
+            return self.solution['values'][var.index()]
+        return var.solution_value()
+    
+    def objective_value(self):
+        if self.solution is not None:
+            return self.solution['objective']
+        return self.solver.Objective().Value()
+    
+    def size(self):
+        return self.solver.NumVariables(), self.solver.NumConstraints()
+
+
+class IncumbentRecorder(cp_model.CpSolverSolutionCallback):
+    """CP-SAT callback recording every improving solution found during the search
+    
+    With a progress channel, each incumbent is also published, and the
+    search stops once the user accepts the current one.
+    """
+    
+    def __init__(self, objective_scale, progress=None):
+        super().__init__()
+        self.objective_scale = objective_scale
+        self.progress = progress
+        self.incumbents = []
+    
+    def on_solution_callback(self):
+        objective = self.ObjectiveValue() / self.objective_scale
+        bound = self.BestObjectiveBound() / self.objective_scale
+        incumbent = {
+            'objective': objective,
+            'bound': bound,
+            'gap': (objective - bound) / max(abs(objective), 1e-9),
+            'elapsed': self.WallTime()
+        }
+        self.incumbents.append(incumbent)
+        if self.progress is not None:
+            self.progress.incumbent(**incumbent, backend=CPSATBackend.name)
+            if self.progress.stop_requested():
+                self.StopSearch()
+
+
+class CPSATBackend:
+    """
+    Wrapper around the CP-SAT solver used by the model builder.
+    
+    CP-SAT only accepts integer coefficients, so objective coefficients are
+    scaled by OBJECTIVE_SCALE and rounded. The search runs on num_workers
+    parallel workers.
+    """
+    
+    name = 'cp_sat'
+    OBJECTIVE_SCALE = 1000
+    # CP-SAT's own default of random_seed
+    DEFAULT_SEED = 1
+    
+    def __init__(self, time_limit_seconds, num_workers=None, seed=None):
+        self.model = cp_model.CpModel()
+        self.solver = cp_model.CpSolver()
+        self.solver.parameters.max_time_in_seconds = float(time_limit_seconds)
+        self.solver.parameters.num_workers = num_workers or len(usable_cpus())
+        if seed is not None:
+            self.set_seed(seed)
+        self.num_constraints = 0
+        self.progress = None
+        self.recorder = IncumbentRecorder(self.OBJECTIVE_SCALE)
+    
+    @property
+    def available(self):
+        return True
+    
+    def bool_var(self, name):
+        return self.model.NewBoolVar(name)
+    
+    def int_var(self, upper_bound, name):
+        return self.model.NewIntVar(0, upper_bound, name)
+    
+    def sum(self, terms):
+        return cp_model.LinearExpr.Sum(terms)
+    
+    def add(self, constraint):
+        self.model.Add(constraint)
+        self.num_constraints += 1
+    
+    def minimize(self, terms):
+        """Minimize the sum of (coefficient, variable) terms with integer-scaled coefficients
+        
+        Replaces any previous objective of the model.
+        """
+        self.model.Minimize(cp_model.LinearExpr.WeightedSum(
+            [var for _, var in terms],
+            [int(round(coef * self.OBJECTIVE_SCALE)) for coef, _ in terms]
+        ))
+    
+    def add_objective_bound(self, terms, bound):
+        """Constrain the sum of (coefficient, variable) terms to at most bound, on the objective scale"""
+        self.add(cp_model.LinearExpr.WeightedSum(
+            [var for _, var in terms],
+            [int(round(coef * self.OBJECTIVE_SCALE)) for coef, _ in terms]
+        ) <= int(round(bound * self.OBJECTIVE_SCALE)))
+    
+    def set_time_limit(self, time_limit_seconds):
+        self.solver.parameters.max_time_in_seconds = float(time_limit_seconds)
+    
+    def set_seed(self, seed):
+        self.solver.parameters.random_seed = seed
+    
+    def add_hint(self, var, value):
+        self.model.AddHint(var, int(value))
+    
+    def clear_hints(self):
+        self.model.ClearHints()
+    
+    @property
+    def incumbents(self):
+        return self.recorder.incumbents
+    
+    def solve(self):
+        """Solve the model and return the status name ('OPTIMAL', 'FEASIBLE' or a failure)"""
+        self.recorder = IncumbentRecorder(self.OBJECTIVE_SCALE, self.progress)
+        return self.solver.StatusName(self.solver.Solve(self.model, self.recorder))
+    
+    def value(self, var):
+        return self.solver.Value(var)
+    
+    def objective_value(self):
+        return self.solver.ObjectiveValue() / self.OBJECTIVE_SCALE
+    
+    def size(self):
+        return len(self.model.Proto().variables), self.num_constraints
+
+
+SOLVER_BACKENDS = {
+    'scip': MIPBackend,
+    'cp_sat': CPSATBackend,
+}
+
+# Solver variations cycled through by multiple_runs portfolios
+PORTFOLIO_VARIANTS = [
+    {},
+    {'solver_backend': 'cp_sat'},
+    {'formulation': 'sparse'},
+    {'solver_backend': 'cp_sat', 'formulation': 'sparse'},
+]
+
 class ORToolsScheduler:
     """
     Google OR-Tools implementation of the scheduler algorithm.
@@ -26,22 +316,27 @@ class ORToolsScheduler:
     - Runtime parameter tuning
     """
     
-    def __init__(self, courses, students):
+    def __init__(self, courses, students, load_sections=True):
         """
         Initialize the scheduler with courses and students
         
         Args:
             courses: List of Course objects
             students: List of Student objects
+            load_sections: Whether to create missing Sections; disabled when
+                solving plain records from a ProblemInstance away from the database
         """
         self.courses = courses
         self.students = students
         self.course_name_to_section = {}
         self.best_schedule = None
         self.all_schedules = []  # For multiple run optimization
+        self.incumbents = []  # Improving solutions reported by the last solve
+        self.progress = None  # ProgressChannel incumbents are published to
         
         # Initialize sections for all courses
-        self.load_sections()
+        if load_sections:
+            self.load_sections()
     
     def load_sections(self):
         """Create a Section for each course"""
@@ -81,54 +376,31 @@ class ORToolsScheduler:
         # Custom satisfaction thresholds (if provided)
         satisfaction_thresholds = config.get('satisfaction_thresholds', None)
         
+        # Publish incumbents when the caller streams progress
+        self.progress = ProgressChannel.from_config(config)
+        
         # Extract configuration
         time_limit_seconds = config.get('time_limit_seconds', 20)
+        formulation = config.get('formulation', 'dense')
+        solver_backend = config.get('solver_backend', 'scip')
+        num_workers = config.get('num_workers', None)
+        solver_options = {
+            'formulation': formulation,
+            'solver_backend': solver_backend,
+            'num_workers': num_workers,
+            'solution_hint': self.load_solution_hint(config.get('warm_start', None)),
+            'aggregate': config.get('aggregate', False),
+            'objective_mode': config.get('objective_mode', 'weighted')
+        }
         
         if multiple_runs:
-            # Run the scheduler multiple times and pick the best result
-            logger.info(f"Running scheduler {run_count} times with {priority_weight_mode} priority weights")
-            best_score = float('inf')
-            best_result = None
-            self.all_schedules = []
-            
-            for run in range(run_count):
-                # For each run, we shuffle students to get different results
-                shuffled_students = list(self.students)
-                random.shuffle(shuffled_students)
-                self.students = shuffled_students
-                
-                # Run a single optimization
-                result = self._run_single_optimization(time_limit_seconds, min_course_fill, priority_weights)
-                
-                # Store this result
-                self.all_schedules.append({
-                    'name': f"Run_{run+1}_{self.schedule_name}",
-                    'score': self.schedule_score,
-                    'assignments': self.student_assignments
-                })
-                
-                # Keep track of the best result
-                if self.schedule_score < best_score:
-                    best_score = self.schedule_score
-                    best_result = result
-                    self.best_schedule = {
-                        'name': f"Best_{self.schedule_name}",
-                        'score': self.schedule_score,
-                        'assignments': self.student_assignments
-                    }
-                
-                logger.info(f"Run {run+1}/{run_count} completed with score {self.schedule_score:.4f}")
-                
-                # Check for early stopping
-                if early_stop_score > 0 and self.schedule_score <= early_stop_score:
-                    logger.info(f"Early stopping at run {run+1} with score {self.schedule_score:.4f}")
-                    break
-            
-            # Return the best result from all runs
-            return best_result
+            # Solve a portfolio of differently configured runs in parallel and keep the best
+            logger.info(f"Running a portfolio of {run_count} solves with {priority_weight_mode} priority weights")
+            return self._run_portfolio(config, run_count, time_limit_seconds, priority_weights,
+                                       solver_options, early_stop_score)
         else:
             # Just run once with the given configuration
-            return self._run_single_optimization(time_limit_seconds, min_course_fill, priority_weights)
+            return self._run_single_optimization(time_limit_seconds, min_course_fill, priority_weights, **solver_options)
     
     def _get_priority_weights(self, mode='standard', custom_weights=None):
         """Get priority weights based on the selected mode or custom values
@@ -140,230 +412,749 @@ class ORToolsScheduler:
         Returns:
             Dict: Mapping of priority level to weight value
         """
-        if custom_weights:
-            # Use custom weights provided by the user
-            return custom_weights
-        
-        # Predefined weight schemes
-        if mode == 'standard':
-            # Standard priority weights - moderately prioritizes higher grades
-            return {1: 1.0, 2: 0.8, 3: 0.6}
-        elif mode == 'strong':
-            # Strong priority weights - heavily prioritizes higher grades
-            return {1: 1.0, 2: 0.6, 3: 0.3}
-        elif mode == 'balanced':
-            # Balanced priority weights - gives more equal chances
-            return {1: 1.0, 2: 0.9, 3: 0.8}
-        else:
-            # Default to standard
-            return {1: 1.0, 2: 0.8, 3: 0.6}
+        return get_priority_weights(mode, custom_weights)
     
-    def _run_single_optimization(self, time_limit_seconds, min_course_fill, priority_weights):
+    def _run_single_optimization(self, time_limit_seconds, min_course_fill, priority_weights,
+                                 formulation='dense', solver_backend='scip', num_workers=None,
+                                 solution_hint=None, aggregate=False, objective_mode='weighted'):
         """Run a single optimization process
         
         Args:
             time_limit_seconds: Time limit for the solver in seconds
             min_course_fill: Minimum course fill rate as a fraction
             priority_weights: Dictionary mapping priority levels to weights
+            formulation: 'dense' (one variable per student and course) or 'sparse'
+                (variables only for listed preferences plus fallback slacks)
+            solver_backend: 'scip' (pywraplp MIP) or 'cp_sat' (parallel CP-SAT search)
+            num_workers: Number of search workers, defaults to all cores for CP-SAT
+            solution_hint: Optional dict mapping student id to assigned course ids,
+                as returned by load_solution_hint
+            aggregate: Whether to model students with identical priority and
+                preferences as one class with integer head-count variables
+            objective_mode: 'weighted' (one priority-weighted objective) or
+                'lexicographic' (optimize each priority tier in turn)
             
         Returns:
             Dict: Optimization results
         """
-        # Start timer
-        start_time = time.time()
-        logger.info("Starting OR-Tools scheduler")
+        assignments = self._solve_assignments(
+            time_limit_seconds, priority_weights, formulation=formulation,
+            solver_backend=solver_backend, num_workers=num_workers,
+            solution_hint=solution_hint, aggregate=aggregate, objective_mode=objective_mode
+        )
         
-        # Initialize the solver
-        solver = pywraplp.Solver.CreateSolver('SCIP')
-        if not solver:
+        if self.solver_status == 'UNAVAILABLE':
             logger.error("OR-Tools solver not available, falling back to Python implementation")
             from .scheduler_python import PythonScheduler
             fallback = PythonScheduler(self.courses, self.students)
-            return fallback.run_with_config(config)
+            return fallback.run_with_config({
+                'time_limit_seconds': time_limit_seconds,
+                'min_course_fill': min_course_fill
+            })
         
-        # Set time limit
-        solver.SetTimeLimit(time_limit_seconds * 1000)  # milliseconds
+        if assignments is None:
+            logger.error("No solution found by OR-Tools solver")
+            return {}
         
-        # Create data structures
-        # 1. Get all AM, PM and FullDay courses
-        am_courses = [c for c in self.courses if c.time_slot == 'AM']
-        pm_courses = [c for c in self.courses if c.time_slot == 'PM']
-        fd_courses = [c for c in self.courses if c.time_slot == 'FullDay']
+        result = self._apply_assignments(assignments)
+        result['status'] = self.solver_status
+        if objective_mode == 'lexicographic':
+            result['lexicographic'] = self.lexicographic_stages
+        return result
+    
+    def _solve_assignments(self, time_limit_seconds, priority_weights, formulation='dense',
+                           solver_backend='scip', num_workers=None, solution_hint=None,
+                           aggregate=False, seed=None, objective_mode='weighted'):
+        """Build and solve the model without touching the database
         
-        # Create course indices for easy reference
-        am_course_map = {c.id: i for i, c in enumerate(am_courses)}
-        pm_course_map = {c.id: i for i, c in enumerate(pm_courses)}
-        fd_course_map = {c.id: i for i, c in enumerate(fd_courses)}
+        Takes the same options as _run_single_optimization, plus a random seed
+        for the solver. Sets self.solver_status, self.objective_value and
+        self.incumbents.
         
-        # Create preference matrices
-        students_by_priority = {1: [], 2: [], 3: []}
-        for student in self.students:
-            students_by_priority[student.priority].append(student)
-            
-        # Create a unified list ordered by priority
-        ordered_students = []
-        for priority in [1, 2, 3]:
-            ordered_students.extend(students_by_priority[priority])
-        
-        # Create decision variables for all students and courses
-        # z[s][c] = 1 if student s is assigned to course c, 0 otherwise
-        z = {}
-        for s, student in enumerate(self.students):
-            # Get student priority weight
-            student_priority = student.priority
-            priority_weight = priority_weights.get(student_priority, 1.0)
-            
-            z[s] = {}
-            for c in self.courses:
-                z[s][c.id] = solver.IntVar(0, 1, f'z_{s}_{c.id}')
-                
-        # y[s][c] = 1 if student s is assigned to PM course c
-        y = {}
-        for s, student in enumerate(ordered_students):
-            y[s] = {}
-            for c in pm_courses:
-                y[s][c.id] = solver.IntVar(0, 1, f'y_{s}_{c.id}')
-        
-        # z[s][c] = 1 if student s is assigned to full-day course c
-        z = {}
-        for s, student in enumerate(ordered_students):
-            z[s] = {}
-            for c in fd_courses:
-                z[s][c.id] = solver.IntVar(0, 1, f'z_{s}_{c.id}')
-        
-        # Create satisfaction penalty variables (higher priority = lower penalties)
-        penalties = {}
-        for s, student in enumerate(ordered_students):
-            penalties[s] = solver.NumVar(0, solver.infinity(), f'penalty_{s}')
-        
-        # Add constraints
-        
-        # 1. Each student gets exactly one schedule type: AM+PM or FullDay
-        for s, student in enumerate(ordered_students):
-            # Sum of AM assignments
-            am_sum = solver.Sum([x[s][c.id] for c in am_courses])
-            # Sum of PM assignments
-            pm_sum = solver.Sum([y[s][c.id] for c in pm_courses])
-            # Sum of FD assignments
-            fd_sum = solver.Sum([z[s][c.id] for c in fd_courses])
-            
-            # Student gets either (1 AM AND 1 PM) course OR 1 FD course
-            solver.Add(am_sum == pm_sum)
-            solver.Add(am_sum + fd_sum == 1)
+        Returns:
+            List of (student, dict mapping time slot to Course) tuples, or None
+            if no solution was found
+        """
+        # Start timer
+        start_time = time.time()
+        logger.info(f"Starting OR-Tools scheduler ({solver_backend} backend, {formulation} formulation)")
         
-        # 2. Course capacity constraints
-        for c in am_courses:
-            solver.Add(solver.Sum([x[s][c.id] for s in range(len(ordered_students))]) <= c.max_students)
-            
-        for c in pm_courses:
-            solver.Add(solver.Sum([y[s][c.id] for s in range(len(ordered_students))]) <= c.max_students)
-            
-        for c in fd_courses:
-            solver.Add(solver.Sum([z[s][c.id] for s in range(len(ordered_students))]) <= c.max_students)
+        if objective_mode == 'lexicographic':
+            return self._solve_lexicographic(
+                time_limit_seconds, priority_weights, formulation, solver_backend,
+                num_workers, solution_hint, aggregate, seed
+            )
         
-        # 3. Calculate penalties based on preferences
-        for s, student in enumerate(ordered_students):
-            am_prefs = student.get_am_preferences()
-            pm_prefs = student.get_pm_preferences()
-            
-            # Calculate AM penalty
-            am_penalty = solver.Sum([
-                x[s][c.id] * (0.0 if c.name in am_prefs else 0.5)  # 0.5 penalty for non-preference AM
-                for c in am_courses
-            ])
+        # Reuse the variables and constraints if this dataset was compiled before
+        compiled = get_compiled_model(
+            self, solver_backend=solver_backend, formulation=formulation,
+            num_workers=num_workers, aggregate=aggregate
+        )
+        if not compiled.available:
+            self.solver_status = 'UNAVAILABLE'
+            return None
+        
+        assignments, self.solver_status, objective, self.incumbents = compiled.solve(
+            priority_weights, time_limit_seconds, solution_hint, seed, self.progress
+        )
+        if assignments is None:
+            return None
+        
+        logger.info(f"{self.solver_status.title()} solution found in {time.time() - start_time:.2f} seconds")
+        self.objective_value = objective
+        
+        # The compiled model may have been built from another scheduler's objects
+        students_by_id = {student.id: student for student in self.students}
+        courses_by_id = {course.id: course for course in self.courses}
+        return [
+            (students_by_id[student.id], {slot: courses_by_id[c.id] for slot, c in courses.items()})
+            for student, courses in assignments
+        ]
+    
+    def compare_weight_schemes(self, schemes, config: Dict) -> List[Dict]:
+        """Solve the dataset once per priority weight scheme
+        
+        The model is compiled once and every scheme only rewrites the
+        objective, warm-started from the previous scheme's solution. Nothing
+        is written to the database.
+        
+        Args:
+            schemes: List of weight mode names ('standard', 'strong', 'balanced')
+                or dicts mapping priority levels to weights
+            config: Dict with configuration parameters
             
-            # Calculate PM penalty
-            pm_penalty = solver.Sum([
-                y[s][c.id] * (0.0 if c.name in pm_prefs else 0.5)  # 0.5 penalty for non-preference PM
-                for c in pm_courses
-            ])
+        Returns:
+            List of dicts with the weights, status, objective and average
+            satisfaction score of each scheme
+        """
+        compiled = get_compiled_model(
+            self, solver_backend=config.get('solver_backend', 'scip'),
+            formulation=config.get('formulation', 'dense'),
+            num_workers=config.get('num_workers', None),
+            aggregate=config.get('aggregate', False)
+        )
+        weight_schemes = [
+            self._get_priority_weights(scheme) if isinstance(scheme, str) else scheme
+            for scheme in schemes
+        ]
+        results = compiled.solve_batch(weight_schemes, config.get('time_limit_seconds', 20))
+        for scheme, result in zip(schemes, results):
+            result['scheme'] = scheme
+            del result['assignments']
+        return results
+    
+    def _solve_lexicographic(self, time_limit_seconds, priority_weights, formulation, solver_backend,
+                             num_workers, solution_hint, aggregate, seed):
+        """Optimize the priority tiers one after another
+        
+        Tier 1 is solved on its own penalty; its optimum is then added as a
+        constraint and tier 2 is solved, and so on. Every stage is hinted
+        with the previous stage's solution and gets an equal share of the
+        time limit. The model is built once; each stage only swaps the
+        objective and adds one bound. Lower tiers still need seats, so
+        every stage keeps all students in the model. A tier the previous
+        stage already leaves unpenalised is not solved again.
+        
+        Sets self.lexicographic_stages to a list of dicts with the priority,
+        penalty, status and elapsed time of each stage, and
+        self.objective_value to the priority-weighted total.
+        
+        Returns:
+            List of (student, dict mapping time slot to Course) tuples, or None
+            if a stage found no solution
+        """
+        backend_class = SOLVER_BACKENDS.get(solver_backend, MIPBackend)
+        backend = backend_class(time_limit_seconds, num_workers, seed)
+        if not backend.available:
+            self.solver_status = 'UNAVAILABLE'
+            return None
+        backend.progress = self.progress
+        
+        courses_by_slot = {
+            slot: [c for c in self.courses if c.time_slot == slot]
+            for slot in TIME_SLOTS
+        }
+        ordered_students = sorted(self.students, key=lambda student: student.priority)
+        units = group_students(ordered_students) if aggregate else ordered_students
+        assign, fallback = self._build_model(
+            backend, units, courses_by_slot, None, sparse=(formulation == 'sparse')
+        )
+        penalty_terms = self._penalty_terms(units, assign, fallback)
+        tiers = sorted({unit.priority for unit in units})
+        
+        self.lexicographic_stages = []
+        self.incumbents = []
+        hint = solution_hint
+        assignments = None
+        tier_penalties = None
+        for tier in tiers:
+            stage_start = time.time()
+            tier_terms = [(penalty, var) for priority, penalty, var in penalty_terms if priority == tier]
+            if tier_penalties is not None and tier_penalties[tier] <= 1e-9:
+                # The previous stage already leaves this tier unpenalised, which is optimal
+                penalty = 0.0
+                status = 'OPTIMAL'
+            else:
+                backend.minimize(tier_terms)
+                backend.set_time_limit(time_limit_seconds / len(tiers))
+                backend.clear_hints()
+                if hint:
+                    self._apply_solution_hint(backend, units, assign, fallback, hint)
+                
+                status = self.solver_status = backend.solve()
+                self.incumbents.extend(backend.incumbents)
+                if status not in ('OPTIMAL', 'FEASIBLE'):
+                    logger.error(f"Lexicographic stage for priority {tier} failed ({status})")
+                    return None
+                
+                penalty = backend.objective_value()
+                tier_penalties = defaultdict(float)
+                for priority, coef, var in penalty_terms:
+                    tier_penalties[priority] += coef * backend.value(var)
+                assignments = self._extract_assignments(backend, units, courses_by_slot, assign, fallback)
+                hint = {student.id: {c.id for c in courses.values()} for student, courses in assignments}
             
-            # Calculate FD penalty (1.0 is higher because it replaces both AM+PM)
-            fd_penalty = solver.Sum([
-                z[s][c.id] * 1.0  # 1.0 penalty for any full day course
-                for c in fd_courses
-            ])
+            # Later tiers may not make this tier any worse (added after reading
+            # the solution, since changing the model discards it)
+            backend.add_objective_bound(tier_terms, penalty)
             
-            # Set the total penalty for this student
-            solver.Add(penalties[s] == am_penalty + pm_penalty + fd_penalty)
+            self.lexicographic_stages.append({
+                'priority': tier,
+                'penalty': penalty,
+                'status': status,
+                'elapsed': time.time() - stage_start
+            })
+            logger.info(f"Lexicographic stage for priority {tier}: penalty {penalty:.4f} "
+                        f"({status}) in {time.time() - stage_start:.2f} seconds")
         
-        # Setup objective - Priority weighted sum of penalties
-        # Use customizable priority weights that were passed to the function
-        # These weights determine how much influence each priority level has
+        self.objective_value = sum(
+            priority_weights.get(stage['priority'], 1.0) * stage['penalty']
+            for stage in self.lexicographic_stages
+        )
+        return assignments
+    
+    def _apply_assignments(self, assignments):
+        """Set solved assignments on the students and build the result
         
-        objective_terms = []
-        for s, student in enumerate(ordered_students):
-            # Get the weight for this student's priority level
-            weight = priority_weights.get(student.priority, 1.0)
+        Args:
+            assignments: List of (student, dict mapping time slot to Course) tuples
             
-            # Priority 1 students (highest priority) should have higher weights
-            # to ensure they get better satisfaction scores
-            objective_terms.append(weight * penalties[s])
+        Returns:
+            Dict: Formatted schedule result
+        """
+        # Assign courses in memory only; persistence.persist_schedule_result
+        # writes the chosen schedule in bulk
+        for student in self.students:
+            student.am_course = None
+            student.pm_course = None
+            student.full_day_course = None
+        
+        self.enrolled_counts = defaultdict(int)
+        for student, courses in assignments:
+            for slot, course in courses.items():
+                setattr(student, SLOT_FIELDS[slot], course)
+                self.enrolled_counts[course.name] += 1
+        
+        # Calculate total score for the schedule
+        # Normalize by number of students to keep scores low (between 0-1)
+        student_scores = [student.satisfaction_score() for student in self.students]
+        total_score = sum(student_scores) / len(self.students) if self.students else 0.0
+        
+        # Instead of creating a database entry, just store the calculated data
+        self.schedule_name = f"ORTools_Schedule_{total_score:.2f}"
+        self.schedule_score = total_score
+        
+        # Store student assignments for the result without creating database entries
+        self.student_assignments = []
+        for student in self.students:
+            assignment = {
+                'student_id': student.id,
+                'student_name': f"{student.first_name} {student.last_name}",
+                'am_course': student.am_course.name if student.am_course else None,
+                'pm_course': student.pm_course.name if student.pm_course else None,
+                'full_day_course': student.full_day_course.name if student.full_day_course else None,
+                'satisfaction_score': student.satisfaction_score()
+            }
+            self.student_assignments.append(assignment)
+        
+        # Return result
+        return self._format_result()
+    
+    def _portfolio_configs(self, config, run_count, solver_options):
+        """Derive one solver configuration per portfolio run
+        
+        Runs cycle through config['portfolio'] (default PORTFOLIO_VARIANTS) on
+        top of the requested solver options, each with its own seed. The
+        cores are split evenly between the runs.
+        """
+        variants = config.get('portfolio') or PORTFOLIO_VARIANTS
+        workers = max(1, len(usable_cpus()) // run_count)
+        base = {
+            'formulation': solver_options['formulation'],
+            'solver_backend': solver_options['solver_backend'],
+            'num_workers': solver_options['num_workers'] or workers,
+            'aggregate': solver_options['aggregate'],
+            'objective_mode': solver_options['objective_mode']
+        }
+        return [
+            {**base, **variants[run % len(variants)], 'seed': run}
+            for run in range(run_count)
+        ]
+    
+    def _run_portfolio(self, config, run_count, time_limit_seconds, priority_weights,
+                       solver_options, early_stop_score=0.0):
+        """Solve a portfolio of configurations in a process pool and keep the best
+        
+        Each process receives a compact ProblemInstance instead of ORM objects;
+        only the winning assignment is written back to the database.
+        
+        Returns:
+            Dict: Best schedule result with a 'portfolio' entry listing every
+            run's configuration, score and time, and the winning configuration
+        """
+        run_configs = self._portfolio_configs(config, run_count, solver_options)
+        problem = ProblemInstance.from_models(self.courses, self.students)
+        tasks = [
+            (problem, run_config, time_limit_seconds, priority_weights, solver_options['solution_hint'])
+            for run_config in run_configs
+        ]
+        
+        runs = []
+        try:
+            # The pool is managed by hand: leaving a with block would wait for
+            # the runs still solving, so stopping early would save no time
+            pool = ProcessPoolExecutor(max_workers=min(run_count, len(usable_cpus())),
+                                       initializer=_init_portfolio_worker)
+            stopped = False
+            try:
+                futures = [pool.submit(solve_portfolio_run, *task) for task in tasks]
+                for future in as_completed(futures):
+                    run = future.result()
+                    runs.append(run)
+                    logger.info(f"Portfolio run {run['config']} finished in {run['elapsed']:.2f}s "
+                                f"with score {run['score']}")
+                    if self.progress is not None and run['objective'] is not None:
+                        self.progress.incumbent(run['objective'], elapsed=run['elapsed'],
+                                                score=run['score'], config=run['config'])
+                        if self.progress.stop_requested():
+                            logger.info("Portfolio stopped, keeping the runs finished so far")
+                            stopped = True
+                            break
+                    
+                    # Check for early stopping
+                    if early_stop_score > 0 and run['score'] is not None and run['score'] <= early_stop_score:
+                        logger.info(f"Early stopping with score {run['score']:.4f}")
+                        stopped = True
+                        break
+            finally:
+                if stopped or len(runs) < len(tasks):
+                    stop_process_pool(pool)
+                else:
+                    pool.shutdown()
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"Process pool unavailable ({e}), running the portfolio serially")
+            runs = [solve_portfolio_run(*task) for task in tasks]
+        
+        solved = [run for run in runs if run['assignments'] is not None]
+        self.all_schedules = [
+            {'name': f"Run_{i + 1}", 'score': run['score'], 'config': run['config']}
+            for i, run in enumerate(runs)
+        ]
+        if not solved:
+            logger.error("No solution found by any portfolio run")
+            return {}
         
-        solver.Minimize(solver.Sum(objective_terms))
+        best = min(solved, key=lambda run: run['score'])
+        students_by_id = {student.id: student for student in self.students}
+        courses_by_id = {course.id: course for course in self.courses}
+        assignments = [
+            (students_by_id[student_id], {slot: courses_by_id[c] for slot, c in courses.items()})
+            for student_id, courses in best['assignments']
+        ]
+        self.objective_value = best['objective']
+        
+        result = self._apply_assignments(assignments)
+        result['status'] = best['status']
+        self.best_schedule = {
+            'name': f"Best_{self.schedule_name}",
+            'score': self.schedule_score,
+            'assignments': self.student_assignments
+        }
+        result['portfolio'] = {
+            'winner': best['config'],
+            'runs': [
+                {key: run[key] for key in ('config', 'status', 'score', 'objective', 'elapsed')}
+                for run in runs
+            ]
+        }
+        return result
+    
+    def _build_model(self, backend, students, courses_by_slot, priority_weights, sparse=False, capacities=None,
+                     unseated=None):
+        """Create the decision variables, constraints and objective
+        
+        Each unit is a student, or a StudentClass whose variables count how
+        many of its members take a course.
+        
+        In the dense formulation every student gets one binary variable per course.
+        In the sparse formulation a student only gets variables for the courses
+        listed in their preferences, plus one aggregated fallback variable per
+        time slot meaning "any other course in this slot". Since every
+        non-preferred course carries the same penalty, both formulations have
+        the same optimal objective.
+        
+        Args:
+            backend: MIPBackend or CPSATBackend to populate
+            students: Students or StudentClasses in the order used for variable indexing
+            courses_by_slot: Dict mapping time slot to its list of courses
+            priority_weights: Dictionary mapping priority levels to weights, or
+                None to leave the objective unset
+            sparse: Whether to use the sparse formulation
+            capacities: Optional dict mapping course id to the seats available to
+                these students (defaults to max_students)
+            unseated: Optional list; when given, every student may also take no
+                course at all through a slack variable appended to it, which
+                the caller must price into the objective
+            
+        Returns:
+            Tuple of (assign, fallback) where assign[s] maps course id to
+            (course, variable) and fallback[s] maps time slot to variable
+        """
+        if capacities is None:
+            capacities = {c.id: c.max_students for slot_courses in courses_by_slot.values() for c in slot_courses}
         
-        # Solve
-        status = solver.Solve()
+        assign = []
+        fallback = []
         
-        # Process results
-        if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
-            logger.info(f"Solution found in {time.time() - start_time:.2f} seconds")
+        for s, student in enumerate(students):
+            size = getattr(student, 'size', 1)
             
-            # Clear all student enrollments
-            for student in self.students:
-                student.clear_enrollments()
+            def new_var(name):
+                return backend.bool_var(name) if size == 1 else backend.int_var(size, name)
             
-            # Clear all sections
-            for section_name, section in self.course_name_to_section.items():
-                section.clear_students()
+            preferences = {
+                'AM': set(student.get_am_preferences()),
+                'PM': set(student.get_pm_preferences()),
+                'FullDay': set()
+            }
             
-            # Apply the solution
-            for s, student in enumerate(ordered_students):
-                # Apply AM assignments
-                for c in am_courses:
-                    if x[s][c.id].solution_value() > 0.5:
-                        section = c.section
-                        section.add_student(student)
+            student_assign = {}
+            student_fallback = {}
+            slot_sums = {}
+            for slot, slot_courses in courses_by_slot.items():
+                slot_vars = []
+                for c in slot_courses:
+                    listed = c.name in preferences[slot]
+                    if sparse and not listed:
+                        continue
+                    var = new_var(f'x_{s}_{c.id}')
+                    student_assign[c.id] = (c, var)
+                    slot_vars.append(var)
                 
-                # Apply PM assignments
-                for c in pm_courses:
-                    if y[s][c.id].solution_value() > 0.5:
-                        section = c.section
-                        section.add_student(student)
+                # One slack per slot stands in for every course not listed above
+                if sparse and slot_courses and len(slot_vars) < len(slot_courses):
+                    var = new_var(f'fallback_{s}_{slot}')
+                    student_fallback[slot] = var
+                    slot_vars.append(var)
                 
-                # Apply Full Day assignments
-                for c in fd_courses:
-                    if z[s][c.id].solution_value() > 0.5:
-                        section = c.section
-                        section.add_student(student)
+                slot_sums[slot] = backend.sum(slot_vars)
             
-            # Calculate total score for the schedule
-            # Normalize by number of students to keep scores low (between 0-1)
-            student_scores = [student.satisfaction_score() for student in self.students]
-            total_score = sum(student_scores) / len(self.students) if self.students else 0.0
+            # Student gets either (1 AM AND 1 PM) course OR 1 FD course
+            backend.add(slot_sums['AM'] == slot_sums['PM'])
+            if unseated is not None:
+                var = new_var(f'unseated_{s}')
+                unseated.append(var)
+                backend.add(slot_sums['AM'] + slot_sums['FullDay'] + var == size)
+            else:
+                backend.add(slot_sums['AM'] + slot_sums['FullDay'] == size)
             
-            # Instead of creating a database entry, just store the calculated data
-            self.schedule_name = f"ORTools_Schedule_{total_score:.2f}"
-            self.schedule_score = total_score
+            assign.append(student_assign)
+            fallback.append(student_fallback)
+        
+        # Course capacity constraints
+        for slot, slot_courses in courses_by_slot.items():
+            slot_vars = []
+            for c in slot_courses:
+                course_vars = [a[c.id][1] for a in assign if c.id in a]
+                slot_vars.extend(course_vars)
+                if course_vars:
+                    backend.add(backend.sum(course_vars) <= capacities[c.id])
             
-            # Store student assignments for the result without creating database entries
-            self.student_assignments = []
-            for student in self.students:
-                assignment = {
-                    'student_id': student.id,
-                    'student_name': f"{student.first_name} {student.last_name}",
-                    'am_course': student.am_course.name if student.am_course else None,
-                    'pm_course': student.pm_course.name if student.pm_course else None,
-                    'full_day_course': student.full_day_course.name if student.full_day_course else None,
-                    'satisfaction_score': student.satisfaction_score()
-                }
-                self.student_assignments.append(assignment)
+            # Fallback students share whatever seats the listed assignments leave free
+            fallback_vars = [f[slot] for f in fallback if slot in f]
+            if fallback_vars:
+                backend.add(
+                    backend.sum(slot_vars + fallback_vars) <= sum(capacities[c.id] for c in slot_courses)
+                )
+        
+        # Priority weighted sum of penalties
+        if priority_weights is not None:
+            backend.minimize(weighted_terms(self._penalty_terms(students, assign, fallback), priority_weights))
+        return assign, fallback
+    
+    def _penalty_terms(self, students, assign, fallback):
+        """List the unweighted objective terms of a built model
+        
+        Args:
+            students: Students or StudentClasses the model was built for
+            assign: Course variables returned by _build_model
+            fallback: Fallback variables returned by _build_model
             
-            # Return result
-            return self._format_result()
-        else:
-            logger.error("No solution found by OR-Tools solver")
+        Returns:
+            List of (priority, penalty, variable) tuples, one per variable with
+            a non-zero penalty
+        """
+        terms = []
+        for s, student in enumerate(students):
+            preferences = {
+                'AM': set(student.get_am_preferences()),
+                'PM': set(student.get_pm_preferences())
+            }
+            for c, var in assign[s].values():
+                if c.name not in preferences.get(c.time_slot, ()):
+                    terms.append((student.priority, SLOT_PENALTIES[c.time_slot], var))
+            for slot, var in fallback[s].items():
+                terms.append((student.priority, SLOT_PENALTIES[slot], var))
+        return terms
+    
+    def run_incremental(self, changed_student_ids, config: Dict) -> Dict:
+        """
+        Re-optimize only the neighbourhood of changed or added students
+        
+        Every student outside the neighbourhood keeps their assignment from the
+        current best schedule. The neighbourhood holds the changed students
+        plus the students enrolled in the courses they touch (their old courses
+        and every course they list), capped at config['max_neighbourhood'].
+        It is re-solved against the seats the fixed students leave free.
+        Fixed students holding more seats than a course now has (its
+        max_students was lowered or it was removed) join the neighbourhood,
+        lowest priority first, so the seats left free never go negative.
+        
+        Args:
+            changed_student_ids: Ids of students whose data changed or who are new
+            config: Dict with configuration parameters
+            
+        Returns:
+            Dict: Incremental result with only the students whose assignment
+            changed, or an empty dict if the neighbourhood could not be solved
+        """
+        start_time = time.time()
+        priority_weights = self._get_priority_weights(
+            config.get('priority_weight', 'standard'), config.get('custom_weights', None)
+        )
+        max_neighbourhood = config.get('max_neighbourhood', 300)
+        baseline = self.load_solution_hint(config.get('warm_start', 'best_schedule')) or {}
+        
+        courses_by_id = {c.id: c for c in self.courses}
+        course_ids_by_name = {c.name: c.id for c in self.courses}
+        students_by_id = {s.id: s for s in self.students}
+        changed = [students_by_id[sid] for sid in changed_student_ids if sid in students_by_id]
+        changed_ids = {student.id for student in changed}
+        
+        # Courses the changed students leave or might move into
+        touched = set()
+        for student in changed:
+            touched |= baseline.get(student.id, set())
+            for name in student.get_am_preferences() + student.get_pm_preferences():
+                if name in course_ids_by_name:
+                    touched.add(course_ids_by_name[name])
+        
+        neighbours = [
+            s for s in self.students
+            if s.id not in changed_ids and baseline.get(s.id, set()) & touched
+        ]
+        random.Random(config.get('seed')).shuffle(neighbours)
+        neighbourhood = changed + neighbours[:max(max_neighbourhood - len(changed), 0)]
+        neighbourhood.sort(key=lambda student: student.priority)
+        neighbourhood_ids = {student.id for student in neighbourhood}
+        
+        # Courses that shrank since the baseline cannot keep all their fixed holders
+        capacities = {c.id: c.max_students for c in self.courses}
+        holders = defaultdict(list)
+        for student_id, course_ids in baseline.items():
+            if student_id in students_by_id and student_id not in neighbourhood_ids:
+                for course_id in course_ids:
+                    holders[course_id].append(students_by_id[student_id])
+        for course_id, course_holders in holders.items():
+            kept = [student for student in course_holders if student.id not in neighbourhood_ids]
+            surplus = len(kept) - capacities.get(course_id, 0)
+            if surplus > 0:
+                kept.sort(key=lambda student: (-student.priority, student.id))
+                evicted = kept[:surplus]
+                logger.info(f"Course {course_id} is over capacity, re-scheduling {surplus} of its students")
+                neighbourhood.extend(evicted)
+                neighbourhood_ids.update(student.id for student in evicted)
+        neighbourhood.sort(key=lambda student: student.priority)
+        
+        # Seats left over once everyone outside the neighbourhood keeps their courses
+        for course_id, course_holders in holders.items():
+            if course_id in capacities:
+                capacities[course_id] -= sum(1 for student in course_holders if student.id not in neighbourhood_ids)
+        
+        backend = self._create_backend(config)
+        courses_by_slot = {
+            slot: [c for c in self.courses if c.time_slot == slot]
+            for slot in TIME_SLOTS
+        }
+        assign, fallback = self._build_model(
+            backend, neighbourhood, courses_by_slot, priority_weights,
+            sparse=(config.get('formulation', 'dense') == 'sparse'), capacities=capacities
+        )
+        self._apply_solution_hint(backend, neighbourhood, assign, fallback, baseline)
+        
+        status = backend.solve()
+        if status not in ('OPTIMAL', 'FEASIBLE'):
+            logger.error(f"Incremental re-schedule of {len(neighbourhood)} students failed ({status})")
             return {}
+        self.objective_value = backend.objective_value()
+        assignments = self._extract_assignments(
+            backend, neighbourhood, courses_by_slot, assign, fallback, capacities
+        )
+        
+        # Overlay the new neighbourhood assignments on the baseline
+        final = {sid: baseline.get(sid, set()) for sid in students_by_id}
+        changed_assignments = []
+        for student, courses in assignments:
+            course_ids = {c.id for c in courses.values()}
+            final[student.id] = course_ids
+            if course_ids != baseline.get(student.id, set()) or student.id in changed_ids:
+                changed_assignments.append(student)
+        
+        def assignment_entry(student):
+            names = {courses_by_id[c].time_slot: courses_by_id[c].name for c in final[student.id]}
+            return {
+                'student_id': student.id,
+                'student_name': f"{student.first_name} {student.last_name}",
+                'am_course': names.get('AM'),
+                'pm_course': names.get('PM'),
+                'full_day_course': names.get('FullDay'),
+                'satisfaction_score': calculate_satisfaction_score(
+                    student.get_am_preferences(), student.get_pm_preferences(),
+                    names.get('AM'), names.get('PM'), names.get('FullDay')
+                )
+            }
+        
+        entries = {student.id: assignment_entry(student) for student in self.students}
+        total_score = sum(entry['satisfaction_score'] for entry in entries.values())
+        self.schedule_score = total_score / len(entries) if entries else 0.0
+        self.schedule_name = f"ORTools_Schedule_{self.schedule_score:.2f}"
+        
+        logger.info(f"Incremental re-schedule of {len(neighbourhood)} students changed "
+                    f"{len(changed_assignments)} assignments in {time.time() - start_time:.3f} seconds")
+        return {
+            'name': self.schedule_name,
+            'score': self.schedule_score,
+            'students': [entries[student.id] for student in changed_assignments],
+            'neighbourhood_size': len(neighbourhood)
+        }
+    
+    def _create_backend(self, config):
+        """Create the solver backend selected by the configuration"""
+        backend_class = SOLVER_BACKENDS.get(config.get('solver_backend', 'scip'), MIPBackend)
+        return backend_class(config.get('time_limit_seconds', 20), config.get('num_workers', None),
+                             config.get('seed', None))
+    
+    def load_solution_hint(self, source):
+        """Collect an initial solution to warm-start the solver from
+        
+        Args:
+            source: 'best_schedule' for the snapshot rows of the latest schedule
+                marked is_best (falling back to current assignments if there is
+                none), 'current' for the students' current course fields, or
+                None to solve from scratch
+                
+        Returns:
+            Dict mapping student id to a set of assigned course ids, or None
+        """
+        if not source:
+            return None
+        
+        if source == 'best_schedule':
+            best = Schedule.objects.filter(is_best=True).order_by('-created_at').first()
+            if best:
+                rows = best.snapshots.values_list('student_id', 'am_course_id', 'pm_course_id', 'full_day_course_id')
+                logger.info(f"Warm-starting from schedule '{best.name}'")
+                return {row[0]: {c for c in row[1:] if c} for row in rows}
+            logger.info("No best schedule to warm-start from, using current assignments")
+        
+        return {
+            student.id: {c for c in (student.am_course_id, student.pm_course_id, student.full_day_course_id) if c}
+            for student in self.students
+        }
+    
+    def _apply_solution_hint(self, backend, students, assign, fallback, solution_hint):
+        """Feed a previous assignment to the solver as a hint
+        
+        Hinted courses the model has no variable for (sparse formulation) are
+        hinted through the student's fallback slack for that slot. For a
+        StudentClass the hint is the number of members holding each course.
+        """
+        course_slots = {c.id: c.time_slot for c in self.courses}
+        for s, student in enumerate(students):
+            members = getattr(student, 'members', [student])
+            hinted = [solution_hint[m.id] for m in members if solution_hint.get(m.id)]
+            if not hinted:
+                continue
+            course_counts = defaultdict(int)
+            fallback_counts = defaultdict(int)
+            for course_ids in hinted:
+                for course_id in course_ids:
+                    if course_id in assign[s]:
+                        course_counts[course_id] += 1
+                    else:
+                        fallback_counts[course_slots.get(course_id)] += 1
+            for course_id, (course, var) in assign[s].items():
+                backend.add_hint(var, course_counts[course_id])
+            for slot, var in fallback[s].items():
+                backend.add_hint(var, fallback_counts[slot])
+    
+    def _extract_assignments(self, backend, students, courses_by_slot, assign, fallback, capacities=None):
+        """Read the solved variables back into concrete course assignments
+        
+        Fallback slacks are resolved to a specific course afterwards: the
+        student's listed courses are tried first, then the first course in the
+        slot with a free seat. Seats won by a StudentClass are handed to its
+        members with aggregation.disaggregate.
+        
+        Returns:
+            List of (student, dict mapping time slot to Course) tuples
+        """
+        seats = []
+        enrolled = defaultdict(int)
+        pending = []
+        
+        for s, student in enumerate(students):
+            unit_seats = defaultdict(list)
+            for c, var in assign[s].values():
+                count = int(round(backend.value(var)))
+                unit_seats[c.time_slot].extend([c] * count)
+                enrolled[c.id] += count
+            for slot, var in fallback[s].items():
+                pending.extend([(s, slot)] * int(round(backend.value(var))))
+            seats.append(unit_seats)
+        
+        for s, slot in pending:
+            student = students[s]
+            listed = student.get_pm_preferences() if slot == 'PM' else student.get_am_preferences()
+            candidates = sorted(
+                courses_by_slot[slot],
+                key=lambda c: listed.index(c.name) if c.name in listed else len(listed)
+            )
+            for c in candidates:
+                limit = capacities[c.id] if capacities is not None else c.max_students
+                if enrolled[c.id] < limit:
+                    seats[s][slot].append(c)
+                    enrolled[c.id] += 1
+                    break
+        
+        assignments = []
+        rng = random.Random(0)
+        for student, unit_seats in zip(students, seats):
+            if isinstance(student, StudentClass):
+                assignments.extend(disaggregate(student, unit_seats, rng))
+            else:
+                assignments.append((student, {slot: courses[0] for slot, courses in unit_seats.items() if courses}))
+        return assignments
     
     def run(self, num_iterations) -> Dict:
         """
@@ -393,13 +1184,241 @@ class ORToolsScheduler:
         }
         
         # Format course data
-        for name, section in self.course_name_to_section.items():
+        for course in self.courses:
             course_data = {
-                'name': name,
-                'time_slot': section.course.time_slot,
-                'max_students': section.max_students,
-                'enrolled': section.enrolled_students_count
+                'name': course.name,
+                'time_slot': course.time_slot,
+                'max_students': course.max_students,
+                'enrolled': self.enrolled_counts[course.name]
             }
             result['courses'].append(course_data)
         
         return result
+
+
+def weighted_terms(penalty_terms, priority_weights):
+    """Turn (priority, penalty, variable) terms into (coefficient, variable) terms"""
+    return [
+        (priority_weights.get(priority, 1.0) * penalty, var)
+        for priority, penalty, var in penalty_terms
+    ]
+
+
+def score_assignments(assignments, num_students):
+    """Average satisfaction score of (student, {time slot: course}) assignments"""
+    total = 0.0
+    for student, courses in assignments:
+        names = {slot: course.name for slot, course in courses.items()}
+        total += calculate_satisfaction_score(
+            student.get_am_preferences(), student.get_pm_preferences(),
+            names.get('AM'), names.get('PM'), names.get('FullDay')
+        )
+    return total / num_students if num_students else 0.0
+
+
+class CompiledScheduleModel:
+    """
+    Scheduling model whose variables and constraints are built once.
+    
+    The priority weights only enter the objective, so one compiled model can
+    be re-solved for any number of weight schemes or time limits by
+    rewriting the objective coefficients. Solves on the same model are
+    serialised with a lock, and each solve returns its own outcome rather
+    than leaving it on the shared model.
+    """
+    
+    def __init__(self, scheduler, solver_backend='scip', formulation='dense', num_workers=None, aggregate=False):
+        """
+        Build the variables and constraints for the scheduler's dataset
+        
+        Args:
+            scheduler: ORToolsScheduler holding the courses and students
+            solver_backend: 'scip' or 'cp_sat'
+            formulation: 'dense' or 'sparse'
+            num_workers: Number of search workers
+            aggregate: Whether to model identical students as classes
+        """
+        start_time = time.time()
+        self.scheduler = scheduler
+        self.backend = SOLVER_BACKENDS.get(solver_backend, MIPBackend)(20, num_workers)
+        self.lock = threading.Lock()
+        if not self.backend.available:
+            return
+        
+        self.courses_by_slot = {
+            slot: [c for c in scheduler.courses if c.time_slot == slot]
+            for slot in TIME_SLOTS
+        }
+        ordered_students = sorted(scheduler.students, key=lambda student: student.priority)
+        self.units = group_students(ordered_students) if aggregate else ordered_students
+        self.assign, self.fallback = scheduler._build_model(
+            self.backend, self.units, self.courses_by_slot, None,
+            sparse=(formulation == 'sparse')
+        )
+        self.penalty_terms = scheduler._penalty_terms(self.units, self.assign, self.fallback)
+        
+        num_variables, num_constraints = self.backend.size()
+        logger.info(f"Compiled {formulation} {solver_backend} model with {num_variables} variables and "
+                    f"{num_constraints} constraints in {time.time() - start_time:.2f} seconds")
+    
+    @property
+    def available(self):
+        return self.backend.available
+    
+    def solve(self, priority_weights, time_limit_seconds=20, solution_hint=None, seed=None, progress=None):
+        """
+        Solve the model for one set of priority weights
+        
+        Args:
+            priority_weights: Dictionary mapping priority levels to weights
+            time_limit_seconds: Time limit for the solver in seconds
+            solution_hint: Optional dict mapping student id to assigned course ids
+            seed: Optional random seed for the solver
+            progress: Optional ProgressChannel to publish incumbents to
+            
+        Returns:
+            Tuple of the assignments (a list of (student, dict mapping time
+            slot to Course) tuples, or None if no solution was found), the
+            solver status, the objective value and the incumbents
+        """
+        with self.lock:
+            backend = self.backend
+            backend.minimize(weighted_terms(self.penalty_terms, priority_weights))
+            backend.set_time_limit(time_limit_seconds)
+            # An unseeded solve must not inherit the previous solve's seed
+            backend.set_seed(backend.DEFAULT_SEED if seed is None else seed)
+            backend.clear_hints()
+            if solution_hint:
+                self.scheduler._apply_solution_hint(backend, self.units, self.assign, self.fallback, solution_hint)
+            
+            # The model is shared between requests, so the channel is only attached for this solve
+            backend.progress = progress
+            try:
+                status = backend.solve()
+            finally:
+                backend.progress = None
+            incumbents = list(backend.incumbents)
+            if status not in ('OPTIMAL', 'FEASIBLE'):
+                return None, status, None, incumbents
+            assignments = self.scheduler._extract_assignments(
+                backend, self.units, self.courses_by_slot, self.assign, self.fallback
+            )
+            return assignments, status, backend.objective_value(), incumbents
+    
+    def solve_batch(self, weight_schemes, time_limit_seconds=20) -> List[Dict]:
+        """
+        Solve the model for several weight schemes in a row
+        
+        Each solve is hinted with the previous scheme's solution.
+        
+        Args:
+            weight_schemes: List of dicts mapping priority levels to weights
+            time_limit_seconds: Time limit for each solve in seconds
+            
+        Returns:
+            List of dicts with 'weights', 'status', 'objective', 'score',
+            'elapsed' and 'assignments' per scheme
+        """
+        results = []
+        hint = None
+        for priority_weights in weight_schemes:
+            start_time = time.time()
+            assignments, status, objective, _ = self.solve(priority_weights, time_limit_seconds, hint)
+            result = {
+                'weights': priority_weights,
+                'status': status,
+                'objective': objective,
+                'score': None,
+                'assignments': assignments
+            }
+            if assignments is not None:
+                result['score'] = score_assignments(assignments, len(self.scheduler.students))
+                hint = {student.id: {c.id for c in courses.values()} for student, courses in assignments}
+            result['elapsed'] = time.time() - start_time
+            results.append(result)
+        return results
+
+
+# Most recently used compiled models, keyed by dataset fingerprint and model options
+COMPILED_MODEL_CACHE_SIZE = 2
+_compiled_models = OrderedDict()
+_compiled_models_lock = threading.Lock()
+
+
+def get_compiled_model(scheduler, solver_backend='scip', formulation='dense', num_workers=None, aggregate=False):
+    """
+    Return the compiled model for the scheduler's dataset, building it if needed
+    
+    The key covers every field the model reads, so an edited course or
+    student yields a new model instead of a stale one.
+    """
+    fingerprint = ProblemInstance.from_models(scheduler.courses, scheduler.students).fingerprint()
+    key = (fingerprint, solver_backend, formulation, num_workers, aggregate)
+    with _compiled_models_lock:
+        if key in _compiled_models:
+            _compiled_models.move_to_end(key)
+            return _compiled_models[key]
+    
+    compiled = CompiledScheduleModel(scheduler, solver_backend, formulation, num_workers, aggregate)
+    with _compiled_models_lock:
+        _compiled_models[key] = compiled
+        while len(_compiled_models) > COMPILED_MODEL_CACHE_SIZE:
+            _compiled_models.popitem(last=False)
+    return compiled
+
+
+def _init_portfolio_worker():
+    """Make sure Django is configured in pool processes started with spawn"""
+    import django
+    django.setup()
+
+
+def stop_process_pool(pool):
+    """Shut a process pool down without waiting for the tasks it is still running"""
+    # Snapshot the workers first: shutdown drops the executor's references to them
+    workers = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join()
+
+
+def solve_portfolio_run(problem, run_config, time_limit_seconds, priority_weights, solution_hint=None):
+    """
+    Solve one portfolio run in a worker process
+    
+    Args:
+        problem: ProblemInstance to solve
+        run_config: Solver options for ORToolsScheduler._solve_assignments
+        time_limit_seconds: Time limit for the solver in seconds
+        priority_weights: Dictionary mapping priority levels to weights
+        solution_hint: Optional warm-start hint
+        
+    Returns:
+        Dict with the run's config, status, score, objective, elapsed time and
+        assignments as (student id, {time slot: course id}) pairs
+    """
+    start_time = time.time()
+    scheduler = ORToolsScheduler(problem.course_records(), problem.student_records(), load_sections=False)
+    assignments = scheduler._solve_assignments(
+        time_limit_seconds, priority_weights, solution_hint=solution_hint, **run_config
+    )
+    
+    run = {
+        'config': run_config,
+        'status': scheduler.solver_status,
+        'score': None,
+        'objective': None,
+        'assignments': None
+    }
+    if assignments is not None:
+        run['score'] = score_assignments(assignments, problem.num_students)
+        run['objective'] = scheduler.objective_value
+        run['assignments'] = [
+            (student.id, {slot: course.id for slot, course in courses.items()})
+            for student, courses in assignments
+        ]
+    run['elapsed'] = time.time() - start_time
+    return run
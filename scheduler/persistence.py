@@ -0,0 +1,127 @@
+"""
+Persistence of scheduler results with a bounded number of queries.
+"""
+import logging
+from typing import Dict, Optional
+from django.db import transaction
+from .models import Course, Student, Schedule, ScheduleSnapshot
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENT_FIELDS = ['am_course', 'pm_course', 'full_day_course']
+
+# Rows per INSERT/UPDATE statement, well below SQLite's variable limit
+BATCH_SIZE = 500
+
+
+def persist_schedule_result(result: Dict, name: Optional[str] = None) -> Schedule:
+    """
+    Persist a full scheduler result as the new best schedule
+    
+    Course names are resolved from one in-memory map, student assignments
+    are written with bulk_update and snapshots with bulk_create, all in one
+    transaction, so the number of queries does not grow with the number of
+    students beyond one statement per batch.
+    
+    Args:
+        result: Scheduler result with a 'score' and a 'students' list whose
+            entries carry 'student_id' (or 'id') and course names
+        name: Schedule name, defaults to the result's name
+        
+    Returns:
+        Schedule: The new best schedule
+    """
+    entries = {}
+    for entry in result.get('students', []):
+        entries[entry['student_id'] if 'student_id' in entry else entry['id']] = entry
+    
+    with transaction.atomic():
+        course_ids = dict(Course.objects.values_list('name', 'id'))
+        students = Student.objects.in_bulk(list(entries))
+        missing = len(entries) - len(students)
+        if missing:
+            logger.warning(f"{missing} students in the result no longer exist")
+        
+        schedule = Schedule.objects.create(
+            name=name or result.get('name', f"Schedule_{result['score']:.4f}"),
+            score=result['score'],
+            is_best=True
+        )
+        
+        snapshots = []
+        for student_id, student in students.items():
+            entry = entries[student_id]
+            for field in ASSIGNMENT_FIELDS:
+                course_name = entry.get(field)
+                if course_name and course_name not in course_ids:
+                    logger.warning(f"Course {course_name} not found for student {student_id}")
+                setattr(student, f'{field}_id', course_ids.get(course_name))
+            snapshots.append(ScheduleSnapshot(
+                schedule=schedule,
+                student=student,
+                am_course_id=student.am_course_id,
+                pm_course_id=student.pm_course_id,
+                full_day_course_id=student.full_day_course_id,
+                satisfaction_score=entry.get('satisfaction_score', entry.get('score', 0.0))
+            ))
+        
+        Student.objects.bulk_update(students.values(), ASSIGNMENT_FIELDS, batch_size=BATCH_SIZE)
+        ScheduleSnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE)
+        Schedule.objects.exclude(id=schedule.id).update(is_best=False)
+    
+    logger.info(f"Persisted schedule {schedule.name} for {len(students)} students")
+    return schedule
+
+
+def apply_incremental_result(result: Dict, schedule: Optional[Schedule] = None) -> int:
+    """
+    Persist the output of ORToolsScheduler.run_incremental
+    
+    Only the students listed in the result are written: their course fields are
+    bulk-updated and their snapshot rows in the given schedule are updated, or
+    created for students the schedule has not seen yet.
+    
+    Args:
+        result: Incremental result containing only the changed students
+        schedule: Schedule to update in place, usually the current best one
+        
+    Returns:
+        int: Number of students written
+    """
+    entries = {entry['student_id']: entry for entry in result.get('students', [])}
+    if not entries:
+        return 0
+    
+    with transaction.atomic():
+        course_ids = dict(Course.objects.values_list('name', 'id'))
+        students = Student.objects.in_bulk(list(entries))
+        
+        for student_id, student in students.items():
+            entry = entries[student_id]
+            for field in ASSIGNMENT_FIELDS:
+                setattr(student, f'{field}_id', course_ids.get(entry.get(field)))
+        Student.objects.bulk_update(students.values(), ASSIGNMENT_FIELDS)
+        
+        if schedule is not None:
+            existing = {
+                snapshot.student_id: snapshot
+                for snapshot in schedule.snapshots.filter(student_id__in=list(students))
+            }
+            to_update = []
+            to_create = []
+            for student_id in students:
+                entry = entries[student_id]
+                snapshot = existing.get(student_id) or ScheduleSnapshot(schedule=schedule, student_id=student_id)
+                for field in ASSIGNMENT_FIELDS:
+                    setattr(snapshot, f'{field}_id', course_ids.get(entry.get(field)))
+                snapshot.satisfaction_score = entry.get('satisfaction_score', 0.0)
+                (to_update if snapshot.pk else to_create).append(snapshot)
+            
+            ScheduleSnapshot.objects.bulk_update(to_update, ASSIGNMENT_FIELDS + ['satisfaction_score'])
+            ScheduleSnapshot.objects.bulk_create(to_create)
+            
+            schedule.score = result['score']
+            schedule.save(update_fields=['score'])
+    
+    logger.info(f"Persisted incremental result for {len(students)} students")
+    return len(students)
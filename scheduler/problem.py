@@ -0,0 +1,341 @@
+"""
+Plain-data snapshot of a scheduling problem.
+Worker processes solve a ProblemInstance instead of ORM objects, so they can be
+pickled cheaply and never need a database connection.
+"""
+import hashlib
+import json
+from typing import Dict, List
+
+import numpy as np
+
+from .models import calculate_satisfaction_score
+
+TIME_SLOTS = ('AM', 'PM', 'FullDay')
+
+# Leading bytes of a serialized ProblemInstance
+MAGIC = b'SCHPROB1'
+
+# Byte alignment of every array in the serialized buffer
+ALIGNMENT = 64
+
+# Objective weight of each priority level for the named weight modes
+PRIORITY_WEIGHT_SCHEMES = {
+    # Standard priority weights - moderately prioritizes higher grades
+    'standard': {1: 1.0, 2: 0.8, 3: 0.6},
+    # Strong priority weights - heavily prioritizes higher grades
+    'strong': {1: 1.0, 2: 0.6, 3: 0.3},
+    # Balanced priority weights - gives more equal chances
+    'balanced': {1: 1.0, 2: 0.9, 3: 0.8},
+}
+
+
+def get_priority_weights(mode='standard', custom_weights=None) -> Dict[int, float]:
+    """
+    Get priority weights based on the selected mode or custom values
+
+    Args:
+        mode: The priority weight mode ('standard', 'strong', 'balanced')
+        custom_weights: Optional dictionary with custom weights by priority level
+
+    Returns:
+        Dict: Mapping of priority level to weight value
+    """
+    if custom_weights:
+        # Use custom weights provided by the user (JSON payloads carry string keys)
+        return {int(priority): float(weight) for priority, weight in custom_weights.items()}
+    # Unknown modes default to standard
+    return dict(PRIORITY_WEIGHT_SCHEMES.get(mode, PRIORITY_WEIGHT_SCHEMES['standard']))
+
+
+class CourseRecord:
+    """
+    Lightweight stand-in for Course with the fields the solvers read.
+    """
+
+    __slots__ = ('id', 'name', 'time_slot', 'max_students')
+
+    def __init__(self, id, name, time_slot, max_students):
+        self.id = id
+        self.name = name
+        self.time_slot = time_slot
+        self.max_students = max_students
+
+    def __repr__(self):
+        return f"CourseRecord({self.name!r}, {self.time_slot})"
+
+
+class StudentRecord:
+    """
+    Lightweight stand-in for Student with the fields the solvers read.
+
+    Names and contact details are not part of a ProblemInstance, so they
+    are left blank; the course fields hold the assignment an engine makes.
+    """
+
+    __slots__ = ('id', 'priority', 'am_preferences', 'pm_preferences',
+                 'am_course', 'pm_course', 'full_day_course')
+
+    first_name = ''
+    last_name = ''
+    email = ''
+    grade = None
+
+    def __init__(self, id, priority, am_preferences, pm_preferences):
+        self.id = id
+        self.priority = priority
+        self.am_preferences = list(am_preferences)
+        self.pm_preferences = list(pm_preferences)
+        self.am_course = None
+        self.pm_course = None
+        self.full_day_course = None
+
+    def __repr__(self):
+        return f"StudentRecord({self.id}, priority={self.priority})"
+
+    def get_am_preferences(self):
+        return self.am_preferences
+
+    def get_pm_preferences(self):
+        return self.pm_preferences
+
+    def satisfaction_score(self):
+        return calculate_satisfaction_score(
+            self.am_preferences,
+            self.pm_preferences,
+            self.am_course.name if self.am_course else None,
+            self.pm_course.name if self.pm_course else None,
+            self.full_day_course.name if self.full_day_course else None
+        )
+
+
+class ProblemInstance:
+    """
+    Columnar encoding of a scheduling problem.
+
+    Courses and students are stored as NumPy arrays indexed by position.
+    Names live in one string table: course c is named names[c], and names
+    that only appear in preference lists follow the course names. The
+    whole instance serializes to a single contiguous buffer (see
+    to_bytes), which can be memory-mapped from a file and is what gets
+    pickled when the instance is sent to a worker.
+
+    Attributes:
+        names: String table
+        course_ids: int64 Course ids
+        course_slots: int8 index into TIME_SLOTS per course
+        capacities: int32 max_students per course
+        student_ids: int64 Student ids
+        priorities: int16 priority per student
+        am_preferences: int16 students x rank matrix of string table
+            indices, padded with -1
+        pm_preferences: Same for the PM lists
+    """
+
+    ARRAYS = ('course_ids', 'course_slots', 'capacities', 'student_ids', 'priorities',
+              'am_preferences', 'pm_preferences', 'name_offsets', 'name_bytes')
+
+    def __init__(self, names, course_ids, course_slots, capacities, student_ids, priorities,
+                 am_preferences, pm_preferences):
+        self.names = names
+        self.course_ids = course_ids
+        self.course_slots = course_slots
+        self.capacities = capacities
+        self.student_ids = student_ids
+        self.priorities = priorities
+        self.am_preferences = am_preferences
+        self.pm_preferences = pm_preferences
+
+    @property
+    def num_courses(self) -> int:
+        return len(self.course_ids)
+
+    @property
+    def num_students(self) -> int:
+        return len(self.student_ids)
+
+    @classmethod
+    def from_rows(cls, course_rows, student_rows) -> 'ProblemInstance':
+        """
+        Encode plain rows
+
+        Args:
+            course_rows: Iterable of (id, name, time_slot, max_students)
+            student_rows: Iterable of (id, priority, am preferences, pm preferences)
+
+        Returns:
+            ProblemInstance
+        """
+        course_rows = list(course_rows)
+        student_rows = list(student_rows)
+        names = [row[1] for row in course_rows]
+        name_index = {}
+        for c, name in enumerate(names):
+            name_index.setdefault(name, c)
+
+        def encode(preference_lists):
+            width = max([len(preferences) for preferences in preference_lists] + [0])
+            matrix = np.full((len(preference_lists), width), -1, dtype=np.int16)
+            for s, preferences in enumerate(preference_lists):
+                for rank, name in enumerate(preferences):
+                    if name not in name_index:
+                        name_index[name] = len(names)
+                        names.append(name)
+                    matrix[s, rank] = name_index[name]
+            return matrix
+
+        am_preferences = encode([row[2] for row in student_rows])
+        pm_preferences = encode([row[3] for row in student_rows])
+        if len(names) > np.iinfo(np.int16).max:
+            raise ValueError(f"{len(names)} distinct names do not fit the int16 preference matrix")
+
+        return cls(
+            names,
+            np.array([row[0] for row in course_rows], dtype=np.int64),
+            np.array([TIME_SLOTS.index(row[2]) for row in course_rows], dtype=np.int8),
+            np.array([row[3] for row in course_rows], dtype=np.int32),
+            np.array([row[0] for row in student_rows], dtype=np.int64),
+            np.array([row[1] for row in student_rows], dtype=np.int16),
+            am_preferences,
+            pm_preferences
+        )
+
+    @classmethod
+    def from_models(cls, courses, students) -> 'ProblemInstance':
+        """
+        Build an instance from Course and Student objects
+
+        Args:
+            courses: List of Course objects
+            students: List of Student objects
+
+        Returns:
+            ProblemInstance
+        """
+        return cls.from_rows(
+            [(c.id, c.name, c.time_slot, c.max_students) for c in courses],
+            [(s.id, s.priority, s.get_am_preferences(), s.get_pm_preferences()) for s in students]
+        )
+
+    @classmethod
+    def from_database(cls, courses=None, students=None) -> 'ProblemInstance':
+        """
+        Build an instance with one query for courses and one for students
+
+        Only the columns the solvers read are fetched; no model instances or
+        foreign keys are loaded.
+
+        Args:
+            courses: Optional Course queryset, all courses by default
+            students: Optional Student queryset, all students by default
+
+        Returns:
+            ProblemInstance
+        """
+        from .models import Course, Student
+        courses = Course.objects.all() if courses is None else courses
+        students = Student.objects.all() if students is None else students
+        return cls.from_rows(
+            courses.order_by('id').values_list('id', 'name', 'time_slot', 'max_students'),
+            students.order_by('id').values_list('id', 'priority', 'am_preferences', 'pm_preferences')
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize into one contiguous buffer
+
+        Layout: MAGIC, the header length as a little-endian uint32, a JSON
+        header with the dtype, shape and offset of every array, then the
+        arrays, each starting on an ALIGNMENT boundary.
+        """
+        encoded = [name.encode() for name in self.names]
+        arrays = {
+            name: getattr(self, name) for name in self.ARRAYS[:-2]
+        }
+        arrays['name_offsets'] = np.cumsum([0] + [len(name) for name in encoded], dtype=np.int64)
+        arrays['name_bytes'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        header = {}
+        offset = 0
+        for name in self.ARRAYS:
+            array = np.ascontiguousarray(arrays[name])
+            arrays[name] = array
+            header[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header).encode()
+        start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+        buffer = bytearray(start + offset)
+        buffer[:len(MAGIC)] = MAGIC
+        buffer[len(MAGIC):len(MAGIC) + 4] = len(header_bytes).to_bytes(4, 'little')
+        buffer[len(MAGIC) + 4:len(MAGIC) + 4 + len(header_bytes)] = header_bytes
+        for name in self.ARRAYS:
+            position = start + header[name]['offset']
+            buffer[position:position + arrays[name].nbytes] = arrays[name].tobytes()
+        return bytes(buffer)
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'ProblemInstance':
+        """
+        Decode a buffer written by to_bytes
+
+        The arrays are views into the buffer, so a bytes object or a
+        memory map is not copied.
+        """
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a serialized ProblemInstance")
+        length = int.from_bytes(bytes(buffer[len(MAGIC):len(MAGIC) + 4]), 'little')
+        header = json.loads(bytes(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + length]))
+        start = -(-(len(MAGIC) + 4 + length) // ALIGNMENT) * ALIGNMENT
+
+        arrays = {}
+        for name, spec in header.items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=start + spec['offset']
+            ).reshape(spec['shape'])
+
+        offsets = arrays.pop('name_offsets')
+        blob = arrays.pop('name_bytes').tobytes()
+        names = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+        return cls(names, **arrays)
+
+    def save(self, path):
+        with open(path, 'wb') as handle:
+            handle.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> 'ProblemInstance':
+        """Memory-map an instance written by save"""
+        return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode='r'))
+
+    def __reduce__(self):
+        # Pickle as one buffer instead of per-object state
+        return (ProblemInstance.from_buffer, (self.to_bytes(),))
+
+    def fingerprint(self) -> str:
+        """Content hash of every field the solvers read"""
+        return hashlib.sha1(self.to_bytes()).hexdigest()
+
+    def course_records(self) -> List[CourseRecord]:
+        return [
+            CourseRecord(int(course_id), self.names[c], TIME_SLOTS[slot], int(capacity))
+            for c, (course_id, slot, capacity) in enumerate(
+                zip(self.course_ids, self.course_slots, self.capacities)
+            )
+        ]
+
+    def student_records(self) -> List[StudentRecord]:
+        names = self.names
+        return [
+            StudentRecord(
+                int(student_id), int(priority),
+                [names[i] for i in am if i >= 0],
+                [names[i] for i in pm if i >= 0]
+            )
+            for student_id, priority, am, pm in zip(
+                self.student_ids, self.priorities,
+                self.am_preferences.tolist(), self.pm_preferences.tolist()
+            )
+        ]
@@ -0,0 +1,99 @@
+"""
+Progress channel for long-running solves, kept in the Django cache.
+The solver publishes every improving incumbent as a numbered event; the
+Server-Sent-Events endpoint reads them back in order, and a stop flag lets
+the user accept the current incumbent and end the solve early.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Cache time for progress events (1 hour)
+PROGRESS_CACHE_TIME = 60 * 60
+
+# Seconds between two checks for new events in the event stream
+POLL_INTERVAL = 0.5
+
+# Seconds one event-stream response stays open before the browser has to
+# reconnect; kept below gunicorn's default 30 second worker timeout, since a
+# streaming response occupies a sync worker for as long as it is open
+STREAM_WINDOW_SECONDS = 20
+
+# Seconds a stream waits for the first event of a run before ending; shorter
+# than the window, so a run that never starts ends on the first connection
+STREAM_START_TIMEOUT = 15
+
+
+class ProgressChannel:
+    """
+    Numbered event log for one scheduler run.
+
+    Events are stored under their own keys and numbered with an atomic
+    cache counter, so publishers in other processes (portfolio workers,
+    Celery tasks) can append to the same channel when the cache is shared.
+    """
+
+    def __init__(self, run_id):
+        self.run_id = str(run_id)
+        self.prefix = f"progress:{self.run_id}"
+        self.start_time = time.time()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['ProgressChannel']:
+        """The channel named by config['progress_id'], or None"""
+        run_id = config.get('progress_id')
+        return cls(run_id) if run_id else None
+
+    def _next_sequence(self) -> int:
+        key = f"{self.prefix}:seq"
+        cache.add(key, 0, PROGRESS_CACHE_TIME)
+        return cache.incr(key)
+
+    def publish(self, kind: str, **data):
+        """
+        Append an event
+
+        Args:
+            kind: Event type ('incumbent', 'run', 'status' or 'done')
+            data: JSON-serializable event fields
+        """
+        sequence = self._next_sequence()
+        event = {'id': sequence, 'event': kind, 'elapsed': time.time() - self.start_time, **data}
+        cache.set(f"{self.prefix}:event:{sequence}", event, PROGRESS_CACHE_TIME)
+
+    def incumbent(self, objective, bound=None, gap=None, elapsed=None, **data):
+        """Publish an improving solution"""
+        self.publish('incumbent', objective=objective, bound=bound, gap=gap,
+                     solver_elapsed=elapsed, **data)
+
+    def status(self, state: str, **data):
+        """Publish a change of the run's state, e.g. 'queued' or 'running'"""
+        self.publish('status', state=state, **data)
+
+    def started(self) -> bool:
+        """Whether anything was ever published on this channel"""
+        return cache.get(f"{self.prefix}:seq") is not None
+
+    def finish(self, **data):
+        """Publish the final event; streams end after it"""
+        self.publish('done', **data)
+
+    def events_since(self, last_id: int = 0) -> List[Dict]:
+        """Events numbered after last_id, in order"""
+        latest = cache.get(f"{self.prefix}:seq", 0)
+        if latest <= last_id:
+            return []
+        keys = [f"{self.prefix}:event:{n}" for n in range(last_id + 1, latest + 1)]
+        found = cache.get_many(keys)
+        return [found[key] for key in keys if key in found]
+
+    def request_stop(self):
+        """Ask the solver to stop and keep its current incumbent"""
+        cache.set(f"{self.prefix}:stop", True, PROGRESS_CACHE_TIME)
+
+    def stop_requested(self) -> bool:
+        return bool(cache.get(f"{self.prefix}:stop"))
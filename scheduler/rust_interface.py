@@ -43,88 +43,78 @@ class RustSchedulerInterface:
         Args:
             courses: List of course objects
             students: List of student objects
-            config: Dict with configuration parameters
+            config: Dict with configuration parameters. The optional 'engine' key
+                selects 'ortools' (MIP, default), 'flow' (min-cost flow), 'alns'
+                (large-neighbourhood search for very large cohorts) or 'python';
+                with 'auto' engines.select_engine picks one from the problem
+                size and the time budget. With 'multiple_runs',
+                OR-Tools solves a portfolio of 'run_count' configurations in
+                parallel and the Python engine keeps its best run.
+                'local_search' runs the local-search phase on the result
             
         Returns:
-            Dict containing the schedule results
+            Dict containing the schedule results, with the pre-solve analysis
+            under 'feasibility' and the engine choice under 'engine'. The
+            findings of an infeasible problem are listed under 'warnings'
+            
+        Raises:
+            InfeasibleProblemError: If a strict engine (the OR-Tools MIP or
+                CP-SAT model) was selected and the courses cannot seat
+                every student
         """
-        # Try to use OR-Tools implementation if available, otherwise fallback to Python
-        if not self.using_python_impl:
-            from .ortools_scheduler import ORToolsScheduler
-            scheduler = ORToolsScheduler(courses, students)
-            return scheduler.run_with_config(config)
-        else:
-            return self._run_python_scheduler(courses, students, config)
+        from .feasibility import check_feasibility
+        from .engines import run_engine
+        
+        courses = list(courses)
+        students = list(students)
+        
+        # Strict engines fail fast on an infeasible problem; the others
+        # still produce a partial schedule
+        report = check_feasibility(courses, students)
+        result, selection = run_engine(
+            courses, students, config, ortools_available=not self.using_python_impl, feasibility=report
+        )
+        if not report.feasible:
+            logger.warning(f"Scheduled an infeasible problem: {'; '.join(report.errors)}")
+        
+        # Optionally polish the result with moves and swaps
+        if result and config.get('local_search', False):
+            from .local_search import improve_result
+            result = improve_result(courses, students, result, config)
+        if result:
+            result['feasibility'] = report.to_dict()
+            result['engine'] = selection
+            if not report.feasible:
+                result['warnings'] = list(report.errors)
+        return result
     
     def run_scheduler_parallel(self, courses, students, config, num_threads=4):
         """
-        Run the scheduler algorithm in parallel for better results
+        Race several engines and keep the result with the best race objective
         
-        For OR-Tools, we increase the time limit to get a better solution.
-        For Python implementation, we run multiple iterations with different seeds.
+        Each engine configuration runs in its own process with the full time
+        budget; see engines.race_engines. Without OR-Tools the Python engine
+        races against itself, each process with its own random orderings.
         
         Args:
             courses: List of course objects
             students: List of student objects
-            config: Dict with configuration parameters
-            num_threads: Number of runs to perform (or time multiplier for OR-Tools)
+            config: Dict with configuration parameters; config['race'] lists
+                the engine configurations to race
+            num_threads: Most racers started
             
         Returns:
-            Dict containing the best schedule results
+            Dict containing the winning schedule results, with the winner and
+            per-engine timings under 'race'
         """
-        if not self.using_python_impl:
-            # For OR-Tools, we give it more time instead of multiple runs
-            from .ortools_scheduler import ORToolsScheduler
-            # Increase time limit based on num_threads parameter
-            extended_config = config.copy()
-            extended_config['time_limit_seconds'] = config.get('time_limit_seconds', 20) * (num_threads / 2)
-            scheduler = ORToolsScheduler(courses, students)
-            return scheduler.run_with_config(extended_config)
-        else:
-            # Fallback to Python implementation with multiple runs
-            logger.warning("OR-Tools not available, using Python implementation with multiple runs")
-            best_result = None
-            best_score = float('inf')
-            
-            for _ in range(num_threads):
-                result = self._run_python_scheduler(courses, students, config)
-                
-                # Check if this result is better than the current best
-                if result and 'score' in result and result['score'] < best_score:
-                    best_result = result
-                    best_score = result['score']
-            
-            return best_result if best_result else self._run_python_scheduler(courses, students, config)
-    
-    def _prepare_courses_json(self, courses):
-        """Convert Django course objects to the format expected by Rust"""
-        rust_courses = []
-        for course in courses:
-            rust_courses.append({
-                'name': course.name,
-                'time_slot': course.time_slot,
-                'max_students': course.max_students
-            })
-        return json.dumps(rust_courses)
-    
-    def _prepare_students_json(self, students):
-        """Convert Django student objects to the format expected by Rust"""
-        rust_students = []
-        for i, student in enumerate(students):
-            rust_students.append({
-                'id': i,
-                'email': student.email,
-                'first_name': student.first_name,
-                'last_name': student.last_name,
-                'grade': student.grade,
-                'priority': student.priority,
-                'am_preferences': student.get_am_preferences(),
-                'pm_preferences': student.get_pm_preferences(),
-                'am_course': student.am_course.name if student.am_course else None,
-                'pm_course': student.pm_course.name if student.pm_course else None,
-                'full_day_course': student.full_day_course.name if student.full_day_course else None
-            })
-        return json.dumps(rust_students)
+        from .engines import race_engines
+        
+        if self.using_python_impl and not config.get('race'):
+            config = {**config, 'race': ['python'] * num_threads}
+        return race_engines(
+            courses, students, config, num_racers=num_threads,
+            ortools_available=not self.using_python_impl
+        )
     
     def _prepare_config_json(self, config):
         """Convert config dict to the format expected by Rust"""
@@ -137,10 +127,5 @@ class RustSchedulerInterface:
     
     def _run_python_scheduler(self, courses, students, config):
         """Run the Python implementation of the scheduler"""
-        from .scheduler_python import PythonScheduler
-        
-        # Make sure we only keep the best schedule
-        config['save_only_best'] = True
-        
-        scheduler = PythonScheduler(courses, students)
-        return scheduler.run_with_config(config)
+        from .engines import run_python_scheduler
+        return run_python_scheduler(courses, students, config)
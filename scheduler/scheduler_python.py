@@ -1,15 +1,23 @@
 import random
-import copy
 import logging
 from typing import List, Dict, Optional, Tuple
-from .models import Course, Student, Section, Schedule
+from .models import calculate_satisfaction_score
+from .aggregation import group_students
 
 logger = logging.getLogger(__name__)
 
+SLOTS = ('AM', 'PM', 'FullDay')
+AM, PM, FULL_DAY = range(len(SLOTS))
+
 class PythonScheduler:
     """
     Pure Python implementation of the scheduler algorithm.
     This serves as a fallback if the Rust scheduler is unavailable.
+    
+    The greedy loop runs on integer-indexed arrays: course capacity
+    counters, per-student candidate lists of course indices and two
+    assignment vectors. Nothing touches the database; the caller persists
+    the best result (see persistence.persist_schedule_result).
     """
     
     def __init__(self, courses, students):
@@ -20,179 +28,168 @@ class PythonScheduler:
             courses: List of Course objects
             students: List of Student objects
         """
-        self.courses = courses
-        self.students = students
-        self.course_name_to_section = {}
+        self.courses = list(courses)
+        self.students = list(students)
         self.best_schedule = None
         
-        # Initialize sections for all courses
-        self.load_sections()
+        self._index_problem()
     
-    def load_sections(self):
-        """Create a Section for each course"""
-        for course in self.courses:
-            # Create a section object if it doesn't exist
-            if not hasattr(course, 'section'):
-                section = Section(course=course)
-                section.save()
-            self.course_name_to_section[course.name] = course.section
+    def _index_problem(self):
+        """Build the integer-indexed arrays used by the greedy loop"""
+        course_index = {course.name: c for c, course in enumerate(self.courses)}
+        self.course_slots = [SLOTS.index(course.time_slot) for course in self.courses]
+        self.capacities = [course.max_students for course in self.courses]
+        
+        # Courses of each slot in listing order, searched once the preferences are full
+        self.slot_courses = [
+            [c for c, slot in enumerate(self.course_slots) if slot == wanted]
+            for wanted in range(len(SLOTS))
+        ]
+        
+        def candidates(names, slots):
+            indices = [course_index[name] for name in names if name in course_index]
+            return [c for c in dict.fromkeys(indices) if self.course_slots[c] in slots]
+        
+        # First choice comes from the AM list (AM or FullDay courses), second from the PM list
+        self.first_candidates = [candidates(s.get_am_preferences(), (AM, FULL_DAY)) for s in self.students]
+        self.second_candidates = [candidates(s.get_pm_preferences(), (PM,)) for s in self.students]
+        self.priorities = [s.priority for s in self.students]
+        
+        # Satisfaction score per (first, second) course pair, filled in lazily
+        self.score_tables = [{} for _ in self.students]
     
-    def safe_add_student_to_section(self, student, section) -> bool:
+    def _take_seat(self, candidates, fallback_slot, remaining, fallback_start):
         """
-        Safely add a student to a section if there is capacity
+        Take a seat in the first candidate with room, else in any open course of the slot
         
         Args:
-            student: Student object to add
-            section: Section object to add the student to
-            
+            candidates: Course indices in preference order
+            fallback_slot: Slot searched once the preferences are full
+            remaining: Free seats per course index, updated in place
+            fallback_start: One-element list with the first fallback course
+                that may still have room, advanced in place
+        
         Returns:
-            bool: True if the student was added, False otherwise
+            int: Course index, or -1 if the slot is full
         """
-        if section is None:
-            logger.error("Attempted to add student to a nil section")
-            return False
+        for c in candidates:
+            if remaining[c] > 0:
+                remaining[c] -= 1
+                return c
         
-        if section.enrolled_students_count < section.max_students:
-            section.add_student(student)
-            return True
-        return False
+        courses = self.slot_courses[fallback_slot]
+        position = fallback_start[0]
+        while position < len(courses) and remaining[courses[position]] <= 0:
+            position += 1
+        fallback_start[0] = position
+        if position < len(courses):
+            remaining[courses[position]] -= 1
+            return courses[position]
+        return -1
     
-    def find_first_available_section_for_student(self, student, time_slot) -> Optional[Section]:
+    def assign(self, order) -> Tuple[List[int], List[int]]:
         """
-        Find the first available section for a student based on their preferences
+        Assign each student to an AM course + PM course if possible
+        
+        Students are served in the given order. A student whose first seat is
+        a FullDay course gets no PM course.
         
         Args:
-            student: Student object
-            time_slot: Time slot to look for ('AM', 'PM', or 'FullDay')
-            
+            order: Student indices in serving order
+        
         Returns:
-            Section object or None if no section is available
+            Tuple of (first, second) assignment vectors holding a course
+            index or -1 per student
         """
-        course_names = []
-        if time_slot == 'AM' or time_slot == 'FullDay':
-            course_names = student.get_am_preferences()
-        elif time_slot == 'PM':
-            course_names = student.get_pm_preferences()
-        
-        # Try each requested course in order
-        for course_name in course_names:
-            if course_name and course_name in self.course_name_to_section:
-                section = self.course_name_to_section[course_name]
-                if section.enrolled_students_count < section.max_students:
-                    return section
+        remaining = list(self.capacities)
+        first = [-1] * len(self.students)
+        second = [-1] * len(self.students)
+        am_start = [0]
+        pm_start = [0]
         
-        # If none of the requested have space, fallback to any open section
-        return self.get_first_available_section_without_request(time_slot)
+        for s in order:
+            c = self._take_seat(self.first_candidates[s], AM, remaining, am_start)
+            first[s] = c
+            
+            # If we actually assigned an AM course, then do PM
+            if c >= 0 and self.course_slots[c] == AM:
+                second[s] = self._take_seat(self.second_candidates[s], PM, remaining, pm_start)
+        return first, second
     
-    def get_first_available_section_without_request(self, time_slot) -> Optional[Section]:
+    def shuffled_order(self, classes=None) -> List[int]:
         """
-        Find any available section for the given time slot
+        Shuffle students within each priority level, keeping priority order
         
         Args:
-            time_slot: Time slot to look for ('AM', 'PM', or 'FullDay')
-            
+            classes: Optional list of StudentClass; when given, whole classes
+                are shuffled within a priority and members within a class
+        
         Returns:
-            Section object or None if no section is available
-        """
-        for section_name, section in self.course_name_to_section.items():
-            if section.course.time_slot == time_slot and section.enrolled_students_count < section.max_students:
-                return section
-        return None
-    
-    def assign_students_to_sections(self):
-        """Assign each student to an AM course + PM course if possible"""
-        for student in self.students:
-            # Assign AM course
-            am_section = self.find_first_available_section_for_student(student, 'AM')
-            if am_section:
-                self.safe_add_student_to_section(student, am_section)
-                
-                # If we actually assigned an AM course, then do PM
-                if am_section.course.time_slot == 'AM':
-                    pm_section = self.find_first_available_section_for_student(student, 'PM')
-                    if pm_section:
-                        self.safe_add_student_to_section(student, pm_section)
-    
-    def extract_by_grade_and_shuffle(self):
-        """
-        Group students by priority, shuffle each group,
-        and recombine maintaining priority order
+            List of student indices
         """
-        # Clear all student enrollments
-        for student in self.students:
-            student.clear_enrollments()
-        
-        # Group students by priority
-        students_by_priority = {1: [], 2: [], 3: []}
-        for student in self.students:
-            priority = student.priority
-            students_by_priority[priority].append(student)
-        
-        # Shuffle each priority group
-        for priority in students_by_priority:
-            random.shuffle(students_by_priority[priority])
+        if classes is None:
+            units = [[s] for s in range(len(self.students))]
+            priorities = self.priorities
+        else:
+            units = [[self.student_index[m.id] for m in c.members] for c in classes]
+            priorities = [c.priority for c in classes]
         
-        # Recombine groups in priority order 1 -> 2 -> 3
-        shuffled = []
-        for priority in [1, 2, 3]:
-            shuffled.extend(students_by_priority[priority])
+        units_by_priority = {}
+        for unit, priority in zip(units, priorities):
+            units_by_priority.setdefault(priority, []).append(unit)
         
-        self.students = shuffled
+        order = []
+        for priority in sorted(units_by_priority):
+            random.shuffle(units_by_priority[priority])
+            for unit in units_by_priority[priority]:
+                random.shuffle(unit)
+                order.extend(unit)
+        return order
+    
+    def student_score(self, s, first, second) -> float:
+        """Satisfaction score of student s holding the given course indices"""
+        table = self.score_tables[s]
+        key = (first, second)
+        if key not in table:
+            names = {}
+            for c in (first, second):
+                if c >= 0:
+                    names[SLOTS[self.course_slots[c]]] = self.courses[c].name
+            student = self.students[s]
+            table[key] = calculate_satisfaction_score(
+                student.get_am_preferences(), student.get_pm_preferences(),
+                names.get('AM'), names.get('PM'), names.get('FullDay')
+            )
+        return table[key]
     
-    def score_schedule(self, save_only_best=False) -> float:
+    def score_schedule(self, first, second, cutoff=None) -> float:
         """
-        Calculate the total score for the current schedule
+        Calculate the total score for the given assignment vectors
         
         Args:
-            save_only_best: If True, only save the schedule if it's better than the current best
-                          and mark it as the best schedule (replacing any previous best)
+            first: First assignment vector
+            second: Second assignment vector
+            cutoff: Stop summing once the score reaches this value
         
         Returns:
             float: The total satisfaction score
         """
         score = 0.0
-        for student in self.students:
-            student_score = student.satisfaction_score()
-            score += student_score
+        for s in range(len(self.students)):
+            score += self.student_score(s, first[s], second[s])
             
             # If we already exceed (or equal) best known, we can skip
-            if self.best_schedule and score >= self.best_schedule.score:
+            if cutoff is not None and score >= cutoff:
                 return score
-        
-        # If this is strictly better, store it
-        if not self.best_schedule or score < self.best_schedule.score:
-            # Create a new Schedule object
-            schedule = Schedule(
-                name=f"Schedule_{score:.2f}",
-                score=score,
-                is_best=save_only_best  # Mark as best if save_only_best is True
-            )
-            schedule.save()
-            
-            # If save_only_best is True, mark all other schedules as not best
-            if save_only_best:
-                Schedule.objects.filter(is_best=True).exclude(id=schedule.id).update(is_best=False)
-            
-            # Save a snapshot of the current state
-            schedule.save_snapshot()
-            self.best_schedule = schedule
-        
         return score
     
-    def clear_sections(self):
-        """
-        Clear all sections for the next iteration
-        """
-        for section_name, section in self.course_name_to_section.items():
-            section.clear_students()
-    
     def run(self, num_iterations) -> Dict:
         """
         Run the scheduler with the given number of iterations
         
         Args:
             num_iterations: Number of iterations to run
-            
+        
         Returns:
             Dict: Schedule results
         """
@@ -205,14 +202,20 @@ class PythonScheduler:
         
         Args:
             config: Dict with configuration parameters
-            
+        
         Returns:
             Dict: Schedule results
         """
         iterations = config.get('iterations', 1000)
-        min_course_fill = config.get('min_course_fill', 0.75)
         early_stop_score = config.get('early_stop_score', 0.0)
-        save_only_best = config.get('save_only_best', False)  # Whether to only save the best schedule
+        save_only_best = config.get('save_only_best', False)
+        
+        # Optionally shuffle students with identical priority and preferences as one class
+        classes = None
+        if config.get('aggregate', False):
+            classes = group_students(self.students)
+            self.student_index = {student.id: s for s, student in enumerate(self.students)}
+            logger.info(f"Aggregated {len(self.students)} students into {len(classes)} classes")
         
         # Increase number of iterations before giving up if we're only saving one schedule
         stop_after_no_improvement = 5000 if save_only_best else 2000
@@ -220,16 +223,19 @@ class PythonScheduler:
         
         for i in range(iterations):
             # 1) Shuffle students by priority
-            self.extract_by_grade_and_shuffle()
+            order = self.shuffled_order(classes)
             
             # 2) Assign them
-            self.assign_students_to_sections()
+            first, second = self.assign(order)
             
-            # 3) Score
-            cur_score = self.score_schedule(save_only_best=save_only_best)
+            # 3) Score, keeping the assignment if it is strictly better
+            cutoff = self.best_schedule['score'] if self.best_schedule else None
+            cur_score = self.score_schedule(first, second, cutoff)
+            if self.best_schedule is None or cur_score < self.best_schedule['score']:
+                self.best_schedule = {'score': cur_score, 'first': first, 'second': second}
             
             # Check if we improved
-            if self.best_schedule and self.best_schedule.score == cur_score:
+            if self.best_schedule['score'] == cur_score:
                 best_score_at = i
             
             # 4) Early stop if we reach threshold
@@ -242,16 +248,13 @@ class PythonScheduler:
                 logger.info(f"Stopping after {stop_after_no_improvement} iterations without improvement")
                 break
             
-            # 6) Clear for next iteration
-            self.clear_sections()
-            
-            # 7) Log progress for long runs
+            # 6) Log progress for long runs
             if i % 500 == 0:
-                logger.info(f"Completed {i} iterations, current best score: {self.best_schedule.score if self.best_schedule else 'N/A'}")
+                logger.info(f"Completed {i} iterations, current best score: {self.best_schedule['score']}")
         
         # Return the results
         if self.best_schedule:
-            logger.info(f"Best schedule score: {self.best_schedule.score} after {i+1} iterations")
+            logger.info(f"Best schedule score: {self.best_schedule['score']} after {i+1} iterations")
             return self._format_result()
         else:
             logger.warning("No valid schedule found.")
@@ -264,38 +267,45 @@ class PythonScheduler:
         Returns:
             Dict: Formatted schedule result
         """
+        first = self.best_schedule['first']
+        second = self.best_schedule['second']
+        score = self.best_schedule['score']
         result = {
-            'score': self.best_schedule.score,
+            'name': f"Schedule_{score:.2f}",
+            'score': score,
             'students': [],
             'sections': []
         }
         
         # Add students
-        snapshots = self.best_schedule.snapshots.all()
-        for snapshot in snapshots:
-            student = {
-                'id': snapshot.student.id,
-                'email': snapshot.student.email,
-                'first_name': snapshot.student.first_name,
-                'last_name': snapshot.student.last_name,
-                'grade': snapshot.student.grade,
-                'priority': snapshot.student.priority,
-                'am_course': snapshot.am_course.name if snapshot.am_course else None,
-                'pm_course': snapshot.pm_course.name if snapshot.pm_course else None,
-                'full_day_course': snapshot.full_day_course.name if snapshot.full_day_course else None,
-                'satisfaction_score': snapshot.satisfaction_score
-            }
-            result['students'].append(student)
+        section_students = [[] for _ in self.courses]
+        for s, student in enumerate(self.students):
+            names = {}
+            for c in (first[s], second[s]):
+                if c >= 0:
+                    names[SLOTS[self.course_slots[c]]] = self.courses[c].name
+                    section_students[c].append(student.id)
+            result['students'].append({
+                'id': student.id,
+                'email': student.email,
+                'first_name': student.first_name,
+                'last_name': student.last_name,
+                'grade': student.grade,
+                'priority': student.priority,
+                'am_course': names.get('AM'),
+                'pm_course': names.get('PM'),
+                'full_day_course': names.get('FullDay'),
+                'satisfaction_score': self.student_score(s, first[s], second[s])
+            })
         
         # Add sections
-        for course_name, section in self.course_name_to_section.items():
-            section_data = {
-                'course_name': course_name,
-                'time_slot': section.course.time_slot,
-                'max_students': section.max_students,
-                'enrolled_students': section.enrolled_students_count,
-                'student_ids': [s.id for s in section.get_students()]
-            }
-            result['sections'].append(section_data)
+        for c, course in enumerate(self.courses):
+            result['sections'].append({
+                'course_name': course.name,
+                'time_slot': course.time_slot,
+                'max_students': course.max_students,
+                'enrolled_students': len(section_students[c]),
+                'student_ids': section_students[c]
+            })
         
         return result
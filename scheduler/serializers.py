@@ -1,5 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig
+from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig, SolveJob
 
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -76,6 +77,25 @@ class SchedulerConfigSerializer(serializers.ModelSerializer):
         model = SchedulerConfig
         fields = ['id', 'name', 'iterations', 'min_course_fill', 'early_stop_score', 'created_at', 'updated_at']
 
+class SolveJobSerializer(serializers.ModelSerializer):
+    progress_url = serializers.SerializerMethodField()
+    coalesced = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = SolveJob
+        fields = [
+            'id', 'status', 'config', 'schedule', 'score', 'error', 'cancel_requested',
+            'created_at', 'started_at', 'finished_at', 'heartbeat_at', 'progress_id', 'progress_url', 'coalesced'
+        ]
+    
+    def get_progress_url(self, obj):
+        """Server-Sent-Events stream of the job's incumbents"""
+        return reverse('api_scheduler_progress', args=[obj.progress_id])
+    
+    def get_coalesced(self, obj):
+        """Whether the request joined a job already in flight"""
+        return getattr(obj, 'coalesced', False)
+
 class RequestSerializer(serializers.Serializer):
     email = serializers.EmailField()
     first_name = serializers.CharField()
@@ -0,0 +1,26 @@
+"""
+Cache invalidation driven by model signals.
+Any change to the courses or students the solvers read bumps the dataset's
+generation in SchedulerCache once the change is committed, which retires
+every cached entry keyed under the previous generation. Saves that only
+write a student's assignments, as the scheduler itself does, leave the
+generation alone.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import SchedulerCache
+from .models import Course, Student
+from .persistence import ASSIGNMENT_FIELDS
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_on_data_change(sender, instance, update_fields=None, **kwargs):
+    """Bump the dataset generation after a course or student changes"""
+    if update_fields and set(update_fields) <= set(ASSIGNMENT_FIELDS):
+        return
+    # Bumping before the commit would let a concurrent reader cache the old
+    # rows under the new generation
+    transaction.on_commit(SchedulerCache.invalidate_schedule_cache)
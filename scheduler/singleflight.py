@@ -0,0 +1,157 @@
+"""
+Single-flight coalescing of identical solve requests.
+A request is identified by a content hash of the dataset (the
+ProblemInstance fingerprint) and the normalized engine config. The first
+request with a hash leads the flight: it claims a lock in the Django cache
+with cache.add and solves. Requests with the same hash that arrive while
+the flight is in the air join its waiter list and receive the leader's
+outcome instead of starting another solve.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .problem import ProblemInstance
+
+logger = logging.getLogger(__name__)
+
+# Config keys that do not change the schedule a solve produces
+VOLATILE_KEYS = ('progress_id',)
+
+# Seconds an outcome stays readable for waiters after the flight lands
+OUTCOME_CACHE_TIME = 60 * 10
+
+# Seconds between two checks for the outcome while waiting
+WAIT_INTERVAL = 0.25
+
+# Seconds a synchronous flight may stay in the air beyond twice its time budget
+FLIGHT_GRACE_SECONDS = 120
+
+
+def solve_request_hash(scheduler_config: Dict, fingerprint: Optional[str] = None) -> str:
+    """
+    Content hash of a solve request
+
+    Args:
+        scheduler_config: Engine config from jobs.build_scheduler_config
+        fingerprint: Dataset fingerprint, read from the database if not given
+
+    Returns:
+        str: Hex digest identifying the dataset and config
+    """
+    if fingerprint is None:
+        fingerprint = ProblemInstance.from_database().fingerprint()
+    normalized = {key: value for key, value in scheduler_config.items() if key not in VOLATILE_KEYS}
+    payload = json.dumps([fingerprint, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def flight_lease(scheduler_config: Dict) -> int:
+    """Seconds before the lock of a synchronous flight expires: twice the time budget plus a grace period"""
+    return int(scheduler_config.get('time_limit_seconds', 20)) * 2 + FLIGHT_GRACE_SECONDS
+
+
+class SolveFlight:
+    """
+    Cache-backed lock, waiter list and outcome for one request hash.
+
+    The lock value names the flight's token and, for background solves,
+    the SolveJob doing the work. Outcomes are stored per token, so a
+    waiter never reads the outcome of an earlier flight with the same hash.
+    """
+
+    def __init__(self, request_hash):
+        self.request_hash = request_hash
+        self.prefix = f"solve_flight:{request_hash}"
+
+    def lead(self, job_id: Optional[int] = None, lease: Optional[int] = None) -> Optional[Dict]:
+        """
+        Try to become the leader of this flight
+
+        Args:
+            job_id: SolveJob solving the flight, None for a synchronous solve
+            lease: Seconds after which an abandoned lock expires
+
+        Returns:
+            dict: The lock value ('token', 'job_id') if this caller leads,
+            None if another flight is in the air
+        """
+        leader = {'token': uuid.uuid4().hex, 'job_id': job_id}
+        if cache.add(self.prefix, leader, lease or settings.SOLVER_SLOT_LEASE_SECONDS):
+            return leader
+        return None
+
+    def leader(self) -> Optional[Dict]:
+        """The lock value of the flight in the air, if any"""
+        return cache.get(self.prefix)
+
+    def join(self, leader: Dict, **waiter) -> int:
+        """
+        Add a waiter to the flight led by leader
+
+        Args:
+            leader: Lock value returned by leader()
+            waiter: JSON-serializable details of the joining request
+
+        Returns:
+            int: Number of waiters on the flight so far
+        """
+        key = f"{self.prefix}:{leader['token']}:waiters"
+        cache.add(key, 0, OUTCOME_CACHE_TIME + settings.SOLVER_SLOT_LEASE_SECONDS)
+        position = cache.incr(key)
+        cache.set(f"{key}:{position}", {'joined': time.time(), **waiter},
+                  OUTCOME_CACHE_TIME + settings.SOLVER_SLOT_LEASE_SECONDS)
+        return position
+
+    def waiters(self, leader: Dict) -> List[Dict]:
+        key = f"{self.prefix}:{leader['token']}:waiters"
+        count = cache.get(key, 0)
+        found = cache.get_many([f"{key}:{n}" for n in range(1, count + 1)])
+        return [found[f"{key}:{n}"] for n in range(1, count + 1) if f"{key}:{n}" in found]
+
+    def finish(self, leader: Dict, **outcome):
+        """
+        Publish the outcome of the flight and release its lock
+
+        Args:
+            leader: Lock value returned by lead()
+            outcome: 'status_code' and 'data' of the run_scheduler response
+                the waiters return, whether a request or a job led the flight
+        """
+        cache.set(f"{self.prefix}:{leader['token']}:outcome", outcome, OUTCOME_CACHE_TIME)
+        if (cache.get(self.prefix) or {}).get('token') == leader['token']:
+            cache.delete(self.prefix)
+        waiters = cache.get(f"{self.prefix}:{leader['token']}:waiters", 0)
+        if waiters:
+            logger.info(f"Solve flight {self.request_hash[:12]} served {waiters} coalesced requests")
+
+    def abandon(self, leader: Dict):
+        """Release the lock of the flight led by leader without an outcome; its waiters solve themselves"""
+        if (cache.get(self.prefix) or {}).get('token') == leader['token']:
+            cache.delete(self.prefix)
+
+    def wait(self, leader: Dict, timeout: float) -> Optional[Dict]:
+        """
+        Wait for the outcome of the flight led by leader
+
+        Returns:
+            dict: The outcome, or None if the flight did not land within
+            timeout seconds or its lock disappeared without an outcome
+        """
+        key = f"{self.prefix}:{leader['token']}:outcome"
+        deadline = time.time() + timeout
+        while True:
+            outcome = cache.get(key)
+            if outcome is not None:
+                return outcome
+            current = cache.get(self.prefix)
+            if (current or {}).get('token') != leader['token'] or time.time() >= deadline:
+                # The leader died or gave up; check once more for a late outcome
+                return cache.get(key)
+            time.sleep(WAIT_INTERVAL)
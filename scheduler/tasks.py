@@ -16,44 +16,126 @@ from django.template.loader import render_to_string
 # Configure logger
 logger = logging.getLogger('scheduler')
 
-@shared_task(bind=True, max_retries=3)
+@shared_task(bind=True)
 def schedule_generation_task(self, data, user_email=None):
     """
     Generate a schedule asynchronously and send an email notification when complete.
     
     Args:
-        data (dict): The input data for schedule generation
+        data (dict): The scheduler configuration, as posted to the run endpoint
         user_email (str, optional): Email to notify when complete
     
     Returns:
-        dict: The result of the schedule generation
+        dict: Summary of the solve job
     """
-    from .ortools_scheduler import ORToolsScheduler
+    from .models import SolveJob
+    
+    job = SolveJob.objects.create(config=data, task_id=self.request.id or '')
+    return run_solve_job_task(job.id, user_email=user_email)
+
+@shared_task(bind=True)
+def run_solve_job_task(self, job_id, user_email=None):
+    """
+    Run a queued solve job and send an email notification when complete.
+    
+    Solver failures are recorded on the job rather than retried: the same
+    data and config would fail the same way. The job only waits, and is
+    retried later, when every solve slot on this node is busy.
+    
+    Args:
+        job_id (int): Id of the SolveJob to run
+        user_email (str, optional): Email to notify when complete
+    
+    Returns:
+        dict: Summary of the solve job
+    """
+    from .admission import solver_slot
+    from .jobs import job_heartbeat, run_solve_job
     
     start_time = time.time()
-    logger.info(f"Starting schedule generation task at {datetime.now()}")
+    logger.info(f"Starting solve job {job_id} at {datetime.now()}")
     
-    try:
-        # Generate the schedule
-        scheduler = ORToolsScheduler()
-        result = scheduler.generate_schedule(data)
-        
-        # Record execution time
-        execution_time = time.time() - start_time
-        result['execution_time'] = execution_time
-        
-        # Log completion
-        logger.info(f"Schedule generation completed in {execution_time:.2f} seconds")
-        
-        # Send email notification if requested
-        if user_email:
-            send_schedule_notification(user_email, result)
-            
-        return result
-    except Exception as exc:
-        logger.error(f"Schedule generation failed: {str(exc)}")
-        self.retry(exc=exc, countdown=60*5)  # Retry in 5 minutes
-        raise
+    with solver_slot() as slot:
+        if slot is None:
+            raise self.retry(countdown=settings.SOLVER_RETRY_AFTER_SECONDS, max_retries=None)
+        with job_heartbeat(job_id):
+            job = run_solve_job(job_id)
+    return solve_job_summary(job, start_time, user_email)
+
+@shared_task(bind=True)
+def solve_run_task(self, fingerprint, run_config, job_id=None):
+    """
+    Solve one run of a distributed multi-run job.
+    
+    Args:
+        fingerprint (str): Cache key of the ProblemInstance to solve
+        run_config (dict): Engine configuration for this run
+        job_id (int, optional): Id of the SolveJob, kept alive while the run solves
+    
+    Returns:
+        dict: The run's objective and assignments, or its error
+    """
+    from .admission import solver_slot
+    from .jobs import job_heartbeat, solve_problem_run
+    
+    with solver_slot() as slot:
+        if slot is None:
+            raise self.retry(countdown=settings.SOLVER_RETRY_AFTER_SECONDS, max_retries=None)
+        if job_id is None:
+            return solve_problem_run(fingerprint, run_config)
+        with job_heartbeat(job_id):
+            return solve_problem_run(fingerprint, run_config)
+
+@shared_task
+def reduce_runs_task(runs, job_id, user_email=None):
+    """
+    Chord callback persisting the best run of a distributed job.
+    
+    Args:
+        runs (list): Results of every solve_run_task of the job
+        job_id (int): Id of the SolveJob
+        user_email (str, optional): Email to notify when complete
+    
+    Returns:
+        dict: Summary of the solve job
+    """
+    from .jobs import reduce_problem_runs
+    
+    start_time = time.time()
+    job = reduce_problem_runs(job_id, runs)
+    return solve_job_summary(job, start_time, user_email)
+
+def solve_job_summary(job, start_time, user_email=None):
+    """
+    Summarize a finished solve job and send the email notification.
+    
+    Args:
+        job (SolveJob): The finished job
+        start_time (float): When the task started
+        user_email (str, optional): Email to notify if the job succeeded
+    
+    Returns:
+        dict: Status, schedule, score and satisfaction counts of the job
+    """
+    result = {
+        'job_id': job.id,
+        'status': job.status,
+        'schedule_id': job.schedule_id,
+        'score': job.score,
+        'error': job.error,
+        'execution_time': time.time() - start_time
+    }
+    if job.schedule_id:
+        snapshots = job.schedule.snapshots
+        result['perfect_count'] = snapshots.filter(satisfaction_score=0).count()
+        result['unsatisfied_count'] = snapshots.filter(satisfaction_score__gte=1.0).count()
+        result['partial_count'] = snapshots.count() - result['perfect_count'] - result['unsatisfied_count']
+    
+    # Send email notification if requested
+    if user_email and job.status == job.SUCCEEDED:
+        send_schedule_notification(user_email, result)
+    
+    return result
 
 @shared_task
 def database_backup_task():
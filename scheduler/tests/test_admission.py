@@ -0,0 +1,71 @@
+"""
+Tests for solver admission control.
+"""
+import os
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from scheduler.admission import acquire_solver_slot, release_solver_slot, solver_slot
+from scheduler.models import Schedule, SolveJob
+from scheduler.tests.test_ortools_scheduler import create_dataset
+from scheduler.tests.test_views import authenticated_client  # noqa: F401
+
+
+@pytest.fixture
+def one_slot(settings):
+    settings.SOLVER_MAX_CONCURRENT_SOLVES = 1
+    settings.SOLVER_THREADS_PER_SOLVE = 1
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestSolverSlots:
+    """Tests for the per-node solve slots."""
+
+    def test_slots_are_limited_and_released(self, one_slot):
+        slot = acquire_solver_slot()
+        assert slot is not None
+        assert acquire_solver_slot() is None
+        release_solver_slot(slot)
+        assert acquire_solver_slot() is not None
+
+    @pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason="CPU affinity is Linux only")
+    def test_solve_is_pinned_to_its_cpus(self, one_slot):
+        before = os.sched_getaffinity(0)
+        with solver_slot() as slot:
+            assert os.sched_getaffinity(0) == set(slot.cpus)
+            assert len(slot.cpus) == 1
+        assert os.sched_getaffinity(0) == before
+
+
+@pytest.mark.django_db
+class TestAdmission:
+    """Tests for rejecting solves beyond the node's capacity."""
+
+    def test_busy_node_rejects_web_solves(self, authenticated_client, one_slot):
+        create_dataset()
+        held = acquire_solver_slot()
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.status_code == 429
+        assert response['Retry-After'] == '30'
+        assert not Schedule.objects.exists()
+
+        release_solver_slot(held)
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.status_code == 200
+
+    def test_full_backlog_rejects_jobs(self, authenticated_client, settings):
+        settings.SOLVER_MAX_QUEUED_JOBS = 1
+        create_dataset()
+        SolveJob.objects.create(config={})
+        response = authenticated_client.post(
+            reverse('api:solvejob-list'), {'config': {}}, content_type='application/json'
+        )
+        assert response.status_code == 429
+        assert response.json()['retry_after'] == 30
+        assert SolveJob.objects.count() == 1
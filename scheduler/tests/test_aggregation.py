@@ -0,0 +1,59 @@
+"""
+Tests for the student equivalence-class presolve.
+"""
+import pytest
+from scheduler.models import Student, Course
+from scheduler.aggregation import group_students, disaggregate
+from scheduler.ortools_scheduler import ORToolsScheduler
+from scheduler.scheduler_python import PythonScheduler
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+@pytest.mark.django_db
+class TestAggregation:
+    """Tests for grouping and disaggregating identical students."""
+
+    def test_group_students_by_profile(self):
+        """Students sharing priority and preferences land in one class."""
+        create_dataset()
+        classes = group_students(Student.objects.all())
+
+        assert sum(c.size for c in classes) == 12
+        assert len(classes) == 6  # 3 priorities x 2 preference profiles
+
+    def test_disaggregate_pairs_best_am_with_worst_pm(self):
+        """Seats are handed out one per member with AM and PM balanced."""
+        courses = {c.name: c for c in create_dataset()}
+        student_class = group_students(Student.objects.filter(priority=2))[0]
+        seats = {
+            'AM': [courses['Art'], courses['Band']],
+            'PM': [courses['Drama'], courses['Econ']],
+        }
+        assignments = disaggregate(student_class, seats)
+
+        pairs = {(c['AM'].name, c['PM'].name) for _, c in assignments}
+        assert pairs == {('Art', 'Econ'), ('Band', 'Drama')}
+
+    def test_aggregated_model_keeps_optimal_objective(self):
+        """Class-level count variables reach the same optimum as per-student variables."""
+        create_dataset()
+        courses = list(Course.objects.all())
+        plain = ORToolsScheduler(courses, list(Student.objects.all()))
+        plain.run_with_config({})
+        aggregated = ORToolsScheduler(courses, list(Student.objects.all()))
+        result = aggregated.run_with_config({'aggregate': True, 'formulation': 'sparse'})
+
+        assert aggregated.objective_value == pytest.approx(plain.objective_value)
+        assert len(result['students']) == 12
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+    def test_python_scheduler_assigns_classes(self):
+        """The greedy scheduler can place whole classes within capacity."""
+        create_dataset()
+        scheduler = PythonScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        result = scheduler.run_with_config({'iterations': 5, 'aggregate': True})
+
+        assert len(result['students']) == 12
+        for section in result['sections']:
+            assert section['enrolled_students'] <= section['max_students']
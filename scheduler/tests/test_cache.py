@@ -0,0 +1,66 @@
+"""
+Tests for generation-based cache invalidation.
+"""
+import io
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from scheduler.cache import SchedulerCache
+from scheduler.models import Course, Student
+from scheduler.tests.test_ortools_scheduler import create_dataset
+from scheduler.tests.test_views import authenticated_client  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestGeneration:
+    """Tests for retiring cached entries when the dataset changes."""
+
+    def test_bump_retires_every_key(self):
+        SchedulerCache.set_schedule_cache(SchedulerCache.DEFAULT_SCHOOL_ID, {'score': 1.0}, request='a')
+        assert SchedulerCache.get_schedule_cache(SchedulerCache.DEFAULT_SCHOOL_ID, request='a') == {'score': 1.0}
+        generation = SchedulerCache.get_generation()
+        other = SchedulerCache.get_generation('other')
+
+        assert SchedulerCache.invalidate_schedule_cache() == generation + 1
+        assert SchedulerCache.get_schedule_cache(SchedulerCache.DEFAULT_SCHOOL_ID, request='a') is None
+        assert SchedulerCache.get_generation('other') == other
+
+    def test_edits_bump_after_commit(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            create_dataset()
+        generation = SchedulerCache.get_generation()
+
+        student = Student.objects.first()
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            student.priority = 3
+            student.save()
+        assert len(callbacks) == 1
+        assert SchedulerCache.get_generation() == generation + 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Course.objects.filter(name='Film').delete()
+        assert SchedulerCache.get_generation() == generation + 2
+
+    def test_assignment_saves_keep_the_generation(self, django_capture_on_commit_callbacks):
+        create_dataset()
+        course = Course.objects.get(name='Art')
+        student = Student.objects.first()
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            student.am_course = course
+            student.save(update_fields=['am_course'])
+        assert callbacks == []
+
+    def test_import_bumps_the_generation(self, authenticated_client):
+        generation = SchedulerCache.get_generation()
+        upload = io.BytesIO(b"Name,MaxStudents,TimeSlot\nArt,10,AM\n")
+        upload.name = 'courses.csv'
+        response = authenticated_client.post(reverse('import_courses'), {'file': upload})
+        assert response.status_code == 201
+        assert SchedulerCache.get_generation() > generation
@@ -0,0 +1,162 @@
+"""
+Tests for the engine registry and auto-selection.
+"""
+import time
+
+import pytest
+from django.core.cache import cache
+from scheduler.models import Student, Course
+from scheduler.cache import SchedulerCache
+from scheduler.engines import (
+    ENGINES, Engine, ProblemProfile, select_engine, run_engine, race_engines, race_objective
+)
+from scheduler.rust_interface import RustSchedulerInterface
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+class SleepyEngine(Engine):
+    """Racer that finds nothing after config['sleep'] seconds"""
+
+    name = 'sleepy'
+    requires_ortools = False
+
+    def run(self, courses, students, config, load_sections=True):
+        time.sleep(config['sleep'])
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def clear_timings():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestEngineSelection:
+    """Tests for the cost-model based selector."""
+
+    def test_flow_is_exact_without_full_day_courses(self):
+        engine, reason = select_engine(ProblemProfile(500, 20, 0, time_budget=20))
+        assert engine.name == 'flow'
+        assert '0 FullDay' in reason
+
+    def test_mip_when_it_fits_the_budget(self):
+        engine, _ = select_engine(ProblemProfile(500, 20, 2, time_budget=20))
+        assert engine.name == 'ortools'
+
+    def test_recorded_timings_steer_large_problems_away_from_the_mip(self):
+        profile = ProblemProfile(3000, 120, 4, time_budget=20)
+        assert select_engine(profile)[0].name == 'ortools'
+
+        # A past run that took twice the budget makes the MIP too slow
+        SchedulerCache.record_engine_timing('ortools', 40.0 / (3000 * 120))
+        engine, reason = select_engine(profile)
+        assert engine.name in ('flow', 'alns')
+        assert 'budget' in reason
+
+    def test_python_only_without_ortools(self):
+        engine, _ = select_engine(ProblemProfile(500, 20, 2, time_budget=20), ortools_available=False)
+        assert engine.name == 'python'
+
+
+@pytest.mark.django_db
+class TestRunEngine:
+    """Tests for running the selected engine."""
+
+    def test_explicit_engine_overrides_selection(self):
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+
+        result, selection = run_engine(courses, students, {'engine': 'python', 'iterations': 10})
+        assert selection['name'] == 'python'
+        assert 'requested' in selection['reason']
+        assert result['students']
+        assert SchedulerCache.get_engine_timing('python') is not None
+
+        config = {'engine': 'python', 'iterations': 10}
+        run_engine(courses, students, config)
+        assert config == {'engine': 'python', 'iterations': 10}
+
+        _, selection = run_engine(courses, students, {'time_limit_seconds': 10})
+        assert selection['name'] == 'ortools'
+
+    def test_auto_selection_is_opt_in(self, monkeypatch):
+        """Without an engine key the MIP runs even where auto-selection would pick another engine."""
+        from scheduler import engines
+
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        monkeypatch.setattr(engines, 'select_engine', lambda profile, available: (engines.ENGINES['flow'], 'picked'))
+
+        _, selection = run_engine(courses, students, {'time_limit_seconds': 10})
+        assert (selection['name'], selection['reason']) == ('ortools', 'default engine')
+        _, selection = run_engine(courses, students, {'engine': 'auto', 'time_limit_seconds': 10})
+        assert selection['name'] == 'flow'
+
+    def test_timing_updates_are_serialised(self):
+        assert SchedulerCache.record_engine_timing('flow', 1.0)
+        cache.add('engine_timing:flow:lock', True, 10)
+        assert not SchedulerCache.record_engine_timing('flow', 3.0)
+        cache.delete('engine_timing:flow:lock')
+        assert SchedulerCache.record_engine_timing('flow', 3.0)
+        assert SchedulerCache.get_engine_timing('flow') == pytest.approx(0.3 * 3.0 + 0.7 * 1.0)
+
+
+@pytest.mark.django_db
+class TestEngineRace:
+    """Tests for racing engines in separate processes."""
+
+    def test_race_reports_winner_and_timings(self):
+        create_dataset()
+        interface = RustSchedulerInterface()
+        config = {'time_limit_seconds': 10, 'race': ['ortools', 'flow', {'engine': 'python', 'iterations': 50}]}
+        result = interface.run_scheduler_parallel(Course.objects.all(), Student.objects.all(), config)
+
+        race = result['race']
+        assert [run['engine'] for run in race['runs']] == ['ortools', 'flow', 'python']
+        finished = [run for run in race['runs'] if run['status'] == 'finished']
+        assert finished
+        assert all(run['elapsed'] is not None for run in finished)
+        # The returned schedule is the best finished one
+        best = min(finished, key=lambda run: run['objective'])
+        assert race_objective(result) == pytest.approx(best['objective'])
+        assert race['winner']['engine'] == best['engine']
+
+    def test_unseated_students_count_as_the_worst_score(self):
+        seated = {'students': [
+            {'am_course': 'Art', 'pm_course': 'Drama', 'satisfaction_score': 0.5},
+            {'full_day_course': 'Robotics', 'satisfaction_score': 0.5},
+        ]}
+        unseated = {'students': [
+            {'am_course': 'Art', 'pm_course': 'Drama', 'satisfaction_score': 0.0},
+            {'am_course': 'Art', 'pm_course': None, 'satisfaction_score': 0.0},
+        ]}
+        assert race_objective(unseated) == pytest.approx(0.5)
+        assert race_objective(seated) == pytest.approx(0.5)
+        unseated['students'][0]['satisfaction_score'] = 0.25
+        assert race_objective(unseated) > race_objective(seated)
+
+    def test_perfect_racer_cancels_the_others(self, monkeypatch):
+        """Every student in a first choice cannot be beaten, so the race ends."""
+        monkeypatch.setitem(ENGINES, 'sleepy', SleepyEngine())
+        create_dataset(num_students=3)
+        config = {'time_limit_seconds': 30, 'race': ['flow', {'engine': 'sleepy', 'sleep': 30}]}
+        result = race_engines(Course.objects.all(), Student.objects.all(), config)
+
+        runs = {run['engine']: run for run in result['race']['runs']}
+        assert runs['flow']['objective'] == 0
+        assert runs['sleepy']['status'] == 'cancelled'
+        assert result['race']['elapsed'] < 30
+
+    def test_engine_optimality_does_not_end_the_race(self, monkeypatch):
+        """The MIP proves optimality for its own objective, not race_objective."""
+        monkeypatch.setitem(ENGINES, 'sleepy', SleepyEngine())
+        create_dataset()
+        config = {'time_limit_seconds': 30, 'race': ['ortools', {'engine': 'sleepy', 'sleep': 1}]}
+        result = race_engines(Course.objects.all(), Student.objects.all(), config)
+
+        runs = {run['engine']: run for run in result['race']['runs']}
+        assert runs['ortools']['optimal']
+        assert runs['ortools']['objective'] > 0
+        assert runs['sleepy']['status'] == 'no_solution'
+        assert result['race']['winner'] == {'engine': 'ortools'}
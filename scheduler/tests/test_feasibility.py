@@ -0,0 +1,66 @@
+"""
+Tests for the pre-solve feasibility check.
+"""
+import pytest
+from scheduler.models import Student, Course
+from scheduler.feasibility import InfeasibleProblemError, check_feasibility, max_capacitated_matching
+from scheduler.rust_interface import RustSchedulerInterface
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+class TestCapacitatedMatching:
+    """Tests for the Hopcroft-Karp matching bound."""
+
+    def test_augments_through_full_courses(self):
+        """A greedy first pick is undone when another student has no alternative."""
+        # Student 0 could take either course, student 1 and 2 only course 0 or 1
+        adjacency = [[0, 1], [0], [1]]
+        assert max_capacitated_matching(adjacency, [1, 1]) == 2
+        assert max_capacitated_matching(adjacency, [2, 1]) == 3
+        assert max_capacitated_matching(adjacency, [0, 0]) == 0
+
+
+@pytest.mark.django_db
+class TestFeasibilityCheck:
+    """Tests for the seat supply and demand report."""
+
+    def test_reports_demand_and_supply(self):
+        """Seats, capacity and first-choice demand are counted per course."""
+        create_dataset()
+        report = check_feasibility(Course.objects.all(), Student.objects.all())
+
+        assert report.feasible
+        assert report.seats == {'AM': 11, 'PM': 11, 'FullDay': 2}
+        assert report.capacity == 13
+        assert report.course_demand['Art']['demand'] == [12]
+        assert report.course_demand['Band']['demand'] == [0, 6]
+        assert report.am_matching == 8
+        assert report.pm_matching == 8
+        assert any(warning.startswith('Art:') for warning in report.warnings)
+
+    def test_solver_engines_fail_fast(self):
+        """More students than seats raises before any solver runs."""
+        create_dataset(15)
+        interface = RustSchedulerInterface()
+
+        with pytest.raises(InfeasibleProblemError) as excinfo:
+            interface.run_scheduler(Course.objects.all(), Student.objects.all(), {'time_limit_seconds': 60})
+        assert excinfo.value.report.capacity == 13
+
+        # The greedy engine still seats as many students as it can
+        result = interface.run_scheduler(
+            Course.objects.all(), Student.objects.all(), {'engine': 'python', 'iterations': 10}
+        )
+        assert result['feasibility']['feasible'] is False
+
+    @pytest.mark.parametrize('engine', ['flow', 'alns'])
+    def test_heuristic_engines_return_a_partial_schedule(self, engine):
+        """Only the strict MIP rejects an infeasible cohort; the report becomes a warning."""
+        create_dataset(15)
+        result = RustSchedulerInterface().run_scheduler(
+            Course.objects.all(), Student.objects.all(), {'engine': engine, 'time_limit_seconds': 2}
+        )
+        assert result['engine']['name'] == engine
+        assert result['feasibility']['feasible'] is False
+        assert result['warnings'] == result['feasibility']['errors']
+        assert result['students']
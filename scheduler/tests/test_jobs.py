@@ -0,0 +1,215 @@
+"""
+Tests for background solve jobs.
+"""
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from scheduler.models import Schedule, SolveJob, Student
+from scheduler.jobs import run_solve_job
+from scheduler.progress import ProgressChannel
+from scheduler.tasks import run_solve_job_task, schedule_generation_task
+from scheduler.tests.test_ortools_scheduler import create_dataset
+from scheduler.tests.test_views import authenticated_client  # noqa: F401
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Record task dispatches instead of sending them to a broker."""
+    calls = []
+    monkeypatch.setattr(run_solve_job_task, 'apply_async',
+                        lambda args=None, task_id=None, **kwargs: calls.append((args, task_id)))
+    cache.clear()
+    return calls
+
+
+@pytest.mark.django_db
+class TestSolveJobs:
+    """Tests for enqueueing, running and cancelling solve jobs."""
+
+    def test_enqueue_returns_immediately_and_worker_persists(
+            self, authenticated_client, dispatched, django_capture_on_commit_callbacks):
+        """POST queues the job; the worker's result goes through the normal Schedule path."""
+        create_dataset()
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_client.post(
+                reverse('api:solvejob-list'),
+                {'config': {'engine': 'flow', 'time_limit_seconds': 10}},
+                content_type='application/json'
+            )
+        assert response.status_code == 202
+        job_id = response.json()['id']
+        assert response.json()['status'] == 'queued'
+        assert dispatched == [([job_id], SolveJob.objects.get(pk=job_id).task_id)]
+        assert not Schedule.objects.exists()
+
+        job = run_solve_job(job_id)
+        assert job.status == SolveJob.SUCCEEDED
+        assert job.schedule == Schedule.objects.get(is_best=True)
+
+        status = authenticated_client.get(reverse('api:solvejob-detail', args=[job_id])).json()
+        assert status['status'] == 'succeeded'
+        assert status['schedule'] == job.schedule_id
+        events = authenticated_client.get(reverse('api:solvejob-progress', args=[job_id])).json()['events']
+        assert events[-1]['event'] == 'done'
+        assert events[-1]['schedule_id'] == job.schedule_id
+
+    def test_cancelled_queued_job_is_skipped(self, authenticated_client, dispatched):
+        create_dataset()
+        job = SolveJob.objects.create(config={'engine': 'flow'})
+        response = authenticated_client.post(reverse('api:solvejob-cancel', args=[job.id]))
+        assert response.status_code == 202
+        assert response.json()['status'] == 'cancelled'
+
+        assert run_solve_job(job.id).status == SolveJob.CANCELLED
+        assert not Schedule.objects.exists()
+        response = authenticated_client.post(reverse('api:solvejob-cancel', args=[job.id]))
+        assert response.status_code == 409
+
+    def test_cancelling_running_job_stops_its_solver(self, authenticated_client, dispatched):
+        job = SolveJob.objects.create(config={}, status=SolveJob.RUNNING)
+        response = authenticated_client.post(reverse('api:solvejob-cancel', args=[job.id]))
+        assert response.json()['cancel_requested'] is True
+        assert ProgressChannel(job.progress_id).stop_requested()
+
+    def test_schedule_generation_task(self):
+        """The legacy task runs the solve inline and reports the outcome."""
+        create_dataset()
+        result = schedule_generation_task({'engine': 'python', 'iterations': 10})
+        assert result['status'] == 'succeeded'
+        assert result['perfect_count'] + result['partial_count'] + result['unsatisfied_count'] == 12
+
+
+@pytest.fixture
+def eager_celery():
+    """Run dispatched tasks and chords in-process."""
+    from celery import current_app
+    current_app.conf.task_always_eager = True
+    cache.clear()
+    yield
+    current_app.conf.task_always_eager = False
+
+
+@pytest.mark.django_db
+class TestDistributedRuns:
+    """Tests for fanning multi-run jobs out as a chord."""
+
+    def test_chord_persists_only_the_best_run(self, eager_celery):
+        create_dataset()
+        job = SolveJob.objects.create(config={
+            'multiple_runs': True, 'run_count': 3, 'distributed': True, 'iterations': 10,
+            'time_limit_seconds': 10,
+            'portfolio': [{'engine': 'python'}, {'engine': 'flow'}, {'engine': 'ortools'}]
+        })
+
+        job = run_solve_job(job.id)
+
+        assert job.status == SolveJob.SUCCEEDED
+        assert Schedule.objects.count() == 1
+        assert job.schedule.name.startswith('Distributed_Schedule_')
+        events = ProgressChannel(job.progress_id).events_since(0)
+        runs = [event for event in events if event['event'] == 'run']
+        assert sorted(event['engine'] for event in runs) == ['flow', 'ortools', 'python']
+        assert job.score == pytest.approx(min(event['objective'] for event in runs))
+
+    def test_infeasible_problem_drops_only_the_strict_runs(self, eager_celery):
+        create_dataset(15)
+        job = SolveJob.objects.create(config={
+            'multiple_runs': True, 'run_count': 3, 'distributed': True, 'iterations': 10,
+            'time_limit_seconds': 10,
+            'portfolio': [{'engine': 'python'}, {'engine': 'flow'}, {'engine': 'ortools'}]
+        })
+
+        job = run_solve_job(job.id)
+
+        assert job.status == SolveJob.SUCCEEDED
+        events = ProgressChannel(job.progress_id).events_since(0)
+        assert sorted(event['engine'] for event in events if event['event'] == 'run') == ['flow', 'python']
+
+    def test_runs_read_the_cached_instance(self, eager_celery, django_assert_num_queries):
+        """A run task solves from the cache without touching the database."""
+        from scheduler.cache import SchedulerCache
+        from scheduler.jobs import solve_problem_run
+        from scheduler.problem import ProblemInstance
+
+        create_dataset()
+        problem = ProblemInstance.from_database()
+        SchedulerCache.set_problem_instance(problem.fingerprint(), problem.to_bytes())
+        with django_assert_num_queries(0):
+            run = solve_problem_run(problem.fingerprint(), {'engine': 'flow', 'seed': 0})
+        assert run['error'] is None
+        assert len(run['students']) == 12
+
+        missing = solve_problem_run('0' * 40, {'engine': 'flow', 'seed': 1})
+        assert missing['students'] is None
+        assert 'no longer cached' in missing['error']
+
+
+@pytest.mark.django_db
+class TestResultCache:
+    """Tests for serving identical re-runs from the result cache."""
+
+    def run(self, client):
+        return client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        ).json()
+
+    def test_rerun_materializes_the_cached_result(self, authenticated_client, monkeypatch):
+        from scheduler.rust_interface import RustSchedulerInterface
+
+        cache.clear()
+        create_dataset()
+        first = self.run(authenticated_client)
+        assert first['cached'] is False
+        assignments = list(Student.objects.order_by('id').values_list('id', 'am_course', 'pm_course'))
+        Student.objects.update(am_course=None, pm_course=None)
+
+        def solve(*args, **kwargs):
+            raise AssertionError("a cached re-run must not solve")
+        monkeypatch.setattr(RustSchedulerInterface, 'run_scheduler', solve)
+        second = self.run(authenticated_client)
+
+        assert second['cached'] is True
+        assert second['score'] == pytest.approx(first['score'])
+        assert second['schedule_id'] != first['schedule_id']
+        assert Schedule.objects.get(is_best=True).id == second['schedule_id']
+        assert list(Student.objects.order_by('id').values_list('id', 'am_course', 'pm_course')) == assignments
+
+    def test_request_fingerprints_the_dataset_once(self, authenticated_client, monkeypatch):
+        from scheduler.problem import ProblemInstance
+
+        cache.clear()
+        create_dataset()
+        self.run(authenticated_client)
+        reads = []
+        from_database = ProblemInstance.from_database.__func__
+        monkeypatch.setattr(ProblemInstance, 'from_database',
+                            classmethod(lambda cls, *args: reads.append(args) or from_database(cls, *args)))
+        assert self.run(authenticated_client)['cached'] is True
+        assert len(reads) == 1
+
+    def test_changed_data_misses_the_cache(self, authenticated_client):
+        cache.clear()
+        create_dataset()
+        self.run(authenticated_client)
+        student = Student.objects.first()
+        student.pm_preferences = ["Econ", "Drama"]
+        student.save()
+        assert self.run(authenticated_client)['cached'] is False
+
+    def test_compact_result_round_trips(self):
+        from scheduler.jobs import compact_result, expand_result
+
+        result = {'score': 0.5, 'engine': 'flow', 'students': [
+            {'student_id': 1, 'am_course': 'Art', 'pm_course': None, 'satisfaction_score': 0.0},
+            {'id': 2, 'am_course': 'Art', 'pm_course': 'Band', 'full_day_course': None, 'satisfaction_score': 0.5},
+        ]}
+        expanded = expand_result(compact_result(result))
+        assert expanded['cached'] is True
+        assert expanded['engine'] == 'flow'
+        assert 'name' not in expanded
+        assert expanded['students'] == [
+            {'student_id': 1, 'am_course': 'Art', 'pm_course': None, 'full_day_course': None,
+             'satisfaction_score': 0.0},
+            {'student_id': 2, 'am_course': 'Art', 'pm_course': 'Band', 'full_day_course': None,
+             'satisfaction_score': 0.5},
+        ]
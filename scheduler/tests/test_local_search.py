@@ -0,0 +1,126 @@
+"""
+Tests for the local-search improvement phase.
+"""
+import pytest
+from scheduler.models import Student, Course, calculate_satisfaction_score
+from scheduler.local_search import LocalSearch, improve_result
+from scheduler.scheduler_python import PythonScheduler
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+@pytest.mark.django_db
+class TestLocalSearch:
+    """Tests for moves, swaps and delta scoring."""
+
+    def test_rank_table_score_matches_model(self):
+        """The O(1) satisfaction equals calculate_satisfaction_score for every course pair."""
+        courses = create_dataset()
+        students = list(Student.objects.all())
+        search = LocalSearch(courses, students)
+        by_slot = {slot: [c for c, course in enumerate(courses) if course.time_slot == slot]
+                   for slot in ('AM', 'PM', 'FullDay')}
+        pairs = [(a, p) for a in by_slot['AM'] for p in by_slot['PM'] + [-1]]
+        pairs += [(f, -1) for f in by_slot['FullDay']]
+
+        for s, student in enumerate(students):
+            for first, second in pairs:
+                names = {courses[c].time_slot: courses[c].name for c in (first, second) if c >= 0}
+                expected = calculate_satisfaction_score(
+                    student.get_am_preferences(), student.get_pm_preferences(),
+                    names.get('AM'), names.get('PM'), names.get('FullDay')
+                )
+                assert search.satisfaction(s, first, second) == pytest.approx(expected)
+                if second >= 0 or courses[first].time_slot == 'FullDay':
+                    assert search.score(s, first, second) == pytest.approx(expected)
+                else:
+                    # A missing PM seat scores worse than any PM course
+                    assert all(search.score(s, first, -1) > search.score(s, first, pm) for pm in by_slot['PM'])
+
+    def test_missing_seat_is_filled_from_free_capacity(self):
+        """A student with an AM course but no PM seat takes a free PM seat, even an unlisted one."""
+        art = Course.objects.create(name="Art", time_slot='AM', max_students=2)
+        drama = Course.objects.create(name="Drama", time_slot='PM', max_students=1)
+        econ = Course.objects.create(name="Econ", time_slot='PM', max_students=1)
+        ann = Student.objects.create(first_name="Ann", last_name="Test", email="ann@example.com",
+                                     priority=1, am_preferences=["Art"], pm_preferences=["Film", "Drama"])
+        bob = Student.objects.create(first_name="Bob", last_name="Test", email="bob@example.com",
+                                     priority=1, am_preferences=["Art"], pm_preferences=["Drama", "Film"])
+        result = {
+            'score': 0.0,
+            'students': [
+                {'student_id': ann.id, 'am_course': "Art", 'pm_course': None, 'full_day_course': None},
+                {'student_id': bob.id, 'am_course': "Art", 'pm_course': "Drama", 'full_day_course': None},
+            ],
+            'courses': [{'name': c.name, 'time_slot': c.time_slot, 'max_students': c.max_students, 'enrolled': 0}
+                        for c in (art, drama, econ)]
+        }
+
+        improved = improve_result([art, drama, econ], [ann, bob], result, {})
+
+        assert improved['local_search']['moves'] == 1
+        assert [s['pm_course'] for s in improved['students']] == ["Econ", "Drama"]
+        assert improved['local_search']['objective_after'] < improved['local_search']['objective_before']
+        econ_entry = next(c for c in improved['courses'] if c['name'] == "Econ")
+        assert econ_entry['enrolled'] == 1
+
+    def test_swap_fixes_crossed_assignment(self):
+        """Two students holding each other's first choice are swapped."""
+        art = Course.objects.create(name="Art", time_slot='AM', max_students=1)
+        band = Course.objects.create(name="Band", time_slot='AM', max_students=1)
+        drama = Course.objects.create(name="Drama", time_slot='PM', max_students=2)
+        ann = Student.objects.create(first_name="Ann", last_name="Test", email="ann@example.com",
+                                     priority=1, am_preferences=["Art", "Band"], pm_preferences=["Drama"])
+        bob = Student.objects.create(first_name="Bob", last_name="Test", email="bob@example.com",
+                                     priority=1, am_preferences=["Band", "Art"], pm_preferences=["Drama"])
+        result = {
+            'score': 2.0,
+            'students': [
+                {'student_id': ann.id, 'am_course': "Band", 'pm_course': "Drama", 'full_day_course': None},
+                {'student_id': bob.id, 'am_course': "Art", 'pm_course': "Drama", 'full_day_course': None},
+            ],
+            'courses': [{'name': c.name, 'time_slot': c.time_slot, 'max_students': c.max_students, 'enrolled': 0}
+                        for c in (art, band, drama)]
+        }
+
+        improved = improve_result([art, band, drama], [ann, bob], result, {})
+
+        assert improved['local_search']['swaps'] == 1
+        assert [s['am_course'] for s in improved['students']] == ["Art", "Band"]
+        assert improved['score'] == 0.0
+
+    def test_swap_never_unseats_the_partner(self):
+        """A student without a PM seat cannot take a full PM course from its holder."""
+        art = Course.objects.create(name="Art", time_slot='AM', max_students=2)
+        drama = Course.objects.create(name="Drama", time_slot='PM', max_students=1)
+        ann = Student.objects.create(first_name="Ann", last_name="Test", email="ann@example.com",
+                                     priority=1, am_preferences=["Band", "Art"], pm_preferences=["Drama", "Econ"])
+        bob = Student.objects.create(first_name="Bob", last_name="Test", email="bob@example.com",
+                                     priority=1, am_preferences=["Art"], pm_preferences=["Econ", "Drama"])
+        result = {
+            'score': 2.0,
+            'students': [
+                {'student_id': ann.id, 'am_course': "Art", 'pm_course': None, 'full_day_course': None},
+                {'student_id': bob.id, 'am_course': "Art", 'pm_course': "Drama", 'full_day_course': None},
+            ],
+            'courses': [{'name': c.name, 'time_slot': c.time_slot, 'max_students': c.max_students, 'enrolled': 0}
+                        for c in (art, drama)]
+        }
+
+        improved = improve_result([art, drama], [ann, bob], result, {})
+
+        assert improved['local_search']['swaps'] == 0
+        assert [s['pm_course'] for s in improved['students']] == [None, "Drama"]
+
+    def test_never_worsens_greedy_result(self):
+        """Polishing a greedy schedule keeps capacity and does not raise the summed score."""
+        courses = create_dataset()
+        students = list(Student.objects.all())
+        result = PythonScheduler(courses, students).run_with_config({'iterations': 1})
+
+        improved = improve_result(courses, students, result, {'priority_weight': 'balanced'})
+
+        stats = improved['local_search']
+        assert stats['objective_after'] <= stats['objective_before'] + 1e-9
+        assert improved['score'] == pytest.approx(sum(s['satisfaction_score'] for s in improved['students']))
+        for section in improved['sections']:
+            assert section['enrolled_students'] <= section['max_students']
@@ -0,0 +1,354 @@
+"""
+Tests for the OR-Tools scheduler.
+"""
+import pytest
+from scheduler.models import Student, Course, Schedule, ScheduleSnapshot
+from scheduler.ortools_scheduler import ORToolsScheduler, get_compiled_model, _compiled_models
+from scheduler.flow_scheduler import FlowScheduler
+from scheduler.alns_scheduler import ALNSScheduler
+from scheduler.rust_interface import RustSchedulerInterface
+from scheduler.persistence import apply_incremental_result, persist_schedule_result
+
+
+def create_dataset(num_students=12):
+    """Create a small AM/PM/FullDay dataset with contended first choices."""
+    courses = [
+        Course.objects.create(name="Art", time_slot='AM', max_students=4),
+        Course.objects.create(name="Band", time_slot='AM', max_students=4),
+        Course.objects.create(name="Chess", time_slot='AM', max_students=3),
+        Course.objects.create(name="Drama", time_slot='PM', max_students=4),
+        Course.objects.create(name="Econ", time_slot='PM', max_students=4),
+        Course.objects.create(name="Film", time_slot='PM', max_students=3),
+        Course.objects.create(name="Robotics", time_slot='FullDay', max_students=2),
+    ]
+    for i in range(num_students):
+        Student.objects.create(
+            first_name=f"Student{i}",
+            last_name="Test",
+            email=f"student{i}@example.com",
+            priority=(i % 3) + 1,
+            am_preferences=["Art", "Band"] if i % 2 else ["Art"],
+            pm_preferences=["Drama", "Econ"],
+        )
+    return courses
+
+
+@pytest.mark.django_db
+class TestORToolsScheduler:
+    """Tests for the OR-Tools MIP formulations."""
+
+    def make_scheduler(self):
+        return ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+
+    def run(self, **config):
+        return self.make_scheduler().run_with_config({'time_limit_seconds': 10, **config})
+
+    def test_dense_assigns_every_student(self):
+        """Every student gets either AM+PM or a FullDay course within capacity."""
+        create_dataset()
+        result = self.run(formulation='dense')
+
+        assert len(result['students']) == 12
+        for student in result['students']:
+            has_half_days = student['am_course'] and student['pm_course']
+            assert bool(has_half_days) != bool(student['full_day_course'])
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+    def test_sparse_matches_dense_objective(self):
+        """The sparse formulation reaches the same optimal objective as the dense one."""
+        create_dataset()
+        dense = self.make_scheduler()
+        dense.run_with_config({'formulation': 'dense'})
+        sparse = self.make_scheduler()
+        result = sparse.run_with_config({'formulation': 'sparse'})
+
+        assert sparse.objective_value == pytest.approx(dense.objective_value)
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+
+@pytest.mark.django_db
+class TestFlowScheduler:
+    """Tests for the min-cost-flow engine."""
+
+    def test_flow_respects_capacity_and_preferences(self):
+        """Flow assignments stay within capacity and give uncontested first choices."""
+        create_dataset()
+        Student.objects.create(
+            first_name="Solo", last_name="Test", email="solo@example.com",
+            priority=1, am_preferences=["Chess"], pm_preferences=["Film"]
+        )
+        scheduler = FlowScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        result = scheduler.run_with_config({})
+
+        assert len(result['students']) == 13
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+        solo = next(s for s in result['students'] if s['student_name'] == "Solo Test")
+        assert solo['am_course'] == "Chess"
+        assert solo['pm_course'] == "Film"
+
+    def test_flow_selectable_from_interface(self):
+        """RustSchedulerInterface dispatches to the flow engine."""
+        create_dataset()
+        result = RustSchedulerInterface().run_scheduler(
+            list(Course.objects.all()), list(Student.objects.all()), {'engine': 'flow'}
+        )
+        assert result['name'].startswith("Flow_Schedule")
+
+
+@pytest.mark.django_db
+class TestCPSATBackend:
+    """Tests for the CP-SAT solver backend."""
+
+    def test_cp_sat_matches_scip_objective(self):
+        """CP-SAT proves the same optimum as SCIP on the integer-scaled objective."""
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        scip = ORToolsScheduler(courses, students)
+        scip.run_with_config({'solver_backend': 'scip'})
+        cp_sat = ORToolsScheduler(courses, students)
+        result = cp_sat.run_with_config({'solver_backend': 'cp_sat', 'num_workers': 2, 'formulation': 'sparse'})
+
+        assert cp_sat.objective_value == pytest.approx(scip.objective_value)
+        assert len(result['students']) == len(students)
+
+
+@pytest.mark.django_db
+class TestWarmStart:
+    """Tests for solution hints."""
+
+    def test_hint_from_best_schedule_snapshots(self):
+        """Hints come from the latest best schedule's snapshot rows."""
+        courses = create_dataset()
+        student = Student.objects.first()
+        schedule = Schedule.objects.create(name="Best", is_best=True)
+        ScheduleSnapshot.objects.create(schedule=schedule, student=student, full_day_course=courses[-1])
+
+        scheduler = ORToolsScheduler(courses, list(Student.objects.all()))
+        hint = scheduler.load_solution_hint('best_schedule')
+
+        assert hint == {student.id: {courses[-1].id}}
+
+    def test_warm_start_reaches_same_optimum(self):
+        """A hinted re-solve finds the same optimum as the cold solve."""
+        create_dataset()
+        courses = list(Course.objects.all())
+        cold = ORToolsScheduler(courses, list(Student.objects.all()))
+        cold.run_with_config({'solver_backend': 'cp_sat', 'num_workers': 2})
+        warm = ORToolsScheduler(courses, list(Student.objects.all()))
+        warm.run_with_config({'solver_backend': 'cp_sat', 'num_workers': 2, 'warm_start': 'current'})
+
+        assert warm.objective_value == pytest.approx(cold.objective_value)
+        assert warm.incumbents
+
+
+@pytest.mark.django_db
+class TestPersistence:
+    """Tests for bulk persistence of scheduler results."""
+
+    def test_persist_uses_constant_queries(self, django_assert_max_num_queries):
+        """Persisting a result writes every student and snapshot in a fixed number of queries."""
+        create_dataset()
+        result = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all())).run_with_config({})
+        old_best = Schedule.objects.create(name="Old", is_best=True)
+
+        with django_assert_max_num_queries(10):
+            schedule = persist_schedule_result(result)
+
+        old_best.refresh_from_db()
+        assert not old_best.is_best
+        assert schedule.snapshots.count() == 12
+        for entry in result['students']:
+            student = Student.objects.get(id=entry['student_id'])
+            assert (student.am_course.name if student.am_course else None) == entry['am_course']
+            assert (student.full_day_course.name if student.full_day_course else None) == entry['full_day_course']
+
+
+@pytest.mark.django_db
+class TestIncrementalReschedule:
+    """Tests for neighbourhood re-scheduling after late changes."""
+
+    def test_late_signup_only_writes_changed_rows(self):
+        """A late sign-up is placed without touching students outside the neighbourhood."""
+        create_dataset()
+        courses = list(Course.objects.all())
+        result = ORToolsScheduler(courses, list(Student.objects.all())).run_with_config({})
+        schedule = persist_schedule_result(result)
+
+        late = Student.objects.create(
+            first_name="Late", last_name="Test", email="late@example.com",
+            priority=1, am_preferences=["Chess"], pm_preferences=["Film"]
+        )
+        scheduler = ORToolsScheduler(courses, list(Student.objects.all()))
+        incremental = scheduler.run_incremental([late.id], {'max_neighbourhood': 5})
+        written = apply_incremental_result(incremental, schedule)
+
+        late.refresh_from_db()
+        assert incremental['neighbourhood_size'] <= 5
+        assert written == len(incremental['students'])
+        assert (late.am_course and late.pm_course) or late.full_day_course
+        assert schedule.snapshots.filter(student=late).exists()
+        for course in Course.objects.all():
+            assert course.section.enrolled_students_count <= course.max_students
+
+    def test_lowered_capacity_reschedules_the_surplus(self):
+        """Holders beyond a lowered max_students are moved instead of making the model infeasible."""
+        create_dataset()
+        courses = list(Course.objects.all())
+        result = ORToolsScheduler(courses, list(Student.objects.all())).run_with_config({})
+        schedule = persist_schedule_result(result)
+        drama = Course.objects.get(name="Drama")
+        holders = list(Student.objects.filter(pm_course=drama))
+        assert len(holders) > 1
+        drama.max_students = 1
+        drama.save()
+        # Econ and Film take the displaced students
+        Course.objects.filter(name__in=["Econ", "Film"]).update(max_students=10)
+
+        changed = Student.objects.exclude(pm_course=drama).first()
+        scheduler = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        incremental = scheduler.run_incremental([changed.id], {'max_neighbourhood': 1})
+        assert incremental
+        apply_incremental_result(incremental, schedule)
+        assert Student.objects.filter(pm_course=drama).count() <= 1
+
+
+@pytest.mark.django_db
+class TestPortfolioRuns:
+    """Tests for parallel multiple_runs portfolios."""
+
+    def test_portfolio_reports_winner(self):
+        """Every run reports back and the best one is applied."""
+        create_dataset()
+        scheduler = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        result = scheduler.run_with_config({'multiple_runs': True, 'run_count': 3, 'time_limit_seconds': 10})
+
+        runs = result['portfolio']['runs']
+        assert len(runs) == 3
+        assert result['score'] == pytest.approx(min(run['score'] for run in runs))
+        assert result['portfolio']['winner'] in [run['config'] for run in runs]
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+    def test_stopping_the_pool_does_not_wait_for_running_tasks(self):
+        """Early stop terminates the workers instead of waiting out their solves."""
+        import time
+        from concurrent.futures import ProcessPoolExecutor
+        from scheduler.ortools_scheduler import stop_process_pool
+
+        pool = ProcessPoolExecutor(max_workers=2)
+        for _ in range(4):
+            pool.submit(time.sleep, 30)
+        time.sleep(0.5)
+        start = time.time()
+        stop_process_pool(pool)
+        assert time.time() - start < 5
+
+
+@pytest.mark.django_db
+class TestCompiledModel:
+    """Tests for objective-only re-solves of a compiled model."""
+
+    def test_weight_sweep_matches_fresh_solves(self):
+        """Re-weighting one compiled model reaches the optimum of a freshly built model."""
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        schemes = ['standard', 'strong', {1: 1.0, 2: 1.0, 3: 1.0}]
+        scheduler = ORToolsScheduler(courses, students)
+        results = scheduler.compare_weight_schemes(schemes, {})
+        assert get_compiled_model(ORToolsScheduler(courses, students)) is get_compiled_model(scheduler)
+
+        for scheme, result in zip(schemes, results):
+            _compiled_models.clear()
+            fresh = ORToolsScheduler(courses, students)
+            fresh.run_with_config({'priority_weight': scheme} if isinstance(scheme, str) else {'custom_weights': scheme})
+            assert result['status'] == 'OPTIMAL'
+            assert result['objective'] == pytest.approx(fresh.objective_value)
+
+    def test_solve_returns_its_own_outcome_and_resets_the_seed(self):
+        """A solve's status and objective come back with it; unseeded solves use the default seed."""
+        create_dataset()
+        scheduler = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        compiled = get_compiled_model(scheduler, solver_backend='cp_sat')
+        weights = {1: 3.0, 2: 2.0, 3: 1.0}
+
+        assignments, status, objective, incumbents = compiled.solve(weights, 10, seed=7)
+        assert compiled.backend.solver.parameters.random_seed == 7
+        assert status == 'OPTIMAL'
+        assert len(assignments) == 12
+        assert objective is not None and incumbents
+
+        compiled.solve(weights, 10)
+        assert compiled.backend.solver.parameters.random_seed == compiled.backend.DEFAULT_SEED
+
+
+@pytest.mark.django_db
+class TestALNSScheduler:
+    """Tests for the large-neighbourhood search engine."""
+
+    def test_alns_improves_on_greedy(self):
+        """Repairs never worsen the greedy start and reach the MIP optimum on a small cohort."""
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        mip = ORToolsScheduler(courses, students)
+        mip.run_with_config({})
+
+        alns = ALNSScheduler(courses, students)
+        result = alns.run_with_config({'neighbourhood_size': 12, 'max_iterations': 20, 'seed': 0})
+
+        objectives = [incumbent['objective'] for incumbent in alns.incumbents]
+        assert objectives == sorted(objectives, reverse=True)
+        assert alns.objective_value == pytest.approx(mip.objective_value)
+        assert len(result['students']) == 12
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+    def test_repair_keeps_students_unseated_when_seats_are_short(self):
+        """A neighbourhood with more students than seats is repaired instead of infeasible."""
+        create_dataset(num_students=15)
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        alns = ALNSScheduler(courses, students)
+        alns.run_with_config({'max_iterations': 0, 'seed': 0})
+        assert any(not courses for courses in alns.current.values())
+
+        delta = alns._repair(sorted(students, key=lambda student: student.priority), 5)
+        assert delta is not None and delta <= 1e-9
+        seated = sum(1 for courses in alns.current.values() if courses)
+        assert seated == 13
+
+
+@pytest.mark.django_db
+class TestLexicographicMode:
+    """Tests for the priority-tier lexicographic objective."""
+
+    def test_tier_one_keeps_its_standalone_optimum(self):
+        """Priority 1 gets the penalty it would get if only priority 1 counted."""
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+
+        tier_one_only = ORToolsScheduler(courses, students)
+        tier_one_only.run_with_config({'time_limit_seconds': 10, 'custom_weights': {1: 1.0, 2: 0.0, 3: 0.0}})
+
+        scheduler = ORToolsScheduler(courses, students)
+        result = scheduler.run_with_config({'time_limit_seconds': 30, 'objective_mode': 'lexicographic'})
+
+        stages = result['lexicographic']
+        assert [stage['priority'] for stage in stages] == [1, 2, 3]
+        assert stages[0]['penalty'] == pytest.approx(tier_one_only.objective_value, abs=1e-6)
+        assert len(result['students']) == 12
+        for course in result['courses']:
+            assert course['enrolled'] <= course['max_students']
+
+    def test_cp_sat_stages_match_scip(self):
+        """Both backends reach the same penalty at every tier."""
+        create_dataset()
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        penalties = []
+        for backend in ('scip', 'cp_sat'):
+            result = ORToolsScheduler(courses, students).run_with_config({
+                'time_limit_seconds': 30, 'objective_mode': 'lexicographic', 'solver_backend': backend
+            })
+            penalties.append([stage['penalty'] for stage in result['lexicographic']])
+        assert penalties[0] == pytest.approx(penalties[1], abs=1e-6)
@@ -0,0 +1,45 @@
+"""
+Tests for the columnar problem encoding.
+"""
+import pickle
+
+import pytest
+from scheduler.models import Student, Course
+from scheduler.problem import ProblemInstance
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+@pytest.mark.django_db
+class TestProblemInstance:
+    """Tests for building, serializing and decoding instances."""
+
+    def test_database_build_uses_two_queries(self, django_assert_num_queries):
+        create_dataset()
+        with django_assert_num_queries(2):
+            problem = ProblemInstance.from_database()
+
+        assert problem.num_students == 12
+        assert problem.am_preferences.dtype.name == 'int16'
+        assert problem.fingerprint() == ProblemInstance.from_models(
+            Course.objects.order_by('id'), Student.objects.order_by('id')
+        ).fingerprint()
+
+    def test_buffer_round_trip_keeps_records(self, tmp_path):
+        """Unknown preference names survive through the string table."""
+        create_dataset()
+        Student.objects.filter(id=Student.objects.order_by('id').first().id).update(
+            am_preferences=["Art", "Pottery"]
+        )
+        problem = ProblemInstance.from_database()
+
+        path = tmp_path / 'problem.bin'
+        problem.save(path)
+        for decoded in (ProblemInstance.from_buffer(problem.to_bytes()),
+                        ProblemInstance.load(path),
+                        pickle.loads(pickle.dumps(problem))):
+            students = decoded.student_records()
+            assert students[0].am_preferences == ["Art", "Pottery"]
+            assert [s.pm_preferences for s in students] == [["Drama", "Econ"]] * 12
+            assert [(c.name, c.time_slot, c.max_students) for c in decoded.course_records()] == [
+                (c.name, c.time_slot, c.max_students) for c in Course.objects.order_by('id')
+            ]
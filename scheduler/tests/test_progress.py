@@ -0,0 +1,139 @@
+"""
+Tests for the incumbent progress channel and its event stream.
+"""
+import json
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from scheduler.models import Student, Course
+from scheduler.ortools_scheduler import ORToolsScheduler
+from scheduler.progress import ProgressChannel
+from scheduler.tests.test_ortools_scheduler import create_dataset
+from scheduler.tests.test_views import authenticated_client  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestProgressChannel:
+    """Tests for the cache-backed event log."""
+
+    def test_events_are_read_back_in_order(self):
+        """Readers resume after the last event id they saw."""
+        channel = ProgressChannel('run-1')
+        channel.incumbent(3.0, bound=1.0, gap=0.5, elapsed=0.1)
+        channel.incumbent(2.0, bound=1.5, gap=0.25, elapsed=0.2)
+        channel.finish(schedule_id=7)
+
+        events = channel.events_since(0)
+        assert [event['event'] for event in events] == ['incumbent', 'incumbent', 'done']
+        assert [event['id'] for event in events] == [1, 2, 3]
+        assert events[1]['objective'] == 2.0
+        assert [event['id'] for event in channel.events_since(2)] == [3]
+        assert ProgressChannel('run-2').events_since(0) == []
+
+    def test_stop_flag(self):
+        channel = ProgressChannel('run-1')
+        assert not channel.stop_requested()
+        ProgressChannel('run-1').request_stop()
+        assert channel.stop_requested()
+
+
+@pytest.mark.django_db
+class TestSolverProgress:
+    """Tests for incumbents published by the solvers."""
+
+    @pytest.mark.parametrize('backend', ['scip', 'cp_sat'])
+    def test_solver_publishes_incumbents(self, backend):
+        """Every improving solution reaches the channel with its bound and gap."""
+        create_dataset()
+        scheduler = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        result = scheduler.run_with_config({
+            'time_limit_seconds': 10, 'solver_backend': backend, 'progress_id': f'solve-{backend}'
+        })
+
+        assert result is not None
+        events = ProgressChannel(f'solve-{backend}').events_since(0)
+        assert events
+        objectives = [event['objective'] for event in events]
+        assert objectives == sorted(objectives, reverse=True)
+        assert events[-1]['objective'] == pytest.approx(scheduler.objective_value, abs=1e-6)
+        assert all(event['bound'] is not None and event['gap'] is not None for event in events)
+
+    def test_accepted_solve_keeps_its_incumbent(self):
+        """A stop requested before the solve ends it after the first incumbent."""
+        create_dataset()
+        ProgressChannel('accepted').request_stop()
+        scheduler = ORToolsScheduler(list(Course.objects.all()), list(Student.objects.all()))
+        result = scheduler.run_with_config({'time_limit_seconds': 60, 'progress_id': 'accepted'})
+
+        assert result is not None
+        assert len(result['students']) == 12
+        assert len(ProgressChannel('accepted').events_since(0)) == 1
+
+
+@pytest.mark.django_db
+class TestProgressEndpoints:
+    """Tests for the event stream and accept endpoints."""
+
+    def test_stream_replays_events_until_done(self, authenticated_client):
+        channel = ProgressChannel('stream')
+        channel.incumbent(1.0, bound=0.5, gap=0.5, elapsed=0.1)
+        channel.finish(schedule_id=3)
+
+        url = reverse('api_scheduler_progress', args=['stream'])
+        response = authenticated_client.get(url)
+        assert response['Content-Type'] == 'text/event-stream'
+        body = b''.join(response.streaming_content).decode()
+        assert 'event: incumbent' in body
+        done = body.split('event: done\ndata: ')[1].split('\n')[0]
+        assert json.loads(done)['schedule_id'] == 3
+
+        # Reconnecting after the last event only replays what came later
+        response = authenticated_client.get(url, HTTP_LAST_EVENT_ID='1')
+        body = b''.join(response.streaming_content).decode()
+        assert 'event: incumbent' not in body
+        assert 'event: done' in body
+
+    def test_accept_sets_the_stop_flag(self, authenticated_client):
+        response = authenticated_client.post(reverse('api_accept_scheduler_progress', args=['stream']))
+        assert response.status_code == 202
+        assert ProgressChannel('stream').stop_requested()
+
+    def test_stream_of_unknown_run_ends(self, authenticated_client, monkeypatch):
+        """A run that never publishes does not hold the connection open."""
+        monkeypatch.setattr('scheduler.views.STREAM_START_TIMEOUT', 0)
+        response = authenticated_client.get(reverse('api_scheduler_progress', args=['missing']))
+        body = b''.join(response.streaming_content).decode()
+        done = body.split('event: done\ndata: ')[1].split('\n')[0]
+        assert 'No run missing' in json.loads(done)['error']
+
+    def test_stream_of_running_run_closes_after_its_window(self, authenticated_client, monkeypatch):
+        """A long run is followed over several short responses, not one long one."""
+        monkeypatch.setattr('scheduler.views.STREAM_WINDOW_SECONDS', 0)
+        channel = ProgressChannel('window')
+        channel.status('running')
+        channel.incumbent(1.0, bound=0.5, gap=0.5, elapsed=0.1)
+        response = authenticated_client.get(reverse('api_scheduler_progress', args=['window']))
+        body = b''.join(response.streaming_content).decode()
+        assert 'retry: ' in body
+        assert 'event: incumbent' in body
+        assert 'event: done' not in body
+
+    def test_stream_requires_login(self, client):
+        response = client.get(reverse('api_scheduler_progress', args=['stream']))
+        assert response.status_code == 302
+
+    def test_rejected_run_finishes_its_channel(self, authenticated_client):
+        """Early returns of run_scheduler still publish the final event."""
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'progress_id': 'empty'}}, content_type='application/json'
+        )
+        assert response.status_code == 400
+        events = ProgressChannel('empty').events_since(0)
+        assert [event['event'] for event in events] == ['status', 'done']
+        assert 'without courses' in events[-1]['error']
@@ -0,0 +1,76 @@
+"""
+Tests for the pure Python scheduler.
+"""
+import pytest
+from scheduler.models import Student, Course
+from scheduler.scheduler_python import PythonScheduler
+from scheduler.batch_greedy import BatchGreedyScheduler
+from scheduler.tests.test_ortools_scheduler import create_dataset
+
+
+@pytest.mark.django_db
+class TestPythonScheduler:
+    """Tests for the array-backed greedy engine."""
+
+    def test_iterations_run_without_queries(self, django_assert_num_queries):
+        """The greedy loop never touches the database."""
+        create_dataset()
+        scheduler = PythonScheduler(list(Course.objects.all()), list(Student.objects.all()))
+
+        with django_assert_num_queries(0):
+            result = scheduler.run_with_config({'iterations': 50})
+
+        assert len(result['students']) == 12
+        for section in result['sections']:
+            assert section['enrolled_students'] <= section['max_students']
+            assert section['enrolled_students'] == len(section['student_ids'])
+
+    def test_score_matches_model_satisfaction(self):
+        """The reported total equals the sum of Student.satisfaction_score over the result."""
+        courses = create_dataset()
+        scheduler = PythonScheduler(courses, list(Student.objects.all()))
+        result = scheduler.run_with_config({'iterations': 20})
+
+        by_name = {course.name: course for course in courses}
+        total = 0.0
+        for entry in result['students']:
+            student = Student.objects.get(id=entry['id'])
+            student.am_course = by_name.get(entry['am_course'])
+            student.pm_course = by_name.get(entry['pm_course'])
+            student.full_day_course = by_name.get(entry['full_day_course'])
+            total += student.satisfaction_score()
+        assert result['score'] == pytest.approx(total)
+
+
+@pytest.mark.django_db
+class TestBatchGreedyScheduler:
+    """Tests for the NumPy batch version of the greedy engine."""
+
+    def test_batch_matches_single_ordering(self):
+        """Each ordering of a batch gets the same seats and scores as the plain loop."""
+        create_dataset()
+        Student.objects.create(
+            first_name="Solo", last_name="Test", email="solo@example.com",
+            priority=1, am_preferences=["Robotics", "Chess"], pm_preferences=["Film"]
+        )
+        courses, students = list(Course.objects.all()), list(Student.objects.all())
+        batch = BatchGreedyScheduler(courses, students, batch_size=16, seed=0)
+        plain = PythonScheduler(courses, students)
+
+        orders = batch.shuffled_orders(16)
+        first, second = batch.assign_batch(orders)
+        scores = batch.score_batch(first, second)
+        for k, order in enumerate(orders):
+            expected_first, expected_second = plain.assign(order.tolist())
+            assert first[k].tolist() == expected_first
+            assert second[k].tolist() == expected_second
+            assert scores[k].sum() == pytest.approx(plain.score_schedule(expected_first, expected_second))
+
+    def test_orderings_keep_priority_levels(self):
+        """Higher priority students are always served first."""
+        create_dataset()
+        batch = BatchGreedyScheduler(list(Course.objects.all()), list(Student.objects.all()), seed=1)
+
+        for order in batch.shuffled_orders(8):
+            priorities = [batch.priorities[s] for s in order]
+            assert priorities == sorted(priorities)
@@ -0,0 +1,156 @@
+"""
+Tests for coalescing identical solve requests.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from django.urls import reverse
+from scheduler.jobs import build_scheduler_config, run_solve_job
+from scheduler.models import Schedule, SolveJob
+from scheduler.singleflight import SolveFlight, solve_request_hash
+from scheduler.tests.test_jobs import dispatched  # noqa: F401
+from scheduler.tests.test_ortools_scheduler import create_dataset
+from scheduler.tests.test_views import authenticated_client  # noqa: F401
+
+
+@pytest.mark.django_db
+class TestSolveRequestHash:
+    """Tests for the content hash identifying a solve request."""
+
+    def test_hash_ignores_volatile_keys_and_follows_the_data(self):
+        create_dataset()
+        config = build_scheduler_config({'engine': 'flow'})
+        first = solve_request_hash(config)
+        assert solve_request_hash({**config, 'progress_id': 'abc'}) == first
+        assert solve_request_hash({**config, 'engine': 'python'}) != first
+
+        from scheduler.models import Student
+        student = Student.objects.first()
+        student.priority += 1
+        student.save()
+        assert solve_request_hash(config) != first
+
+
+@pytest.mark.django_db
+class TestCoalescing:
+    """Tests for attaching duplicate requests to the flight in the air."""
+
+    def test_duplicate_run_receives_the_leaders_outcome(self, authenticated_client):
+        cache.clear()
+        create_dataset()
+        flight = SolveFlight(solve_request_hash(build_scheduler_config({'engine': 'flow'})))
+        leader = flight.lead()
+        flight.finish(leader, status_code=200, data={'schedule_id': 7, 'score': 0.25})
+        # Hold the lock again with the finished flight's token, as if still solving
+        cache.set(flight.prefix, leader)
+
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.status_code == 200
+        assert response.json() == {'schedule_id': 7, 'score': 0.25, 'coalesced': True}
+        assert not Schedule.objects.exists()
+        assert len(flight.waiters(leader)) == 1
+
+    def test_run_joining_a_job_receives_the_jobs_schedule(
+            self, authenticated_client, dispatched, django_capture_on_commit_callbacks, monkeypatch):
+        create_dataset()
+        with django_capture_on_commit_callbacks(execute=True):
+            job_id = authenticated_client.post(
+                reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+            ).json()['id']
+        wait = SolveFlight.wait
+
+        def worker_lands_while_waiting(flight, leader, timeout):
+            run_solve_job(job_id)
+            return wait(flight, leader, timeout)
+
+        monkeypatch.setattr(SolveFlight, 'wait', worker_lands_while_waiting)
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        job = SolveJob.objects.get(pk=job_id)
+        assert response.status_code == 200
+        assert response.json()['schedule_id'] == job.schedule_id
+        assert response.json()['job_id'] == job_id
+        assert response.json()['coalesced'] is True
+        assert Schedule.objects.count() == 1
+
+    def test_requests_take_over_the_flight_of_a_dead_worker(
+            self, authenticated_client, dispatched, django_capture_on_commit_callbacks):
+        create_dataset()
+        with django_capture_on_commit_callbacks(execute=True):
+            first = authenticated_client.post(
+                reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+            ).json()
+        # The worker claimed the job and died without another heartbeat
+        last_beat = timezone.now() - timedelta(seconds=SolveJob.HEARTBEAT_TIMEOUT + 1)
+        SolveJob.objects.filter(pk=first['id']).update(
+            status=SolveJob.RUNNING, started_at=last_beat, heartbeat_at=last_beat
+        )
+
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.status_code == 200
+        assert 'coalesced' not in response.json()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            second = authenticated_client.post(
+                reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+            ).json()
+        assert second['id'] != first['id']
+        assert second['coalesced'] is False
+        assert SolveFlight(SolveJob.objects.get(pk=second['id']).request_hash).leader()['job_id'] == second['id']
+
+    def test_requests_join_a_job_with_a_recent_heartbeat(
+            self, authenticated_client, dispatched, django_capture_on_commit_callbacks):
+        create_dataset()
+        with django_capture_on_commit_callbacks(execute=True):
+            first = authenticated_client.post(
+                reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+            ).json()
+        SolveJob.objects.filter(pk=first['id']).update(
+            status=SolveJob.RUNNING, started_at=timezone.now() - timedelta(hours=1), heartbeat_at=timezone.now()
+        )
+        second = authenticated_client.post(
+            reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        ).json()
+        assert second['id'] == first['id']
+        assert second['coalesced'] is True
+
+    def test_run_releases_its_flight(self, authenticated_client):
+        cache.clear()
+        create_dataset()
+        response = authenticated_client.post(
+            reverse('api_run_scheduler'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.status_code == 200
+        flight = SolveFlight(solve_request_hash(build_scheduler_config({'engine': 'flow'})))
+        assert flight.leader() is None
+
+    def test_duplicate_jobs_attach_to_one_solve(
+            self, authenticated_client, dispatched, django_capture_on_commit_callbacks):
+        """Ten identical clicks queue one job."""
+        create_dataset()
+        responses = []
+        with django_capture_on_commit_callbacks(execute=True):
+            for _ in range(10):
+                responses.append(authenticated_client.post(
+                    reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+                ).json())
+        assert len({response['id'] for response in responses}) == 1
+        assert [response['coalesced'] for response in responses] == [False] + [True] * 9
+        assert SolveJob.objects.count() == 1
+        assert len(dispatched) == 1
+
+        job = run_solve_job(responses[0]['id'])
+        assert job.status == SolveJob.SUCCEEDED
+        assert SolveFlight(job.request_hash).leader() is None
+        response = authenticated_client.post(
+            reverse('api:solvejob-list'), {'config': {'engine': 'flow'}}, content_type='application/json'
+        )
+        assert response.json()['coalesced'] is False
+        assert SolveJob.objects.count() == 2
@@ -9,6 +9,7 @@ router.register(r'students', views.StudentViewSet)
 router.register(r'sections', views.SectionViewSet)
 router.register(r'schedules', views.ScheduleViewSet)
 router.register(r'configs', views.SchedulerConfigViewSet)
+router.register(r'jobs', views.SolveJobViewSet)
 
 urlpatterns = [
     # API endpoints
@@ -16,6 +17,10 @@ urlpatterns = [
     path('api/import/courses/', views.import_courses, name='import_courses'),
     path('api/import/students/', views.import_students, name='import_students'),
     path('api/run-scheduler/', views.run_scheduler, name='api_run_scheduler'),
+    path('api/run-scheduler/progress/<str:run_id>/', views.scheduler_progress, name='api_scheduler_progress'),
+    path('api/run-scheduler/progress/<str:run_id>/accept/', views.accept_scheduler_progress,
+         name='api_accept_scheduler_progress'),
+    path('api/run-scheduler/incremental/', views.run_scheduler_incremental, name='api_run_scheduler_incremental'),
     path('api/clear-all-students/', views.clear_all_students, name='clear_all_students'),
     path('api/clear-all-courses/', views.clear_all_courses, name='clear_all_courses'),
     
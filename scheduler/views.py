@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.http import JsonResponse
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from rest_framework import viewsets, status
@@ -19,18 +19,29 @@ import io
 import pandas as pd
 import logging
 import os
+import time
 from datetime import datetime
 from typing import List, Dict, Optional
 
 from ninja import NinjaAPI
 
-from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig, UserPreference
+from .models import Course, Student, Section, Schedule, ScheduleSnapshot, SchedulerConfig, UserPreference, SolveJob
+from .cache import SchedulerCache
 from .serializers import (
     CourseSerializer, StudentSerializer, SectionSerializer,
     ScheduleSerializer, ScheduleSnapshotSerializer, SchedulerConfigSerializer,
-    RequestSerializer
+    SolveJobSerializer, RequestSerializer
 )
 from .rust_interface import RustSchedulerInterface
+from .persistence import persist_schedule_result, apply_incremental_result
+from .admission import solver_slot
+from .feasibility import InfeasibleProblemError
+from .jobs import (
+    build_scheduler_config, cached_scheduler_result, result_cache_key, run_configured_scheduler,
+    enqueue_solve_job, cancel_solve_job, live_flight_leader
+)
+from .progress import ProgressChannel, POLL_INTERVAL, STREAM_START_TIMEOUT, STREAM_WINDOW_SECONDS
+from .singleflight import SolveFlight, flight_lease
 from .scheduler_python import PythonScheduler
 
 logger = logging.getLogger(__name__)
@@ -178,6 +189,59 @@ class SchedulerConfigViewSet(viewsets.ModelViewSet):
     queryset = SchedulerConfig.objects.all()
     serializer_class = SchedulerConfigSerializer
 
+def solver_busy_response(message):
+    """429 response telling the client when to retry a solve"""
+    retry_after = settings.SOLVER_RETRY_AFTER_SECONDS
+    return Response(
+        {'error': message, 'retry_after': retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)}
+    )
+
+class SolveJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Background scheduler runs: POST enqueues, GET polls the status"""
+    queryset = SolveJob.objects.all().order_by('-created_at')
+    serializer_class = SolveJobSerializer
+    
+    def create(self, request):
+        """Queue a solve with the posted config and return its job id immediately"""
+        if not Course.objects.exists() or not Student.objects.exists():
+            return Response(
+                {'error': 'Cannot run scheduler without courses and students'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        backlog = SolveJob.objects.filter(status__in=[SolveJob.QUEUED, SolveJob.RUNNING]).count()
+        if backlog >= settings.SOLVER_MAX_QUEUED_JOBS:
+            return solver_busy_response(f'{backlog} solve jobs are already queued or running, retry later')
+        user = request.user if request.user.is_authenticated else None
+        job = enqueue_solve_job(request.data.get('config', {}), user=user)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Incumbents published after the event id given as ?since="""
+        job = self.get_object()
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            since = 0
+        return Response({
+            'status': job.status,
+            'events': ProgressChannel(job.progress_id).events_since(since)
+        })
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a queued or running job; its result is not persisted"""
+        job = self.get_object()
+        if job.is_finished:
+            return Response(
+                {'error': f'Job is already {job.status}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        job = cancel_solve_job(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 # Data management views
 @api_view(['DELETE'])
 @csrf_exempt
@@ -191,6 +255,7 @@ def clear_all_students(request):
         # Clear all sections (remove student enrollments)
         for section in Section.objects.all():
             section.clear_students()
+        SchedulerCache.invalidate_schedule_cache()
         
         return Response({'message': f'Successfully deleted {count} students'}, status=status.HTTP_200_OK)
     
@@ -206,6 +271,7 @@ def clear_all_courses(request):
         # Delete all course records
         count = Course.objects.count()
         Course.objects.all().delete()
+        SchedulerCache.invalidate_schedule_cache()
         
         return Response({'message': f'Successfully deleted {count} courses'}, status=status.HTTP_200_OK)
     
@@ -245,6 +311,7 @@ def import_courses(request):
             # Create a section for this course if it doesn't exist
             if not hasattr(course, 'section'):
                 Section.objects.create(course=course)
+        SchedulerCache.invalidate_schedule_cache()
         
         return Response({'message': f'Successfully imported {len(df)} courses'}, status=status.HTTP_201_CREATED)
     
@@ -312,6 +379,7 @@ def import_students(request):
                     'pm_preferences': pm_preferences
                 }
             )
+        SchedulerCache.invalidate_schedule_cache()
         
         return Response({'message': f'Successfully imported {len(df)} students'}, status=status.HTTP_201_CREATED)
     
@@ -324,22 +392,23 @@ def import_students(request):
 @csrf_exempt
 def run_scheduler(request):
     """Run the scheduler algorithm with the given configuration"""
+    progress = None
     try:
         # Parse configuration
         config_data = request.data.get('config', {})
-        iterations = config_data.get('iterations', 1000)
-        min_course_fill = config_data.get('min_course_fill', 0.75)
-        early_stop_score = config_data.get('early_stop_score', 0.0)
-        multiple_runs = config_data.get('multiple_runs', False)  # New option for multiple runs
-        priority_weight = config_data.get('priority_weight', 'standard')  # Priority weighting option
-        run_count = config_data.get('run_count', 3) if multiple_runs else 1  # Number of runs to try
+        
+        # The page already listens on the run's progress channel, so every
+        # outcome below must end it with a 'done' event
+        progress = ProgressChannel.from_config(config_data)
+        if progress is not None:
+            progress.status('running')
         
         # Create a config record for tracking
         config = SchedulerConfig.objects.create(
             name=f"Run_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            iterations=iterations,
-            min_course_fill=min_course_fill,
-            early_stop_score=early_stop_score
+            iterations=config_data.get('iterations', 1000),
+            min_course_fill=config_data.get('min_course_fill', 0.75),
+            early_stop_score=config_data.get('early_stop_score', 0.0)
         )
         
         # Get all courses and students
@@ -347,120 +416,199 @@ def run_scheduler(request):
         students = Student.objects.all()
         
         if not courses or not students:
-            return Response(
-                {'error': 'Cannot run scheduler without courses and students'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            error = 'Cannot run scheduler without courses and students'
+            if progress is not None:
+                progress.finish(error=error)
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Translate the posted options into the engine config
+        scheduler_config = build_scheduler_config(config_data)
+        
+        # An identical request already being solved shares its outcome
+        # The dataset is read and fingerprinted once for the flight and the result cache
+        request_hash = result_cache_key(scheduler_config, courses, students)
+        flight = SolveFlight(request_hash)
+        lease = flight_lease(scheduler_config)
+        leader = flight.lead(lease=lease)
+        if leader is None:
+            current = live_flight_leader(flight)
+            outcome = None
+            if current is not None:
+                waiters = flight.join(current, user=request.user.username)
+                logger.info(f"Coalescing run with solve flight {flight.request_hash[:12]} ({waiters} waiting)")
+                outcome = flight.wait(current, timeout=lease)
+            if outcome is not None:
+                if progress is not None:
+                    progress.finish(coalesced=True, **outcome['data'])
+                return Response({**outcome['data'], 'coalesced': True}, status=outcome['status_code'])
+            # The other flight vanished without an outcome, so solve here
+            leader = flight.lead(lease=lease)
+        
+        response = None
+        try:
+            response = _solve_schedule(scheduler_config, courses, students, request_hash, progress)
+        finally:
+            if leader is not None:
+                flight.finish(
+                    leader,
+                    status_code=response.status_code if response else status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    data=response.data if response else {'error': 'Scheduler failed'}
+                )
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error running scheduler: {e}")
+        if progress is not None:
+            progress.finish(error=str(e))
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _solve_schedule(scheduler_config, courses, students, request_hash, progress=None):
+    """Solve in one of the node's solve slots, persist the result and build the API response"""
+    try:
+        # An identical earlier solve is served from the cache without a slot
+        best_result = cached_scheduler_result(request_hash)
+        if best_result is None:
+            with solver_slot() as slot:
+                if slot is None:
+                    if progress is not None:
+                        progress.finish(error='busy')
+                    return solver_busy_response('All solve slots are busy, retry later or queue a job')
+                best_result = run_configured_scheduler(scheduler_config, courses, students, key=request_hash)
         
-        # Initialize the Rust scheduler interface
-        scheduler_interface = RustSchedulerInterface()
+        # If we didn't get any valid results
+        if not best_result:
+            error = 'Scheduler did not return a valid result'
+            if progress is not None:
+                progress.finish(error=error)
+            return Response({'error': error}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Set up configuration with additional options
-        scheduler_config = {
-            'iterations': iterations,
-            'min_course_fill': min_course_fill,
-            'early_stop_score': early_stop_score,
-            'priority_weight': priority_weight  # Pass the priority weight option
-        }
+        # Save the students' assignments and snapshots in one transaction
+        schedule = persist_schedule_result(best_result)
+        if progress is not None:
+            progress.finish(schedule_id=schedule.id, score=schedule.score)
         
-        # If multiple runs requested, run the scheduler multiple times and pick the best result
-        best_result = None
-        best_score = float('inf')  # Lower is better
+        return Response({
+            'message': 'Scheduler completed successfully',
+            'schedule_id': schedule.id,
+            'score': schedule.score,
+            'portfolio': best_result.get('portfolio'),
+            'engine': best_result.get('engine'),
+            'race': best_result.get('race'),
+            'warnings': best_result.get('warnings', []),
+            'cached': best_result.get('cached', False)
+        }, status=status.HTTP_200_OK)
+    
+    except InfeasibleProblemError as e:
+        logger.warning(f"Scheduler input is infeasible: {e}")
+        if progress is not None:
+            progress.finish(error=str(e))
+        return Response(
+            {'error': str(e), 'feasibility': e.report.to_dict()},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    except Exception as e:
+        logger.error(f"Error running scheduler: {e}")
+        if progress is not None:
+            progress.finish(error=str(e))
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@login_required
+def scheduler_progress(request, run_id):
+    """
+    Stream the incumbents of a running scheduler as Server-Sent Events
+    
+    Each response replays the events after Last-Event-ID and stays open for
+    at most STREAM_WINDOW_SECONDS; the browser's EventSource reconnects on
+    its own, so a long solve never pins a web worker for its whole run. A
+    run whose events expired from the cache ends with a final 'done' event.
+    """
+    channel = ProgressChannel(run_id)
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_id', 0))
+    except ValueError:
+        last_id = 0
+    
+    def stream():
+        nonlocal last_id
+        # Tell the browser how long to wait before reconnecting
+        yield f"retry: {int(POLL_INTERVAL * 2000)}\n\n"
+        idle = 0.0
+        opened = time.time()
+        while True:
+            events = channel.events_since(last_id)
+            for event in events:
+                last_id = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                if event['event'] == 'done':
+                    return
+            if events:
+                idle = 0.0
+            else:
+                idle += POLL_INTERVAL
+                if idle >= 15:
+                    # Comment line keeps proxies from closing an idle connection
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+            waited = time.time() - opened
+            if waited >= STREAM_START_TIMEOUT and not channel.started():
+                # The run is unknown or expired; a final event makes the browser stop listening
+                error = f'No run {channel.run_id} in progress'
+                yield f"event: done\ndata: {json.dumps({'event': 'done', 'error': error})}\n\n"
+                return
+            if waited >= STREAM_WINDOW_SECONDS:
+                # Release the worker; the browser reconnects after the retry delay
+                return
+            time.sleep(POLL_INTERVAL)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['POST'])
+@csrf_exempt
+def accept_scheduler_progress(request, run_id):
+    """Stop a running scheduler and keep its current incumbent"""
+    ProgressChannel(run_id).request_stop()
+    return Response({'message': 'Scheduler will stop at its current incumbent'}, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['POST'])
+@csrf_exempt
+def run_scheduler_incremental(request):
+    """Re-schedule only the neighbourhood of changed or newly added students"""
+    try:
+        student_ids = request.data.get('student_ids', [])
+        config_data = request.data.get('config', {})
         
-        for run in range(run_count):
-            # Run the scheduler
-            result = scheduler_interface.run_scheduler(
-                courses=courses,
-                students=students,
-                config=scheduler_config
-            )
-            
-            if not result:
-                continue  # Skip this run if no valid result
-                
-            # Keep track of the best result
-            if best_result is None or result['score'] < best_score:
-                best_result = result
-                best_score = result['score']
-                
-            # For a single run, no need to clear student assignments between runs
-            if not multiple_runs:
-                break
-                
-            # For multiple runs, clear student assignments for the next attempt
-            if run < run_count - 1:  # Don't clear after the last run
-                for student in students:
-                    student.clear_courses()
+        if not student_ids:
+            return Response({'error': 'No changed students given'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # If we didn't get any valid results
-        if not best_result:
+        from .ortools_scheduler import ORToolsScheduler
+        
+        courses = list(Course.objects.select_related('section'))
+        students = list(Student.objects.all())
+        best_schedule = Schedule.objects.filter(is_best=True).order_by('-created_at').first()
+        
+        scheduler = ORToolsScheduler(courses, students)
+        result = scheduler.run_incremental(student_ids, config_data)
+        if not result:
             return Response(
-                {'error': 'Scheduler did not return a valid result after multiple attempts'},
+                {'error': 'Incremental re-schedule found no feasible assignment, run the full scheduler'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        # Use the name from the result if available, otherwise generate one
-        schedule_name = best_result.get('name', f"Schedule_{best_result['score']:.4f}")
-        
-        # Create a new Schedule entry using the best result
-        schedule = Schedule.objects.create(
-            name=schedule_name,
-            score=best_result['score'],
-            is_best=True
-        )
-        
-        # Update all students based on the result and create snapshots
-        for student_data in best_result['students']:
-            try:
-                student = Student.objects.get(id=student_data['student_id'] if 'student_id' in student_data else student_data['id'])
-                
-                # Get course objects for assignments
-                am_course = None
-                pm_course = None
-                full_day_course = None
-                
-                if student_data.get('am_course'):
-                    am_course = Course.objects.get(name=student_data['am_course'])
-                    
-                if student_data.get('pm_course'):
-                    pm_course = Course.objects.get(name=student_data['pm_course'])
-                    
-                if student_data.get('full_day_course'):
-                    full_day_course = Course.objects.get(name=student_data['full_day_course'])
-                
-                # Update the actual student record
-                student.am_course = am_course
-                student.pm_course = pm_course
-                student.full_day_course = full_day_course
-                student.save()
-                
-                # Create a snapshot for this student
-                ScheduleSnapshot.objects.create(
-                    schedule=schedule,
-                    student=student,
-                    am_course=am_course,
-                    pm_course=pm_course,
-                    full_day_course=full_day_course,
-                    satisfaction_score=student_data.get('satisfaction_score', student_data.get('score', 0.0))
-                )
-            except Student.DoesNotExist:
-                student_id = student_data.get('student_id', student_data.get('id', 'unknown'))
-                logger.warning(f"Student with ID {student_id} not found")
-            except Course.DoesNotExist:
-                student_id = student_data.get('student_id', student_data.get('id', 'unknown'))
-                logger.warning(f"Course not found for student {student_id}")
-        
-        # Mark all other schedules as not the best
-        Schedule.objects.exclude(id=schedule.id).update(is_best=False)
+        changed = apply_incremental_result(result, best_schedule)
         
         return Response({
-            'message': 'Scheduler completed successfully',
-            'schedule_id': schedule.id,
-            'score': schedule.score
+            'message': 'Incremental re-schedule completed successfully',
+            'schedule_id': best_schedule.id if best_schedule else None,
+            'score': result['score'],
+            'neighbourhood_size': result['neighbourhood_size'],
+            'changed_students': changed
         }, status=status.HTTP_200_OK)
     
     except Exception as e:
-        logger.error(f"Error running scheduler: {e}")
+        logger.error(f"Error running incremental scheduler: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Django template views
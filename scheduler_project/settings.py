@@ -127,6 +127,31 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Celery
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+
+# Solves are CPU-bound and go to their own worker pool ("solver" in
+# docker-compose.yml), away from backups and email on the default queue
+CELERY_TASK_ROUTES = {
+    'scheduler.tasks.schedule_generation_task': {'queue': 'solver'},
+    'scheduler.tasks.run_solve_job_task': {'queue': 'solver'},
+    'scheduler.tasks.solve_run_task': {'queue': 'solver'},
+}
+
+# Solver admission control (see scheduler/admission.py)
+# Most solves running at once on one node
+SOLVER_MAX_CONCURRENT_SOLVES = int(os.environ.get('SOLVER_MAX_CONCURRENT_SOLVES', 2))
+# CPU threads pinned to each solve; 0 splits the node's CPUs evenly
+SOLVER_THREADS_PER_SOLVE = int(os.environ.get('SOLVER_THREADS_PER_SOLVE', 0))
+# Most background jobs waiting or running before new ones are rejected
+SOLVER_MAX_QUEUED_JOBS = int(os.environ.get('SOLVER_MAX_QUEUED_JOBS', 20))
+# Seconds a rejected request is told to wait before retrying
+SOLVER_RETRY_AFTER_SECONDS = int(os.environ.get('SOLVER_RETRY_AFTER_SECONDS', 30))
+# Seconds after which the slot of a solve that never released it is reclaimed
+SOLVER_SLOT_LEASE_SECONDS = 60 * 60 * 2
+
 # Authentication settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'